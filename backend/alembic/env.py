@@ -0,0 +1,51 @@
+"""Alembic environment, run by the alembic CLI and by upgrade_database
+
+upgrade_database passes its own connection in config.attributes; the CLI
+connects with the app's sync engine on DATABASE_URL.
+"""
+from logging.config import fileConfig
+from alembic import context
+from app.database.connection import Base, engine
+import app.database.models  # noqa: F401  registers the tables on Base.metadata
+
+config = context.config
+target_metadata = Base.metadata
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    # Indexes declared with ddl_if only exist on their dialect
+    condition = getattr(object, "_ddl_if", None)
+    return condition is None or condition.dialect in (None, context.get_context().dialect.name)
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    if config.config_file_name is not None:
+        fileConfig(config.config_file_name)
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,51 @@
+"""Initial schema: users and their uploaded CSV files
+
+Databases created before migrations were added are stamped at this
+revision by upgrade_database.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("username", sa.String(255), nullable=False),
+        sa.Column("password_hash", sa.String(255), nullable=False),
+        sa.Column("role", sa.String(50), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id"),
+        sa.CheckConstraint("role IN ('admin', 'user')", name="check_role"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "csv_files",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("filename", sa.String(255), nullable=False),
+        sa.Column("path", sa.String(500), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("uploaded_by", sa.Integer(), nullable=False),
+        sa.Column("uploaded_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id"),
+        sa.ForeignKeyConstraint(["uploaded_by"], ["users.id"], ondelete="CASCADE"),
+    )
+    op.create_index("ix_csv_files_id", "csv_files", ["id"])
+    op.create_index("ix_csv_files_uploaded_by", "csv_files", ["uploaded_by"])
+    op.create_index("ix_csv_files_uploaded_at", "csv_files", ["uploaded_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("csv_files")
+    op.drop_table("users")
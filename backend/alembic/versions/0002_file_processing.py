@@ -0,0 +1,123 @@
+"""File processing: row counts, sidecars, deduplication, profiles, jobs and list changes
+
+Also replaces the uploaded_at index with the keyset pagination index and
+adds the PostgreSQL trigram index for filename search. Each step is skipped
+when it is already in place, since databases created by earlier builds
+with create_all have some of these without a recorded revision.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def _csv_file_columns():
+    return [
+        sa.Column("total_rows", sa.BigInteger(), nullable=True),
+        sa.Column("index_path", sa.String(500), nullable=True),
+        sa.Column("columnar_path", sa.String(500), nullable=True),
+        sa.Column("content_hash", sa.String(64), nullable=True),
+        sa.Column("delimiter", sa.String(1), nullable=False, server_default=","),
+    ]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    postgresql = op.get_bind().dialect.name == "postgresql"
+    tables = set(inspector.get_table_names())
+
+    columns = {column["name"] for column in inspector.get_columns("csv_files")}
+    for column in _csv_file_columns():
+        if column.name not in columns:
+            op.add_column("csv_files", column)
+
+    indexes = {index["name"] for index in inspector.get_indexes("csv_files")}
+    if "ix_csv_files_content_hash" not in indexes:
+        op.create_index("ix_csv_files_content_hash", "csv_files", ["content_hash"])
+    if "ix_csv_files_uploaded_at_id" not in indexes:
+        op.create_index("ix_csv_files_uploaded_at_id", "csv_files", ["uploaded_at", "id"])
+    if "ix_csv_files_uploaded_at" in indexes:
+        op.drop_index("ix_csv_files_uploaded_at", "csv_files")
+    if postgresql and "ix_csv_files_filename_trgm" not in indexes:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index(
+            "ix_csv_files_filename_trgm",
+            "csv_files",
+            ["filename"],
+            postgresql_using="gin",
+            postgresql_ops={"filename": "gin_trgm_ops"}
+        )
+
+    if "csv_column_profiles" not in tables:
+        op.create_table(
+            "csv_column_profiles",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("csv_file_id", sa.Integer(), nullable=False),
+            sa.Column("position", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(255), nullable=False),
+            sa.Column("inferred_type", sa.String(20), nullable=False),
+            sa.Column("null_count", sa.BigInteger(), nullable=False),
+            sa.Column("value_count", sa.BigInteger(), nullable=False),
+            sa.Column("min_value", sa.Text(), nullable=True),
+            sa.Column("max_value", sa.Text(), nullable=True),
+            sa.Column("distinct_estimate", sa.BigInteger(), nullable=False),
+            sa.Column("top_values", sa.JSON(), nullable=False),
+            sa.Column("histogram", sa.JSON(), nullable=True),
+            sa.Column("created_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+            sa.PrimaryKeyConstraint("id"),
+            sa.ForeignKeyConstraint(["csv_file_id"], ["csv_files.id"], ondelete="CASCADE"),
+        )
+        op.create_index("ix_csv_column_profiles_id", "csv_column_profiles", ["id"])
+        op.create_index("ix_csv_column_profiles_csv_file_id", "csv_column_profiles", ["csv_file_id"])
+
+    if "processing_jobs" not in tables:
+        op.create_table(
+            "processing_jobs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("csv_file_id", sa.Integer(), nullable=False),
+            sa.Column("status", sa.String(20), nullable=False),
+            sa.Column("stage", sa.String(50), nullable=True),
+            sa.Column("progress", sa.Integer(), nullable=False),
+            sa.Column("error", sa.Text(), nullable=True),
+            sa.Column("created_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+            sa.PrimaryKeyConstraint("id"),
+            sa.ForeignKeyConstraint(["csv_file_id"], ["csv_files.id"], ondelete="CASCADE"),
+            sa.CheckConstraint("status IN ('queued', 'running', 'succeeded', 'failed')", name="check_job_status"),
+        )
+        op.create_index("ix_processing_jobs_id", "processing_jobs", ["id"])
+        op.create_index("ix_processing_jobs_csv_file_id", "processing_jobs", ["csv_file_id"])
+        op.create_index("ix_processing_jobs_status", "processing_jobs", ["status"])
+
+    if "csv_list_changes" not in tables:
+        op.create_table(
+            "csv_list_changes",
+            sa.Column("version", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column("op", sa.String(20), nullable=False),
+            sa.Column("csv_file_id", sa.Integer(), nullable=False),
+            sa.Column("file", sa.JSON(), nullable=True),
+            sa.Column("created_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+            sa.PrimaryKeyConstraint("version"),
+            sa.CheckConstraint("op IN ('added', 'updated', 'deleted')", name="check_list_change_op"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("csv_list_changes")
+    op.drop_table("processing_jobs")
+    op.drop_table("csv_column_profiles")
+    if op.get_bind().dialect.name == "postgresql":
+        op.drop_index("ix_csv_files_filename_trgm", "csv_files")
+    op.create_index("ix_csv_files_uploaded_at", "csv_files", ["uploaded_at"])
+    op.drop_index("ix_csv_files_uploaded_at_id", "csv_files")
+    op.drop_index("ix_csv_files_content_hash", "csv_files")
+    with op.batch_alter_table("csv_files") as batch:
+        for column in reversed(_csv_file_columns()):
+            batch.drop_column(column.name)
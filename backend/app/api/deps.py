@@ -1,40 +1,78 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.database.connection import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timezone
+from typing import Optional
+from app.database.connection import AsyncSessionLocal, get_db
 from app.database.models import User
+from app.core.metrics import span
 from app.core.security import decode_token
+from app.core.user_cache import AuthenticatedUser, user_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get the current authenticated user from JWT token"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-
-    payload = decode_token(token)
-    if payload is None:
-        raise credentials_exception
 
-    username: str = payload.get("sub")
-    if username is None:
+def _decode_subject(token: str) -> dict:
+    with span("jwt_decode"):
+        payload = decode_token(token)
+    if payload is None or payload.get("sub") is None:
         raise credentials_exception
+    return payload
 
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
-        raise credentials_exception
 
-    return user
+def _issued_to(payload: dict, user: AuthenticatedUser) -> bool:
+    """Whether a token was issued to this account rather than a deleted one of the same name
+
+    Checks the uid claim, and that the token was not issued before the
+    account was created, since SQLite reuses the ids of deleted rows.
+    """
+    if payload.get("uid") is not None and payload["uid"] != user.id:
+        return False
+    if payload.get("iat") is None or user.created_at is None:
+        return True
+    created_at = user.created_at
+    if created_at.tzinfo is None:
+        # SQLite returns UTC timestamps without a time zone
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    # iat has whole seconds
+    return payload["iat"] >= int(created_at.timestamp())
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> AuthenticatedUser:
+    """Get the current authenticated user from JWT token
+
+    The user is looked up in the database at most once per
+    settings.auth_user_cache_ttl seconds; within that time the cached role is
+    used.
+    """
+    payload = _decode_subject(token)
+    username: str = payload["sub"]
+
+    current_user = user_cache.get(username)
+    if current_user is None:
+        with span("user_lookup"):
+            user = await db.scalar(select(User).where(User.username == username))
+        if user is None:
+            raise credentials_exception
+        current_user = AuthenticatedUser(id=user.id, username=user.username, role=user.role, created_at=user.created_at)
+        user_cache.put(current_user)
+
+    if not _issued_to(payload, current_user):
+        raise credentials_exception
+    return current_user
 
 
-def require_admin(current_user: User = Depends(get_current_user)) -> User:
+def require_admin(current_user: AuthenticatedUser = Depends(get_current_user)) -> AuthenticatedUser:
     """Require the current user to have admin role"""
     if current_user.role != "admin":
         raise HTTPException(
@@ -44,6 +82,25 @@ def require_admin(current_user: User = Depends(get_current_user)) -> User:
     return current_user
 
 
-def require_user(current_user: User = Depends(get_current_user)) -> User:
-    """Require the current user to be authenticated (any role)"""
-    return current_user
+async def require_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> AuthenticatedUser:
+    """Require the current user to be authenticated (any role)
+
+    The user is looked up like in get_current_user rather than trusted from
+    the token's claims, so deleted users are rejected in every process.
+    """
+    return await get_current_user(token, db)
+
+
+async def authenticate_websocket(token: Optional[str]) -> Optional[AuthenticatedUser]:
+    """User of the token a WebSocket passes as a query parameter
+
+    Browsers can't set headers on WebSocket requests. Returns None without a
+    token and raises credentials_exception for an invalid one.
+    """
+    if token is None:
+        return None
+    async with AsyncSessionLocal() as db:
+        return await require_user(token, db)
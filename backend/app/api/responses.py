@@ -0,0 +1,209 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import hashlib
+import os
+from fastapi import HTTPException, Request, status
+from fastapi.responses import ORJSONResponse
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+from typing import Any, Dict, Optional
+from app.config import settings
+from app.core.compression import ENCODINGS
+from app.core.metrics import csv_bytes_read, span
+from app.database.models import CSVFile
+from app.utils.csv_parser import MappedCSVFile
+from app.utils.wire_formats import (
+    ARROW_STREAM_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    arrow_available,
+    encode_arrow_page,
+    encode_msgpack,
+    negotiate_media_type
+)
+
+# Media types of CSV content pages, JSON first as the default
+CONTENT_MEDIA_TYPES = ("application/json", MSGPACK_MEDIA_TYPE, ARROW_STREAM_MEDIA_TYPE)
+
+# Bytes per body message when the server can't send from the file directly
+RANGE_CHUNK_SIZE = 1024 * 1024
+
+
+class RowRangeResponse(Response):
+    """Send the header and a window of raw rows of a mapped CSV file
+
+    Body messages are memoryview slices of the map, so rows are never decoded
+    or copied in Python. When the ASGI server supports the
+    ``http.response.zerocopy`` extension the rows are sent from the file
+    descriptor with sendfile instead. The file is closed once the response has
+    been sent.
+    """
+
+    media_type = "text/csv"
+
+    def __init__(
+        self,
+        csv_file: MappedCSVFile,
+        start: int,
+        stop: int,
+        headers: Optional[dict] = None,
+        background: Optional[BackgroundTask] = None
+    ):
+        self.csv_file = csv_file
+        self.header_end = csv_file.row_offset(0)
+        self.range_start, self.range_end = csv_file.row_range(start, stop)
+        self.status_code = 200
+        self.background = background
+        self.body = b""
+        self.init_headers(headers)
+        self.raw_headers = [
+            (name, value) for name, value in self.raw_headers if name != b"content-length"
+        ]
+        length = self.header_end + self.range_end - self.range_start
+        self.raw_headers.append((b"content-length", str(length).encode("latin-1")))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            })
+            await self._send_slice(send, 0, self.header_end, more_body=True)
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": self.csv_file.file,
+                    "offset": self.range_start,
+                    "count": self.range_end - self.range_start,
+                    "more_body": False,
+                })
+            else:
+                position = self.range_start
+                while True:
+                    end = min(position + RANGE_CHUNK_SIZE, self.range_end)
+                    await self._send_slice(send, position, end, more_body=end < self.range_end)
+                    if end >= self.range_end:
+                        break
+                    position = end
+        finally:
+            self.csv_file.close()
+        csv_bytes_read.inc(self.header_end + self.range_end - self.range_start, source="row_range")
+
+        if self.background is not None:
+            await self.background()
+
+    async def _send_slice(self, send: Send, start: int, end: int, more_body: bool) -> None:
+        body = self.csv_file.buffer[start:end]
+        try:
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+        finally:
+            body.release()
+
+
+def negotiate_content_type(accept: Optional[str]) -> str:
+    """Media type for a CSV content page; raises 406 if none is acceptable"""
+    offered = [media_type for media_type in CONTENT_MEDIA_TYPES if media_type != ARROW_STREAM_MEDIA_TYPE or arrow_available()]
+    media_type = negotiate_media_type(accept, offered)
+    if media_type is None:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"Supported content types: {', '.join(offered)}"
+        )
+    return media_type
+
+
+def content_response(content: Dict[str, Any], media_type: str) -> Response:
+    """Serialize a CSV content page as JSON, MessagePack or an Arrow IPC stream
+
+    Arrow pages must use the columns layout; the other fields of the page are
+    stored as schema metadata.
+    """
+    with span("serialize"):
+        if media_type == MSGPACK_MEDIA_TYPE:
+            return Response(encode_msgpack(content), media_type=media_type)
+        if media_type == ARROW_STREAM_MEDIA_TYPE:
+            metadata = {key: value for key, value in content.items() if key not in ("headers", "rows")}
+            return Response(encode_arrow_page(content["headers"], content["rows"], metadata), media_type=media_type)
+        # Serialize directly; validating every cell against the response model
+        # costs more than reading the page
+        return ORJSONResponse(content)
+
+
+def _http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _opaque_tag(entity_tag: str) -> str:
+    """Strip the weak prefix and the suffix CompressionMiddleware adds per encoding"""
+    tag = entity_tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for encoding in ENCODINGS:
+        if tag.endswith(f'-{encoding}"'):
+            return tag[:-len(encoding) - 2] + '"'
+    return tag
+
+
+def content_cache_headers(csv_file: CSVFile, request: Request, media_type: str) -> Dict[str, str]:
+    """Validators and Cache-Control for one representation of a file's content
+
+    The strong ETag combines the content hash with the file, the query and
+    the media type, since each of those gives a different representation of
+    the same bytes, and with whether processing has finished, since total_rows
+    is only known from then on. Last-Modified is the upload time; stored
+    content never changes afterwards.
+    """
+    version = csv_file.content_hash or str(os.path.getmtime(csv_file.path))
+    query = "&".join(sorted(f"{name}={value}" for name, value in request.query_params.multi_items()))
+    processed = csv_file.total_rows is not None
+    variant = hashlib.sha256(
+        f"{csv_file.id}:{request.url.path}?{query}:{media_type}:{processed}".encode("utf-8")
+    ).hexdigest()
+    headers = {
+        "ETag": f'"{version[:32]}-{variant[:16]}"',
+        "Cache-Control": settings.content_cache_control,
+        "Vary": "Accept",
+    }
+    if csv_file.uploaded_at is not None:
+        headers["Last-Modified"] = _http_date(csv_file.uploaded_at)
+    return headers
+
+
+def list_cache_headers(version: str, request: Request) -> Dict[str, str]:
+    """Weak ETag of a file list page; it only has to change when the list does"""
+    query = "&".join(sorted(f"{name}={value}" for name, value in request.query_params.multi_items()))
+    tag = hashlib.sha256(f"{version}?{query}".encode("utf-8")).hexdigest()[:16]
+    return {"ETag": f'W/"{tag}"', "Cache-Control": "private, no-cache"}
+
+
+def not_modified_response(request: Request, headers: Dict[str, str]) -> Optional[Response]:
+    """A 304 response if the request's validators match, otherwise None
+
+    If-None-Match is compared weakly as RFC 9110 requires for GET; encoded
+    variants of the ETag match too. If-Modified-Since is only used when
+    If-None-Match is absent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = _opaque_tag(headers["ETag"])
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            if candidate == "*":
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            if _opaque_tag(candidate) == etag:
+                # Echo the tag the client holds, which may be an encoded variant
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={**headers, "ETag": candidate})
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and "Last-Modified" in headers:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        if since.tzinfo is not None and parsedate_to_datetime(headers["Last-Modified"]) <= since:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
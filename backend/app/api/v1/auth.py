@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database.connection import get_db
 from app.schemas.auth import UserSignup, UserLogin, Token
 from app.services.auth_service import signup_user, login_user
@@ -9,9 +9,9 @@ router = APIRouter()
 
 
 @router.post("/signup", response_model=dict, status_code=status.HTTP_201_CREATED)
-def signup(user_data: UserSignup, db: Session = Depends(get_db)):
+async def signup(user_data: UserSignup, db: AsyncSession = Depends(get_db)):
     """Register a new user (default role: 'user')"""
-    user = signup_user(db, user_data)
+    user = await signup_user(db, user_data)
     return {
         "message": "User created successfully",
         "user_id": user.id,
@@ -20,11 +20,11 @@ def signup(user_data: UserSignup, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Login and get JWT token"""
     user_data = UserLogin(username=form_data.username, password=form_data.password)
-    access_token = login_user(db, user_data)
+    access_token = await login_user(db, user_data)
     return {"access_token": access_token, "token_type": "bearer"}
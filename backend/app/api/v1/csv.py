@@ -1,56 +1,248 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, UploadFile, File, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from app.database.connection import get_db
-from app.database.models import User
+from app.config import settings
+from app.core.user_cache import AuthenticatedUser
 from app.api.deps import require_user, require_admin
-from app.schemas.csv_file import CSVFileListResponse, CSVContentResponse
+from app.api.responses import (
+    RowRangeResponse,
+    content_cache_headers,
+    content_response,
+    list_cache_headers,
+    negotiate_content_type,
+    not_modified_response
+)
+from app.utils.wire_formats import ARROW_STREAM_MEDIA_TYPE
+from app.schemas.csv_file import (
+    CSVFileListResponse,
+    CSVContentResponse,
+    CSVProfileResponse,
+    AggregateRequest,
+    AggregateResponse,
+    ProcessingJobResponse,
+    CSVListChangesResponse
+)
 from app.services.csv_service import (
     upload_csv_file,
-    get_all_csv_files,
+    get_csv_profile,
+    get_csv_file_list,
+    get_csv_list_version,
+    get_csv_list_changes,
+    list_change_event,
+    get_csv_file_by_id,
     get_csv_content,
-    delete_csv_file
+    stream_csv_content,
+    negotiate_stream_format,
+    open_csv_rows,
+    aggregate_csv_file,
+    delete_csv_file,
+    get_content_cache_stats
 )
+from app.services.job_service import create_processing_job, get_processing_jobs
+from app.core.job_worker import job_worker
 from app.core.websocket_manager import websocket_manager
 
 router = APIRouter()
 
 
 @router.get("", response_model=List[CSVFileListResponse])
-def list_csv_files(
-    current_user: User = Depends(require_user),
-    db: Session = Depends(get_db)
+async def list_csv_files(
+    request: Request,
+    response: Response,
+    limit: int = Query(settings.csv_list_page_size, ge=1, le=settings.csv_list_max_page_size, description="Maximum number of files to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    q: Optional[str] = Query(None, max_length=255, description="Filename search, case-insensitive"),
+    match: str = Query("contains", pattern="^(prefix|contains)$", description="Match q as a filename prefix or substring"),
+    current_user: AuthenticatedUser = Depends(require_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """List all CSV files (user/admin)"""
-    csv_files = get_all_csv_files(db)
+    """List CSV files, newest first (user/admin)
+
+    The cursor of the next page is sent in the X-Next-Cursor and Link
+    headers, and the list version in X-List-Version. Sends a weak ETag and
+    answers 304 when If-None-Match still matches.
+    """
+    version = await get_csv_list_version(db)
+    headers = list_cache_headers(version, request)
+    headers["X-List-Version"] = str(version)
+    not_modified = not_modified_response(request, headers)
+    if not_modified is not None:
+        return not_modified
+
+    csv_files, next_cursor = await get_csv_file_list(db, limit, cursor=cursor, search=q, match=match)
+    response.headers.update(headers)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
     return csv_files
 
 
+@router.get("/changes", response_model=CSVListChangesResponse)
+async def list_csv_file_changes(
+    since: int = Query(..., ge=0, description="List version the client has, from X-List-Version or a csv_list_updated event"),
+    current_user: AuthenticatedUser = Depends(require_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the changes to the file list after a version (user/admin)
+
+    Answers 410 when those changes are no longer kept; reload the list then.
+    """
+    return await get_csv_list_changes(db, since)
+
+
+@router.get("/cache/stats", response_model=dict)
+def content_cache_stats(current_user: AuthenticatedUser = Depends(require_admin)):
+    """Get parsed content cache statistics (admin only)"""
+    return get_content_cache_stats()
+
+
 @router.get("/{file_id}", response_model=CSVContentResponse)
-def get_csv_file(
+async def get_csv_file(
     file_id: int,
-    current_user: User = Depends(require_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    offset: Optional[int] = Query(None, ge=0, description="Index of the first row to return"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.csv_max_page_size, description="Maximum number of rows to return"),
+    after_row: Optional[int] = Query(None, ge=0, description="Cursor: return rows after this row index"),
+    filter: Optional[List[str]] = Query(
+        None,
+        description="column:operator:value with operator eq, ne, lt, le, gt, ge, contains, regex or in (values separated by |)"
+    ),
+    sort: Optional[str] = Query(None, description="Comma-separated columns, prefixed with - for descending"),
+    layout: str = Query("objects", pattern="^(objects|rows|columns)$", description="objects, rows or columns"),
+    accept: Optional[str] = Header(None),
+    current_user: AuthenticatedUser = Depends(require_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get CSV file content (user/admin)"""
-    content = get_csv_content(db, file_id)
-    return content
+    """Get a page of CSV file content, optionally filtered and sorted (user/admin)
+
+    Served as JSON, MessagePack (application/x-msgpack) or an Arrow IPC
+    stream (application/vnd.apache.arrow.stream) depending on Accept.
+    Conditional requests are answered with 304 before the file is read.
+    """
+    media_type = negotiate_content_type(accept)
+    if media_type == ARROW_STREAM_MEDIA_TYPE:
+        layout = "columns"
+
+    if offset is not None and after_row is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either offset or after_row, not both"
+        )
+
+    csv_file = await get_csv_file_by_id(db, file_id)
+    headers = content_cache_headers(csv_file, request, media_type)
+    not_modified = not_modified_response(request, headers)
+    if not_modified is not None:
+        return not_modified
+
+    start = after_row + 1 if after_row is not None else (offset or 0)
+    content = await get_csv_content(csv_file, offset=start, limit=limit, filters=filter, sort=sort, layout=layout)
+    response = content_response(content, media_type)
+    response.headers.update(headers)
+    return response
+
+
+@router.get("/{file_id}/stream")
+async def stream_csv_file(
+    file_id: int,
+    request: Request,
+    fmt: Optional[str] = Query(
+        None,
+        alias="format",
+        pattern="^(ndjson|json|csv|msgpack|arrow)$",
+        description="ndjson, json, csv, msgpack or arrow; negotiated from Accept when omitted"
+    ),
+    accept: Optional[str] = Header(None),
+    current_user: AuthenticatedUser = Depends(require_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream the full content of a CSV file (user/admin)"""
+    fmt = fmt or negotiate_stream_format(accept)
+    csv_file = await get_csv_file_by_id(db, file_id)
+    headers = content_cache_headers(csv_file, request, fmt)
+    not_modified = not_modified_response(request, headers)
+    if not_modified is not None:
+        return not_modified
+
+    content, media_type = await stream_csv_content(csv_file, fmt)
+    return StreamingResponse(content, media_type=media_type, headers=headers)
+
+
+@router.get("/{file_id}/rows", response_class=RowRangeResponse)
+async def get_csv_rows(
+    file_id: int,
+    request: Request,
+    offset: int = Query(0, ge=0, description="Index of the first row to return"),
+    limit: int = Query(settings.csv_default_page_size, ge=1, le=settings.csv_max_range_rows, description="Maximum number of rows to return"),
+    current_user: AuthenticatedUser = Depends(require_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the header and a window of rows as the raw stored CSV bytes (user/admin)"""
+    csv_file = await get_csv_file_by_id(db, file_id)
+    headers = content_cache_headers(csv_file, request, RowRangeResponse.media_type)
+    not_modified = not_modified_response(request, headers)
+    if not_modified is not None:
+        return not_modified
+
+    mapped_file = await open_csv_rows(csv_file)
+    try:
+        # Finding the row boundaries scans the file when it has no row index yet
+        return await run_in_threadpool(RowRangeResponse, mapped_file, offset, offset + limit, headers=headers)
+    except Exception:
+        mapped_file.close()
+        raise
+
+
+@router.get("/{file_id}/profile", response_model=CSVProfileResponse)
+async def get_csv_file_profile(
+    file_id: int,
+    current_user: AuthenticatedUser = Depends(require_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get per-column statistics computed after upload (user/admin)"""
+    return await get_csv_profile(db, file_id)
+
+
+@router.get("/{file_id}/jobs", response_model=List[ProcessingJobResponse])
+async def list_processing_jobs(
+    file_id: int,
+    current_user: AuthenticatedUser = Depends(require_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the status and progress of post-upload processing (user/admin)"""
+    return await get_processing_jobs(db, file_id)
+
+
+@router.post("/{file_id}/aggregate", response_model=AggregateResponse)
+async def aggregate_csv(
+    file_id: int,
+    request: AggregateRequest,
+    current_user: AuthenticatedUser = Depends(require_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Compute grouped aggregates over a CSV file (user/admin)"""
+    return await aggregate_csv_file(db, file_id, request)
 
 
 @router.post("/upload", response_model=CSVFileListResponse, status_code=status.HTTP_201_CREATED)
 async def upload_csv(
     file: UploadFile = File(...),
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: AuthenticatedUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Upload a CSV file (admin only)"""
-    csv_file = upload_csv_file(db, file, current_user.id)
+    csv_file, change = await upload_csv_file(db, file, current_user.id)
+
+    # Index, convert and profile the file in the job worker; the upload is
+    # acknowledged as soon as its bytes are on disk
+    job = await create_processing_job(db, csv_file)
+    job_worker.enqueue(job.id)
 
-    # Broadcast update to all connected clients
-    await websocket_manager.broadcast({
-        "event": "csv_list_updated",
-        "message": "CSV file uploaded"
-    })
+    # Broadcast the new list entry to all connected clients
+    await websocket_manager.broadcast(list_change_event(change))
 
     return csv_file
 
@@ -58,16 +250,13 @@ async def upload_csv(
 @router.delete("/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_csv(
     file_id: int,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: AuthenticatedUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a CSV file (admin only)"""
-    delete_csv_file(db, file_id)
+    change = await delete_csv_file(db, file_id)
 
-    # Broadcast update to all connected clients
-    await websocket_manager.broadcast({
-        "event": "csv_list_updated",
-        "message": "CSV file deleted"
-    })
+    # Broadcast the deletion to all connected clients
+    await websocket_manager.broadcast(list_change_event(change))
 
     return None
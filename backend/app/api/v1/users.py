@@ -1,30 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.database.connection import get_db
-from app.database.models import User
+from app.core.user_cache import AuthenticatedUser
 from app.api.deps import require_admin
 from app.schemas.user import UserListResponse
 from app.services.user_service import get_all_users, delete_user
+from app.core.websocket_manager import websocket_manager
 
 router = APIRouter()
 
 
 @router.get("", response_model=List[UserListResponse])
-def list_users(
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+async def list_users(
+    current_user: AuthenticatedUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """List all users (admin only)"""
-    users = get_all_users(db)
+    users = await get_all_users(db)
     return users
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user_endpoint(
+async def delete_user_endpoint(
     user_id: int,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: AuthenticatedUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a user (admin only)"""
     # Prevent self-deletion
@@ -34,5 +35,10 @@ def delete_user_endpoint(
             detail="Cannot delete your own account"
         )
 
-    delete_user(db, user_id)
+    events = await delete_user(db, user_id)
+
+    # Their uploads leave the file list
+    for event in events:
+        await websocket_manager.broadcast(event)
+
     return None
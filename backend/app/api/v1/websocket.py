@@ -1,18 +1,64 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from pydantic import TypeAdapter, ValidationError
+from typing import Optional
+import json
+from app.api.deps import authenticate_websocket
 from app.core.websocket_manager import websocket_manager
+from app.schemas.websocket import RowStreamMessage
+from app.services.row_stream_service import RowSubscriptions, send_error
 
 router = APIRouter()
 
+ROW_STREAM_EVENTS = ("subscribe", "ack", "unsubscribe")
+
+row_stream_message = TypeAdapter(RowStreamMessage)
+
 
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time updates"""
+async def websocket_endpoint(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """WebSocket endpoint for real-time updates
+
+    Every connection receives broadcast events. Connections opened with a
+    valid token can also subscribe to a file's rows; see the WebSocket
+    Events section of the README for the protocol.
+    """
+    try:
+        current_user = await authenticate_websocket(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
     await websocket_manager.connect(websocket)
+    subscriptions = RowSubscriptions(websocket)
     try:
         while True:
-            # Keep connection alive and handle any incoming messages
+            # Any message, including the reply to a ping, keeps the connection alive
             data = await websocket.receive_text()
+            websocket_manager.touch(websocket)
+            message = _parse(data)
+            event = message.get("event") if message is not None else None
+            if event == "pong":
+                continue
+            if event in ROW_STREAM_EVENTS:
+                if current_user is None:
+                    await send_error(websocket, "Connect with a token to subscribe to rows")
+                    continue
+                try:
+                    await subscriptions.handle(row_stream_message.validate_python(message))
+                except ValidationError as e:
+                    await send_error(websocket, f"Invalid {event} message: {e.errors(include_url=False)}")
+                continue
             # Echo back or handle client messages if needed
-            await websocket.send_text(f"Message received: {data}")
+            await websocket_manager.send(websocket, {"event": "echo", "message": f"Message received: {data}"})
     except WebSocketDisconnect:
         websocket_manager.disconnect(websocket)
+    finally:
+        subscriptions.close()
+
+
+def _parse(data: str) -> Optional[dict]:
+    try:
+        message = json.loads(data)
+    except ValueError:
+        return None
+    return message if isinstance(message, dict) else None
@@ -0,0 +1,240 @@
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+import asyncio
+import errno
+import glob
+import logging
+import os
+import socket
+import stat
+from app.config import settings
+from app.database.connection import async_engine
+
+logger = logging.getLogger(__name__)
+
+# Called with every published message, including this process's own
+Deliver = Callable[[str], None]
+
+# NOTIFY payloads must be shorter than 8000 bytes
+POSTGRES_MAX_PAYLOAD = 7999
+
+# Seconds between attempts to restore a lost LISTEN connection
+POSTGRES_RECONNECT_DELAY = 1.0
+
+
+class BroadcastBackend(ABC):
+    """Carries broadcast messages between the processes serving WebSockets
+
+    publish sends a serialized message to every process, which hands it to
+    the deliver callback given to start. Delivery is best effort: messages
+    published while a process is unreachable are lost, and clients rely on
+    list versions to catch up.
+    """
+
+    @abstractmethod
+    async def start(self, deliver: Deliver) -> None:
+        """Begin receiving messages, handing each to deliver"""
+
+    @abstractmethod
+    async def stop(self) -> None:
+        """Stop receiving messages and release the backend's resources"""
+
+    @abstractmethod
+    async def publish(self, message: str) -> None:
+        """Send a serialized message to every process, this one included"""
+
+
+class MemoryBackend(BroadcastBackend):
+    """Delivers messages within this process only; for a single worker"""
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+    async def publish(self, message: str) -> None:
+        if self._deliver is not None:
+            self._deliver(message)
+
+
+class PostgresBackend(BroadcastBackend):
+    """Fans messages out through PostgreSQL LISTEN/NOTIFY
+
+    Each process holds one asyncpg connection listening on channel and
+    publishes with pg_notify over the async engine's pool, so workers on any
+    host sharing the database see every message. A dropped listener is
+    reconnected in the background.
+    """
+
+    def __init__(self, database_url: str, channel: str):
+        self.dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.channel = channel
+        self._deliver: Optional[Deliver] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        connected = asyncio.get_running_loop().create_future()
+        self._listener = asyncio.create_task(self._listen(connected))
+        # Fail startup if the database is unreachable rather than run deaf
+        await connected
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        self._deliver = None
+
+    async def publish(self, message: str) -> None:
+        if len(message.encode("utf-8")) > POSTGRES_MAX_PAYLOAD:
+            logger.warning("Broadcast of %d characters is too large for NOTIFY; delivering locally", len(message))
+            self._deliver_local(message)
+            return
+        try:
+            async with async_engine.begin() as connection:
+                await connection.execute(
+                    text("SELECT pg_notify(:channel, :payload)"),
+                    {"channel": self.channel, "payload": message}
+                )
+        except Exception:
+            # The change itself is committed; at least reach this process's clients
+            logger.exception("Could not publish broadcast; delivering locally")
+            self._deliver_local(message)
+
+    def _deliver_local(self, message: str) -> None:
+        if self._deliver is not None:
+            self._deliver(message)
+
+    async def _listen(self, connected: asyncio.Future) -> None:
+        # Only deployments using this backend need the driver
+        import asyncpg
+
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(self.channel, self._on_notify)
+                if not connected.done():
+                    connected.set_result(None)
+                await closed.wait()
+                logger.warning("Broadcast listener connection lost; reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not connected.done():
+                    connected.set_exception(e)
+                    return
+                logger.warning("Could not reconnect broadcast listener: %s", e)
+            finally:
+                if connection is not None and not connection.is_closed():
+                    connection.terminate()
+            await asyncio.sleep(POSTGRES_RECONNECT_DELAY)
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        self._deliver_local(payload)
+
+
+class UnixSocketBackend(BroadcastBackend):
+    """Fans messages out to worker processes on one host over Unix datagrams
+
+    Each process binds a datagram socket named after its pid in
+    socket_dir, and publishing sends the message to every socket found
+    there. Sockets left behind by processes that died are removed the
+    first time a send to them is refused. Any process that can write to
+    socket_dir can inject messages, so it is created private to the user
+    running the server, and an existing one other users can write to is
+    refused.
+    """
+
+    def __init__(self, socket_dir: str):
+        self.socket_dir = socket_dir
+        self.path: Optional[str] = None
+        self._socket: Optional[socket.socket] = None
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        os.makedirs(self.socket_dir, mode=0o700, exist_ok=True)
+        info = os.stat(self.socket_dir)
+        if info.st_uid != os.geteuid() or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise RuntimeError(
+                f"Broadcast socket directory {self.socket_dir} must be owned by this user and not writable by others"
+            )
+        # Named when started, since servers may fork workers after import
+        self.path = os.path.join(self.socket_dir, f"{os.getpid()}.sock")
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self._socket.bind(self.path)
+        asyncio.get_running_loop().add_reader(self._socket.fileno(), self._on_readable)
+
+    async def stop(self) -> None:
+        if self._socket is not None:
+            asyncio.get_running_loop().remove_reader(self._socket.fileno())
+            self._socket.close()
+            self._socket = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+        self._deliver = None
+
+    async def publish(self, message: str) -> None:
+        if self._socket is None:
+            return
+        data = message.encode("utf-8")
+        for path in glob.glob(os.path.join(self.socket_dir, "*.sock")):
+            try:
+                self._socket.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                self._remove_stale(path)
+            except BlockingIOError:
+                logger.warning("Broadcast socket %s is full; message dropped for that process", path)
+            except OSError as e:
+                if e.errno == errno.EMSGSIZE:
+                    logger.warning("Broadcast of %d bytes is too large for a datagram; delivering locally", len(data))
+                    if self._deliver is not None:
+                        self._deliver(message)
+                    return
+                logger.warning("Could not send broadcast to %s: %s", path, e)
+
+    def _on_readable(self) -> None:
+        while self._socket is not None:
+            try:
+                data = self._socket.recv(1 << 20)
+            except BlockingIOError:
+                return
+            if self._deliver is not None:
+                self._deliver(data.decode("utf-8"))
+
+    def _remove_stale(self, path: str) -> None:
+        if path == self.path:
+            return
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def create_backend(name: str) -> BroadcastBackend:
+    """Broadcast backend configured as ws_broadcast_backend"""
+    if name == "memory":
+        return MemoryBackend()
+    if name == "postgres":
+        return PostgresBackend(settings.database_url, settings.ws_broadcast_channel)
+    if name == "unix":
+        # A shared default would let other deployments on the host exchange messages
+        if not settings.ws_broadcast_socket_dir:
+            raise ValueError("Set WS_BROADCAST_SOCKET_DIR to use the unix WebSocket broadcast backend")
+        return UnixSocketBackend(settings.ws_broadcast_socket_dir)
+    raise ValueError(f"Unknown WebSocket broadcast backend {name!r}; use memory, postgres or unix")
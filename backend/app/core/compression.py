@@ -0,0 +1,159 @@
+from typing import List, Optional, Tuple
+import zlib
+import brotli
+import zstandard
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Media types worth compressing; binary formats like Arrow still shrink well
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/x-msgpack",
+    "application/vnd.apache.arrow.stream",
+    "text/",
+)
+
+# Preferred first when the client accepts several with the same q value
+ENCODINGS = ("zstd", "br", "gzip")
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        body = self._compressor.compress(data)
+        # Sync-flush partial output so streamed chunks reach the client promptly
+        return body + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        body = self._compressor.process(data)
+        return body + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class _Zstd:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        body = self._compressor.compress(data)
+        mode = zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        return body + self._compressor.flush(mode)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick zstd, br or gzip from an Accept-Encoding header by q value"""
+    if not accept_encoding:
+        return None
+
+    qualities = {}
+    for entry in accept_encoding.split(","):
+        name, _, parameters = entry.strip().partition(";")
+        quality = 1.0
+        parameter, _, value = parameters.strip().partition("=")
+        if parameter.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip().lower()] = quality
+
+    candidates = [
+        (qualities.get(encoding, qualities.get("*", 0.0)), -rank, encoding)
+        for rank, encoding in enumerate(ENCODINGS)
+    ]
+    quality, _, encoding = max(candidates)
+    return encoding if quality > 0 else None
+
+
+class CompressionMiddleware:
+    """Compress responses with zstd, brotli or gzip as the client accepts
+
+    Bodies are compressed chunk by chunk and flushed after every chunk, so
+    streaming responses stay incremental. Responses with a known length
+    below minimum_size, already encoded responses and media types outside
+    COMPRESSIBLE_TYPES pass through unchanged. Strong ETags of compressed
+    responses get the encoding appended.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4, zstd_level: int = 3):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality, "zstd": zstd_level}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        # A compressed body can't be sent straight from the file
+        extensions = {name: value for name, value in scope.get("extensions", {}).items() if name != "http.response.zerocopy"}
+        responder = _CompressingResponder(send, encoding, self.levels[encoding], self.minimum_size)
+        await self.app({**scope, "extensions": extensions}, receive, responder.send)
+
+
+class _CompressingResponder:
+    def __init__(self, send: Send, encoding: str, level: int, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.compressor = None
+        self.start: Optional[Message] = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows whether to compress
+            self.start = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=list(start["headers"]))
+            if not self._should_compress(headers, message):
+                self.passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+
+            self.compressor = {"gzip": _Gzip, "br": _Brotli, "zstd": _Zstd}[self.encoding](self.level)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and etag.startswith('"'):
+                # A strong ETag names exact bytes, so each encoding gets its own
+                headers["ETag"] = f'{etag[:-1]}-{self.encoding}"'
+            if "content-length" in headers:
+                del headers["content-length"]
+            await self._send({**start, "headers": headers.raw})
+
+        more_body = message.get("more_body", False)
+        body = self.compressor.compress(bytes(message.get("body", b"")), final=not more_body)
+        await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    def _should_compress(self, headers: MutableHeaders, first_body: Message) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        if "content-length" in headers:
+            return int(headers["content-length"]) >= self.minimum_size
+        # Unknown length: a streamed response, unless it ends in its first chunk
+        return first_body.get("more_body", False) or len(first_body.get("body", b"")) >= self.minimum_size
@@ -0,0 +1,103 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+import threading
+from app.config import settings
+
+
+class ContentCache:
+    """Byte-budgeted LRU cache of parsed CSV content
+
+    Keys are (file_id, version) tuples, where version identifies the stored
+    bytes (content hash or mtime). Concurrent misses on the same key are
+    coalesced so only one caller runs the loader; the others wait for its
+    result. Route handlers run in worker threads, so access is guarded by a
+    threading lock.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._loading: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get_or_load(self, key: Tuple[int, Hashable], loader: Callable[[], Tuple[Any, int]]) -> Any:
+        """Return the cached value for key, running loader on a miss
+
+        loader returns (value, size_in_bytes). Values larger than the whole
+        budget are returned but not stored.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            future = self._loading.get(key)
+            if future is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                future = Future()
+                self._loading[key] = future
+                self.misses += 1
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            value, size = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._loading[key]
+            if size <= self.max_bytes:
+                self._entries[key] = (value, size)
+                self.current_bytes += size
+                self._evict()
+        future.set_result(value)
+        return value
+
+    def invalidate(self, file_id: int) -> None:
+        """Drop every cached version of a file"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == file_id]:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+            }
+
+    def _evict(self) -> None:
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+
+
+# Global parsed-content cache instance
+content_cache = ContentCache(settings.content_cache_max_bytes)
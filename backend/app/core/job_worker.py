@@ -0,0 +1,86 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, List, Optional
+import asyncio
+import logging
+import multiprocessing
+import os
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorker:
+    """Runs queued jobs on the event loop and CPU-bound steps in a process pool
+
+    Job handlers are coroutines that receive a job id; they offload heavy work
+    with run_in_process, so parsing never holds the GIL of the process serving
+    requests.
+    """
+
+    def __init__(self, process_workers: Optional[int], concurrency: int):
+        self.process_workers = process_workers or os.cpu_count() or 1
+        self.concurrency = concurrency
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._handler: Optional[Callable[[int], Awaitable[None]]] = None
+
+    async def start(self, handler: Callable[[int], Awaitable[None]]) -> None:
+        """Create the process pool and start consuming queued jobs"""
+        self._handler = handler
+        self._queue = asyncio.Queue()
+        # Spawned workers don't inherit the server's threads, sockets or locks
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.process_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """Stop consuming jobs and shut the process pool down"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def enqueue(self, job_id: int) -> None:
+        """Queue a job; ignored until the worker has been started"""
+        if self._queue is None:
+            logger.warning("Job worker is not running; job %s stays queued", job_id)
+            return
+        self._queue.put_nowait(job_id)
+
+    async def run_in_process(self, function: Callable[..., Any], *args: Any) -> Any:
+        """Run a picklable top-level function in the process pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, function, *args)
+
+    def scan_parts(self, file_size: int) -> int:
+        """Number of byte ranges to split a full scan of a file into
+
+        Returns 1 (scan in the calling thread) for small files or while the
+        process pool is not running.
+        """
+        if self.pool is None or file_size < settings.parallel_scan_min_size:
+            return 1
+        ranges = -(-file_size // settings.parallel_scan_range_size)
+        return max(self.process_workers, ranges)
+
+    async def _consume(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._handler(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job %s failed", job_id)
+            finally:
+                self._queue.task_done()
+
+
+# Global job worker instance
+job_worker = JobWorker(settings.job_process_workers, settings.job_concurrency)
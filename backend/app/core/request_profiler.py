@@ -0,0 +1,104 @@
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import cProfile
+import logging
+import os
+import random
+import re
+import tempfile
+import time
+import uuid
+from starlette.types import Scope
+from app.config import settings
+
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+
+class _Profile:
+    """A request's profile; not sampled when profiler is None"""
+
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+        self.elapsed: Optional[float] = None
+        self.name = ""
+
+    def finish(self, elapsed: float, name: str) -> None:
+        """Record the request's duration and name once it has been answered"""
+        self.elapsed = elapsed
+        self.name = name
+
+
+class RequestProfiler:
+    """Profiles sample_rate of requests, one at a time
+
+    Profiles of requests that took at least slow_ms milliseconds are written
+    to directory; the rest are discarded. Uses the pyinstrument sampling
+    profiler when it is installed, which follows the request's own task
+    across awaits. The cProfile fallback records everything on the event
+    loop thread while the request is in flight, other requests included.
+    """
+
+    def __init__(self, sample_rate: float, slow_ms: int, directory: str):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.directory = directory
+        self._active = False
+
+    @contextmanager
+    def profile(self, scope: Scope) -> Iterator[_Profile]:
+        # Only one profiler can be active at a time
+        if self.sample_rate <= 0 or self._active or random.random() >= self.sample_rate:
+            yield _Profile()
+            return
+
+        self._active = True
+        try:
+            if Profiler is not None:
+                profiler = Profiler(async_mode="enabled")
+                profiler.start()
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+            profile = _Profile(profiler)
+            try:
+                yield profile
+            finally:
+                if Profiler is not None:
+                    profiler.stop()
+                else:
+                    profiler.disable()
+            if profile.elapsed is not None and profile.elapsed * 1000 >= self.slow_ms:
+                self._save(profile)
+        finally:
+            self._active = False
+
+    def _save(self, profile: _Profile) -> None:
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", profile.name).strip("-")
+        elapsed_ms = int(profile.elapsed * 1000)
+        base = os.path.join(self.directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}-{elapsed_ms}ms-{slug}")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if Profiler is not None:
+                path = f"{base}.html"
+                with open(path, "w", encoding="utf-8") as file:
+                    file.write(profile.profiler.output_html())
+            else:
+                path = f"{base}.prof"
+                profile.profiler.dump_stats(path)
+        except Exception:
+            logger.exception("Could not save the profile of a slow request")
+            return
+        logger.warning("%s took %d ms; profile saved to %s", profile.name, elapsed_ms, path)
+
+
+# Global request profiler instance
+request_profiler = RequestProfiler(
+    sample_rate=settings.profile_sample_rate,
+    slow_ms=settings.profile_slow_request_ms,
+    directory=settings.profile_dir or os.path.join(tempfile.gettempdir(), "csv-browser-profiles")
+)
@@ -0,0 +1,61 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import threading
+import time
+from app.config import settings
+
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Identity and role of the user making a request"""
+    id: int
+    username: str
+    role: str
+    # When the account was created; tokens issued earlier were issued to a
+    # deleted account of the same name
+    created_at: Optional[datetime] = field(default=None, compare=False)
+
+
+class UserCache:
+    """Short-lived cache of authenticated users, keyed by token subject
+
+    Entries expire after ttl seconds, so in a process other than the one that
+    deleted a user, the user is still accepted for at most that long.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, AuthenticatedUser]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, username: str) -> Optional[AuthenticatedUser]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires <= time.monotonic():
+                del self._entries[username]
+                return None
+            return user
+
+    def put(self, user: AuthenticatedUser) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {name: entry for name, entry in self._entries.items() if entry[0] > now}
+                if len(self._entries) >= self.max_entries:
+                    # Still full of live entries: drop the oldest
+                    del self._entries[next(iter(self._entries))]
+            self._entries[user.username] = (now + self.ttl, user)
+
+    def invalidate(self, username: str) -> None:
+        """Forget a deleted user, so this process looks them up again"""
+        with self._lock:
+            self._entries.pop(username, None)
+
+
+# Global user cache instance
+user_cache = UserCache(ttl=settings.auth_user_cache_ttl)
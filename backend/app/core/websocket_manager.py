@@ -1,38 +1,207 @@
-from typing import List
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Set, Tuple
 from fastapi import WebSocket
+import asyncio
+import itertools
 import json
+import logging
+import time
+from app.config import settings
+from app.core.broadcast import BroadcastBackend, create_backend
+
+logger = logging.getLogger(__name__)
+
+
+class _Client:
+    """One connection's outbound queue, drained by its own sender task
+
+    Pending messages are keyed so a newer message can replace an unsent one
+    with the same coalesce key. When the queue is full the oldest droppable
+    message is dropped; list events carry versions, so clients notice the
+    gap and catch up. Messages that can't be dropped, such as row batches
+    already bounded by the client's credits, may exceed max_pending.
+    """
+
+    def __init__(self, websocket: WebSocket, max_pending: int):
+        self.websocket = websocket
+        self.max_pending = max_pending
+        self.pending: "OrderedDict[Hashable, Tuple[str, bool]]" = OrderedDict()
+        self.ready = asyncio.Event()
+        self.last_seen = time.monotonic()
+        self.dropped = 0
+        self.sender: Optional[asyncio.Task] = None
+
+    def enqueue(self, key: Hashable, text: str, droppable: bool = True) -> None:
+        if key in self.pending:
+            self.pending[key] = (text, droppable)
+            return
+        if len(self.pending) >= self.max_pending:
+            oldest = next((pending for pending, (_, can_drop) in self.pending.items() if can_drop), None)
+            if oldest is not None:
+                del self.pending[oldest]
+                self.dropped += 1
+        self.pending[key] = (text, droppable)
+        self.ready.set()
 
 
 class ConnectionManager:
-    """Manages WebSocket connections and broadcasts messages"""
+    """Manages WebSocket connections and broadcasts messages
+
+    broadcast publishes the message through the broadcast backend, which
+    delivers it to the manager of every worker process; each queues it for
+    its own connections. A sender task per connection writes it out, so a
+    slow client delays nobody else. A heartbeat pings every client and
+    closes those that have sent nothing for idle_timeout seconds.
+    """
+
+    def __init__(
+        self,
+        backend: BroadcastBackend,
+        max_pending: int,
+        send_timeout: float,
+        heartbeat_interval: float,
+        idle_timeout: float
+    ):
+        self.backend = backend
+        self.max_pending = max_pending
+        self.send_timeout = send_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.active_connections: Dict[WebSocket, _Client] = {}
+        self._sequence = itertools.count()
+        # The loop only keeps weak references to tasks; cancelled senders
+        # must survive until they have finished
+        self._senders: Set[asyncio.Task] = set()
+        self._heartbeat: Optional[asyncio.Task] = None
 
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    async def start(self) -> None:
+        """Subscribe to broadcasts and start pinging clients and evicting idle ones"""
+        await self.backend.start(self._deliver)
+        self._heartbeat = asyncio.create_task(self._run_heartbeat())
+
+    async def stop(self) -> None:
+        """Stop the heartbeat and close every connection"""
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+        await self.backend.stop()
+        await asyncio.gather(
+            *(self._close(websocket, 1001) for websocket in list(self.active_connections)),
+            return_exceptions=True
+        )
 
     async def connect(self, websocket: WebSocket):
         """Accept a new WebSocket connection"""
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = _Client(websocket, self.max_pending)
+        client.sender = asyncio.create_task(self._send_loop(client))
+        self._senders.add(client.sender)
+        client.sender.add_done_callback(self._senders.discard)
+        self.active_connections[websocket] = client
 
     def disconnect(self, websocket: WebSocket):
         """Remove a WebSocket connection"""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.active_connections.pop(websocket, None)
+        if client is not None and client.sender is not None:
+            client.sender.cancel()
+
+    def touch(self, websocket: WebSocket) -> None:
+        """Record that a client is alive; call on every message received"""
+        client = self.active_connections.get(websocket)
+        if client is not None:
+            client.last_seen = time.monotonic()
+
+    async def send(
+        self,
+        websocket: WebSocket,
+        message: dict,
+        coalesce_key: Optional[str] = None,
+        droppable: bool = True
+    ) -> None:
+        """Queue a message for one client
+
+        Pass droppable=False for messages the client must receive, whose
+        number the caller bounds itself.
+        """
+        client = self.active_connections.get(websocket)
+        if client is not None:
+            client.enqueue(self._key(coalesce_key), json.dumps(message), droppable)
+
+    async def broadcast(self, message: dict, coalesce_key: Optional[str] = None):
+        """Broadcast a message to all connected clients of every worker
+
+        Returns once the message is published. Unsent messages with the same
+        coalesce_key are replaced by this one.
+        """
+        await self.backend.publish(json.dumps({"coalesce_key": coalesce_key, "message": message}))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "connections": len(self.active_connections),
+            "pending": sum(len(client.pending) for client in self.active_connections.values()),
+            "dropped": sum(client.dropped for client in self.active_connections.values()),
+        }
+
+    def _deliver(self, data: str) -> None:
+        try:
+            envelope = json.loads(data)
+            message_json = json.dumps(envelope["message"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed broadcast")
+            return
+        key = self._key(envelope.get("coalesce_key"))
+        for client in self.active_connections.values():
+            client.enqueue(key, message_json)
+
+    def _key(self, coalesce_key: Optional[str]) -> Hashable:
+        return coalesce_key if coalesce_key is not None else next(self._sequence)
+
+    async def _send_loop(self, client: _Client) -> None:
+        try:
+            while True:
+                await client.ready.wait()
+                while client.pending:
+                    _, (text, _) = client.pending.popitem(last=False)
+                    await asyncio.wait_for(client.websocket.send_text(text), self.send_timeout)
+                client.ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Stalled past send_timeout or already gone; this task is the
+            # sender, so remove the connection without cancelling it
+            logger.debug("Closing WebSocket that failed to receive", exc_info=True)
+            self.active_connections.pop(client.websocket, None)
+            await self._close_socket(client.websocket, 1011)
+
+    async def _run_heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            now = time.monotonic()
+            idle = []
+            for websocket, client in list(self.active_connections.items()):
+                if now - client.last_seen > self.idle_timeout:
+                    idle.append(websocket)
+                else:
+                    client.enqueue("ping", '{"event": "ping"}')
+            await asyncio.gather(*(self._close(websocket, 1001) for websocket in idle), return_exceptions=True)
 
-    async def broadcast(self, message: dict):
-        """Broadcast a message to all connected clients"""
-        message_json = json.dumps(message)
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message_json)
-            except Exception:
-                disconnected.append(connection)
+    async def _close(self, websocket: WebSocket, code: int) -> None:
+        self.disconnect(websocket)
+        await self._close_socket(websocket, code)
 
-        # Remove disconnected clients
-        for connection in disconnected:
-            self.disconnect(connection)
+    async def _close_socket(self, websocket: WebSocket, code: int) -> None:
+        try:
+            await asyncio.wait_for(websocket.close(code=code), self.send_timeout)
+        except Exception:
+            pass
 
 
 # Global WebSocket manager instance
-websocket_manager = ConnectionManager()
+websocket_manager = ConnectionManager(
+    backend=create_backend(settings.ws_broadcast_backend),
+    max_pending=settings.ws_send_queue_size,
+    send_timeout=settings.ws_send_timeout,
+    heartbeat_interval=settings.ws_heartbeat_interval,
+    idle_timeout=settings.ws_idle_timeout
+)
@@ -0,0 +1,38 @@
+import os
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+from app.database.connection import engine
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Schema of databases created with create_all before migrations were added
+BASELINE_REVISION = "0001"
+
+# Serializes upgrades by workers starting at the same time on PostgreSQL
+MIGRATION_LOCK_ID = 0x63737662
+
+
+def alembic_config() -> Config:
+    """Alembic configuration for this backend, independent of the working directory"""
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    return config
+
+
+def upgrade_database() -> None:
+    """Create the tables or upgrade them to the latest revision
+
+    A database that has tables but no recorded revision predates migrations
+    and is stamped at the baseline first, so its upgrade adds what is
+    missing.
+    """
+    config = alembic_config()
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        config.attributes["connection"] = connection
+        tables = inspect(connection).get_table_names()
+        if "users" in tables and "alembic_version" not in tables:
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
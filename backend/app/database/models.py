@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, BigInteger, ForeignKey, TIMESTAMP, CheckConstraint
+from sqlalchemy import Column, Integer, String, BigInteger, ForeignKey, TIMESTAMP, CheckConstraint, Text, JSON, DDL, Index, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database.connection import Base
@@ -28,8 +28,103 @@ class CSVFile(Base):
     filename = Column(String(255), nullable=False)
     path = Column(String(500), nullable=False)
     size = Column(BigInteger, nullable=False)
+    total_rows = Column(BigInteger, nullable=True)
+    index_path = Column(String(500), nullable=True)
+    columnar_path = Column(String(500), nullable=True)
+    content_hash = Column(String(64), nullable=True, index=True)
+    delimiter = Column(String(1), nullable=False, default=",", server_default=",")
     uploaded_by = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
-    uploaded_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), index=True)
+    uploaded_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
     # Relationships
     uploader = relationship("User", back_populates="csv_files")
+    column_profiles = relationship(
+        "CSVColumnProfile",
+        back_populates="csv_file",
+        cascade="all, delete-orphan",
+        order_by="CSVColumnProfile.position"
+    )
+    processing_jobs = relationship(
+        "ProcessingJob",
+        back_populates="csv_file",
+        cascade="all, delete-orphan",
+        order_by="ProcessingJob.id"
+    )
+
+    __table_args__ = (
+        # Keyset pagination of the file list, newest first
+        Index("ix_csv_files_uploaded_at_id", "uploaded_at", "id"),
+        # Filename prefix and substring search with ILIKE
+        Index(
+            "ix_csv_files_filename_trgm",
+            "filename",
+            postgresql_using="gin",
+            postgresql_ops={"filename": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+# The trigram index needs the pg_trgm extension
+event.listen(
+    CSVFile.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+
+class CSVColumnProfile(Base):
+    __tablename__ = "csv_column_profiles"
+
+    id = Column(Integer, primary_key=True, index=True)
+    csv_file_id = Column(Integer, ForeignKey("csv_files.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    name = Column(String(255), nullable=False)
+    inferred_type = Column(String(20), nullable=False)
+    null_count = Column(BigInteger, nullable=False)
+    value_count = Column(BigInteger, nullable=False)
+    min_value = Column(Text, nullable=True)
+    max_value = Column(Text, nullable=True)
+    distinct_estimate = Column(BigInteger, nullable=False)
+    top_values = Column(JSON, nullable=False)
+    histogram = Column(JSON, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    # Relationships
+    csv_file = relationship("CSVFile", back_populates="column_profiles")
+
+
+class ProcessingJob(Base):
+    __tablename__ = "processing_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    csv_file_id = Column(Integer, ForeignKey("csv_files.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    stage = Column(String(50), nullable=True)
+    progress = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    csv_file = relationship("CSVFile", back_populates="processing_jobs")
+
+    __table_args__ = (
+        CheckConstraint("status IN ('queued', 'running', 'succeeded', 'failed')", name="check_job_status"),
+    )
+
+
+class CSVListChange(Base):
+    __tablename__ = "csv_list_changes"
+
+    # The list version: every change to the file list gets the next one
+    version = Column(Integer, primary_key=True, autoincrement=True)
+    op = Column(String(20), nullable=False)
+    # No foreign key: deletions outlive the file they describe
+    csv_file_id = Column(Integer, nullable=False)
+    # The file's list entry for added and updated files
+    file = Column(JSON, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        CheckConstraint("op IN ('added', 'updated', 'deleted')", name="check_list_change_op"),
+    )
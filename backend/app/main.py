@@ -1,17 +1,39 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.responses import Response
 from app.config import settings
 from app.api.v1 import auth, csv, users, websocket
-from app.database.connection import engine
-from app.database.models import Base
+from app.database.connection import async_engine
+from app.database.migrations import upgrade_database
+from app.core.compression import CompressionMiddleware
+from app.core.content_cache import content_cache
+from app.core.job_worker import job_worker
+from app.core.metrics import PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, metrics
+from app.core.websocket_manager import websocket_manager
+from app.services.job_service import run_processing_job, requeue_unfinished_jobs
+
+# Create the database tables or upgrade them to the current schema
+upgrade_database()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run post-upload processing jobs and WebSocket heartbeats for the lifetime of the server"""
+    await websocket_manager.start()
+    await job_worker.start(run_processing_job)
+    requeue_unfinished_jobs()
+    yield
+    await job_worker.stop()
+    await websocket_manager.stop()
+    await async_engine.dispose()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="CSV Browser API",
     description="Real-Time CSV Browser with Role-Based Access Control",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -21,8 +43,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-List-Version", "Link"],
 )
 
+# Compression middleware (zstd, brotli or gzip, negotiated per request)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_size)
+
+# Metrics middleware, outermost so timings include every other middleware
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(csv.router, prefix="/api/v1/csv", tags=["CSV Management"])
@@ -44,3 +74,46 @@ def root():
 def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
+
+
+def _pool_connections():
+    values = {}
+    for name, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+        # Only queue pools keep counts; SQLite may use pools without them
+        if hasattr(pool, "checkedout"):
+            values[(name, "checked_out")] = pool.checkedout()
+            values[(name, "idle")] = pool.checkedin()
+            values[(name, "overflow")] = max(pool.overflow(), 0)
+            values[(name, "size")] = pool.size()
+    return values
+
+
+metrics.gauge(
+    "csv_browser_db_pool_connections",
+    "Database pool connections by engine and state",
+    _pool_connections,
+    ("engine", "state")
+)
+metrics.gauge(
+    "csv_browser_websocket_connections",
+    "Open WebSocket connections",
+    lambda: {(): websocket_manager.stats()["connections"]}
+)
+metrics.gauge(
+    "csv_browser_websocket_pending_messages",
+    "Messages queued for WebSocket clients",
+    lambda: {(): websocket_manager.stats()["pending"]}
+)
+metrics.gauge(
+    "csv_browser_content_cache",
+    "Parsed content cache statistics",
+    lambda: {(name,): value for name, value in content_cache.stats().items()},
+    ("stat",)
+)
+
+
+if settings.metrics_enabled:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics_endpoint():
+        """Prometheus metrics of this worker process"""
+        return Response(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
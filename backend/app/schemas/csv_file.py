@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Literal, Union
 
 
 class CSVFileBase(BaseModel):
@@ -26,6 +26,7 @@ class CSVFileListResponse(BaseModel):
     id: int
     filename: str
     size: int
+    total_rows: Optional[int] = None
     uploaded_at: datetime
 
     class Config:
@@ -35,5 +36,92 @@ class CSVFileListResponse(BaseModel):
 class CSVContentResponse(BaseModel):
     filename: str
     headers: List[str]
-    rows: List[Dict[str, Any]]
+    layout: Literal["objects", "rows", "columns"] = "objects"
+    # objects: one dict per row; rows: one list per row; columns: one list per column
+    rows: Union[List[Dict[str, Any]], List[List[Optional[str]]]]
     total_rows: int
+    matched_rows: Optional[int] = None
+    offset: int = 0
+    limit: Optional[int] = None
+    next_after_row: Optional[int] = None
+
+
+class AggregateMetric(BaseModel):
+    op: Literal["count", "sum", "min", "max", "mean", "approx_distinct", "approx_percentile"]
+    column: Optional[str] = None
+    percentile: Optional[float] = Field(None, ge=0, le=100)
+    alias: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_arguments(self) -> "AggregateMetric":
+        if self.column is None and self.op != "count":
+            raise ValueError(f"{self.op} requires a column")
+        if self.op == "approx_percentile" and self.percentile is None:
+            raise ValueError("approx_percentile requires a percentile between 0 and 100")
+        return self
+
+
+class AggregateRequest(BaseModel):
+    group_by: List[str] = []
+    metrics: List[AggregateMetric] = Field(..., min_length=1)
+    filter: List[str] = []
+
+
+class AggregateResponse(BaseModel):
+    filename: str
+    group_by: List[str]
+    metrics: List[str]
+    rows: List[Dict[str, Any]]
+    rows_scanned: int
+
+
+class ColumnProfileResponse(BaseModel):
+    position: int
+    name: str
+    inferred_type: str
+    null_count: int
+    value_count: int
+    min_value: Optional[str] = None
+    max_value: Optional[str] = None
+    distinct_estimate: int
+    top_values: List[Dict[str, Any]]
+    histogram: Optional[List[Dict[str, Any]]] = None
+
+    class Config:
+        from_attributes = True
+
+
+class CSVProfileResponse(BaseModel):
+    file_id: int
+    filename: str
+    status: Literal["pending", "ready"]
+    total_rows: Optional[int] = None
+    columns: List[ColumnProfileResponse]
+
+
+class ProcessingJobResponse(BaseModel):
+    id: int
+    csv_file_id: int
+    status: str
+    stage: Optional[str] = None
+    progress: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class CSVListChangeResponse(BaseModel):
+    version: int
+    op: Literal["added", "updated", "deleted"]
+    file_id: int
+    # Set for added and updated files
+    file: Optional[CSVFileListResponse] = None
+
+
+class CSVListChangesResponse(BaseModel):
+    # The current list version; pass it as since to the next request
+    version: int
+    changes: List[CSVListChangeResponse]
@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Literal, Optional, Union
+
+
+class RowSubscribeMessage(BaseModel):
+    """Start streaming a file's rows from offset, replacing any subscription to it"""
+    event: Literal["subscribe"]
+    file_id: int
+    offset: int = Field(0, ge=0)
+    # Batches the client is ready to receive before acknowledging
+    credits: int = Field(1, ge=1)
+    filter: Optional[List[str]] = None
+    sort: Optional[str] = None
+
+
+class RowAckMessage(BaseModel):
+    """Grant more batches of a subscription"""
+    event: Literal["ack"]
+    file_id: int
+    credits: int = Field(1, ge=1)
+
+
+class RowUnsubscribeMessage(BaseModel):
+    event: Literal["unsubscribe"]
+    file_id: int
+
+
+RowStreamMessage = Annotated[
+    Union[RowSubscribeMessage, RowAckMessage, RowUnsubscribeMessage],
+    Field(discriminator="event")
+]
@@ -1,5 +1,7 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from app.database.models import User
 from app.core.security import hash_password, verify_password, create_access_token
 from app.schemas.auth import UserSignup, UserLogin
@@ -7,10 +9,10 @@ from datetime import timedelta
 from app.config import settings
 
 
-def signup_user(db: Session, user_data: UserSignup) -> User:
+async def signup_user(db: AsyncSession, user_data: UserSignup) -> User:
     """Register a new user with default role 'user'"""
     # Check if username already exists
-    existing_user = db.query(User).filter(User.username == user_data.username).first()
+    existing_user = await db.scalar(select(User).where(User.username == user_data.username))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -18,7 +20,8 @@ def signup_user(db: Session, user_data: UserSignup) -> User:
         )
 
     # Create new user
-    hashed_password = hash_password(user_data.password)
+    # bcrypt is deliberately slow; keep it off the event loop
+    hashed_password = await run_in_threadpool(hash_password, user_data.password)
     new_user = User(
         username=user_data.username,
         password_hash=hashed_password,
@@ -26,16 +29,16 @@ def signup_user(db: Session, user_data: UserSignup) -> User:
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 
-def login_user(db: Session, user_data: UserLogin) -> str:
+async def login_user(db: AsyncSession, user_data: UserLogin) -> str:
     """Authenticate user and return JWT token"""
-    user = db.query(User).filter(User.username == user_data.username).first()
+    user = await db.scalar(select(User).where(User.username == user_data.username))
 
-    if not user or not verify_password(user_data.password, user.password_hash):
+    if not user or not await run_in_threadpool(verify_password, user_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
@@ -45,6 +48,7 @@ def login_user(db: Session, user_data: UserLogin) -> str:
     access_token_expires = timedelta(minutes=settings.jwt_access_token_expire_minutes)
     token_data = {
         "sub": user.username,
+        "uid": user.id,
         "role": user.role
     }
     access_token = create_access_token(data=token_data, expires_delta=access_token_expires)
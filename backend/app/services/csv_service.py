@@ -1,16 +1,91 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import ColumnElement, Delete, Select, String, and_, delete, func, or_, select, text, tuple_, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 from fastapi import HTTPException, status, UploadFile
-from app.database.models import CSVFile, User
-from typing import List
+from fastapi.concurrency import run_in_threadpool
+from app.database.models import CSVFile, CSVListChange, User
+from app.schemas.csv_file import AggregateRequest, CSVFileListResponse
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import base64
+import hashlib
+import itertools
+import json
 import os
+import shutil
+import sys
 import uuid
 from datetime import datetime
 from app.config import settings
-from app.utils.csv_parser import parse_csv_file
+from app.core.content_cache import content_cache
+from app.core.job_worker import job_worker
+from app.core.metrics import csv_bytes_read, csv_rows_parsed, span
+from app.utils.csv_parser import (
+    MappedCSVFile,
+    parse_csv_file,
+    read_csv_page,
+    row_to_dict,
+    iter_csv_rows,
+    iter_file_chunks,
+    sniff_csv_header,
+    map_csv_ranges
+)
+from app.utils.csv_index import load_row_index
+from app.utils.columnar import ColumnarTable
+from app.utils.aggregation import aggregate_rows, metric_name
+from app.utils.wire_formats import (
+    ARROW_STREAM_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    arrow_available,
+    iter_arrow_stream,
+    iter_msgpack_stream,
+    negotiate_media_type
+)
+from app.utils.query_engine import (
+    TYPE_SAMPLE_ROWS,
+    CountingIterator,
+    Predicate,
+    QueryCursor,
+    column_position,
+    infer_column_kinds,
+    parse_filter,
+    parse_sort,
+    run_query
+)
 
+# Rows serialized per chunk when streaming content
+STREAM_BATCH_ROWS = 500
 
-def upload_csv_file(db: Session, file: UploadFile, user_id: int) -> CSVFile:
-    """Upload and save a CSV file"""
+# Rows per Arrow record batch when streaming
+ARROW_BATCH_ROWS = 65536
+
+LIST_CHANGE_MESSAGES = {
+    "added": "CSV file uploaded",
+    "updated": "CSV file processed",
+    "deleted": "CSV file deleted",
+}
+
+# Taken before recording a list change so versions commit in order; it
+# conflicts with writes to the change log but not with reads
+LIST_CHANGE_LOCK = text("LOCK TABLE csv_list_changes IN SHARE ROW EXCLUSIVE MODE")
+
+# List changes are pruned once every this many versions
+LIST_CHANGE_PRUNE_INTERVAL = 100
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+    "csv": "text/csv",
+    "msgpack": MSGPACK_MEDIA_TYPE,
+    "arrow": ARROW_STREAM_MEDIA_TYPE,
+}
+
+
+async def upload_csv_file(db: AsyncSession, file: UploadFile, user_id: int) -> Tuple[CSVFile, CSVListChange]:
+    """Upload and save a CSV file, returning it and its file list change
+
+    The upload is copied in a worker thread so large files don't block the
+    event loop.
+    """
     # Validate file extension
     if not file.filename.endswith('.csv'):
         raise HTTPException(
@@ -18,47 +93,358 @@ def upload_csv_file(db: Session, file: UploadFile, user_id: int) -> CSVFile:
             detail="File must be a CSV file"
         )
 
-    # Generate unique filename
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(settings.upload_dir, unique_filename)
+    # Copy to a uniquely named temporary file; the final name depends on the hash
+    temp_path = os.path.join(settings.upload_dir, f"{uuid.uuid4()}.part")
+    with span("upload_store"):
+        stored = await run_in_threadpool(_store_upload, file, temp_path)
 
-    # Save file to disk
-    try:
-        with open(file_path, "wb") as buffer:
-            content = file.file.read()
-            buffer.write(content)
+    # Identical uploads share one content-addressed blob and its sidecars
+    file_path = os.path.join(settings.upload_dir, f"{stored['sha256']}.csv")
+    index_path = f"{file_path}.idx"
+    columnar_path = f"{file_path}.cols"
 
-        file_size = len(content)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to save file: {str(e)}"
-        )
+    # Reuse the row count and sidecars of an identical earlier upload; the
+    # processing job fills in whatever is missing
+    previous = await db.scalar(
+        select(CSVFile)
+        .where(CSVFile.content_hash == stored["sha256"], CSVFile.total_rows.isnot(None))
+        .limit(1)
+    )
+    indexed = previous is not None and os.path.exists(index_path)
 
     # Create database record
     csv_file = CSVFile(
         filename=file.filename,
         path=file_path,
-        size=file_size,
+        size=stored["size"],
+        total_rows=previous.total_rows if indexed else None,
+        index_path=index_path if indexed else None,
+        columnar_path=columnar_path if os.path.isdir(columnar_path) else None,
+        content_hash=stored["sha256"],
+        delimiter=stored["delimiter"],
         uploaded_by=user_id
     )
 
     db.add(csv_file)
-    db.commit()
-    db.refresh(csv_file)
+    await db.commit()
+    await db.refresh(csv_file)
 
-    return csv_file
+    # Move the blob into place only once the record exists, so a concurrent
+    # delete of another reference can't remove it from under this one.
+    # Replacing an existing blob is harmless since its bytes are identical.
+    try:
+        os.replace(temp_path, file_path)
+    except Exception as e:
+        _remove_quietly(temp_path)
+        # Nothing references the new record yet, so there is nothing to cascade
+        await db.execute(delete(CSVFile).where(CSVFile.id == csv_file.id))
+        await db.commit()
+        await remove_unreferenced_blob(db, file_path, [index_path, columnar_path])
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to save file: {str(e)}"
+        )
+
+    # Announced only once the file can be read
+    change = list_change("added", csv_file)
+    await lock_list_changes(db)
+    db.add(change)
+    await db.commit()
+    await prune_list_changes(db, change.version)
+    return csv_file, change
+
+
+def _store_upload(file: UploadFile, temp_path: str) -> Dict[str, Any]:
+    """Copy an upload to temp_path chunk by chunk
+
+    Hashes and counts the bytes as they are copied, so memory use is bounded
+    by settings.upload_chunk_size, and syncs the file to disk before
+    returning. The temporary file is removed if the copy fails.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    delimiter = None
+
+    try:
+        with open(temp_path, "wb") as buffer:
+            while True:
+                chunk = file.file.read(settings.upload_chunk_size)
+                if not chunk:
+                    break
+
+                size += len(chunk)
+                if size > settings.max_upload_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File exceeds the maximum upload size of {settings.max_upload_size} bytes"
+                    )
+
+                if delimiter is None:
+                    try:
+                        delimiter, _ = sniff_csv_header(chunk)
+                    except ValueError as e:
+                        raise HTTPException(
+                            status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=str(e)
+                        )
+
+                buffer.write(chunk)
+                sha256.update(chunk)
+
+            # The upload is acknowledged once its bytes are durable
+            buffer.flush()
+            os.fsync(buffer.fileno())
+
+        if delimiter is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="CSV file is empty"
+            )
+    except HTTPException:
+        _remove_quietly(temp_path)
+        raise
+    except Exception as e:
+        _remove_quietly(temp_path)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to save file: {str(e)}"
+        )
+
+    return {
+        "size": size,
+        "sha256": sha256.hexdigest(),
+        "delimiter": delimiter,
+    }
+
+
+async def get_csv_profile(db: AsyncSession, file_id: int) -> dict:
+    """Get the stored column statistics of a CSV file"""
+    csv_file = await get_csv_file_by_id(db, file_id, selectinload(CSVFile.column_profiles))
+    return {
+        "file_id": csv_file.id,
+        "filename": csv_file.filename,
+        "status": "ready" if csv_file.column_profiles else "pending",
+        "total_rows": csv_file.total_rows,
+        "columns": csv_file.column_profiles
+    }
+
+
+async def remove_unreferenced_blob(db: AsyncSession, file_path: str, sidecar_paths: List[Optional[str]]) -> None:
+    """Remove a stored blob and its sidecars once no CSVFile references it"""
+    if await db.scalar(_blob_references(file_path)) == 0:
+        remove_blob(file_path, sidecar_paths)
+
+
+def remove_unreferenced_blob_sync(db: Session, file_path: str, sidecar_paths: List[Optional[str]]) -> None:
+    """The counterpart of remove_unreferenced_blob for sync sessions"""
+    if db.scalar(_blob_references(file_path)) == 0:
+        remove_blob(file_path, sidecar_paths)
+
+
+def _blob_references(file_path: str) -> Select:
+    return select(func.count(CSVFile.id)).where(CSVFile.path == file_path)
+
+
+def remove_blob(file_path: str, sidecar_paths: List[Optional[str]]) -> None:
+    """Remove a stored blob and its sidecars, ignoring those already gone"""
+    for path in [file_path] + sidecar_paths:
+        _remove_quietly(path)
+
+
+def _remove_quietly(path: Optional[str]) -> None:
+    try:
+        if path and os.path.isdir(path):
+            shutil.rmtree(path)
+        elif path and os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        pass
 
 
-def get_all_csv_files(db: Session) -> List[CSVFile]:
-    """Get all CSV files"""
-    return db.query(CSVFile).order_by(CSVFile.uploaded_at.desc()).all()
+def _open_columnar(columnar_path: Optional[str]) -> Optional[ColumnarTable]:
+    """Open the columnar sidecar if it has been built"""
+    if columnar_path and os.path.isdir(columnar_path):
+        return ColumnarTable(columnar_path)
+    return None
 
 
-def get_csv_file_by_id(db: Session, file_id: int) -> CSVFile:
-    """Get a CSV file by ID"""
-    csv_file = db.query(CSVFile).filter(CSVFile.id == file_id).first()
+def get_content_cache_stats() -> Dict[str, int]:
+    """Get hit/miss/eviction counters of the parsed content cache"""
+    return content_cache.stats()
+
+
+async def get_csv_file_list(
+    db: AsyncSession,
+    limit: int,
+    cursor: Optional[str] = None,
+    search: Optional[str] = None,
+    match: str = "contains"
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Get one page of CSV files, newest first, and the cursor of the next
+
+    Pages are keyed on (uploaded_at, id), so each is an index range scan no
+    matter how deep it is. Only the listed columns are selected and rows are
+    returned as mappings, without building ORM objects. search matches
+    filenames case-insensitively by prefix or substring.
+    """
+    query = select(
+        CSVFile.id, CSVFile.filename, CSVFile.size, CSVFile.total_rows, CSVFile.uploaded_at
+    ).order_by(CSVFile.uploaded_at.desc(), CSVFile.id.desc())
+
+    if cursor is not None:
+        uploaded_at, file_id = _decode_list_cursor(cursor)
+        if db.get_bind().dialect.name == "sqlite":
+            query = query.where(_sqlite_before(uploaded_at, file_id))
+        else:
+            query = query.where(tuple_(CSVFile.uploaded_at, CSVFile.id) < tuple_(uploaded_at, file_id))
+    if search:
+        pattern = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        pattern = f"{pattern}%" if match == "prefix" else f"%{pattern}%"
+        query = query.where(CSVFile.filename.ilike(pattern, escape="\\"))
+
+    # One extra row tells whether there is a next page
+    rows = [dict(row) for row in (await db.execute(query.limit(limit + 1))).mappings()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_list_cursor(rows[-1]["uploaded_at"], rows[-1]["id"])
+    return rows, next_cursor
+
+
+def _encode_list_cursor(uploaded_at: datetime, file_id: int) -> str:
+    token = f"{uploaded_at.isoformat()}|{file_id}"
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _sqlite_before(uploaded_at: datetime, file_id: int) -> ColumnElement:
+    """Files listed after (uploaded_at, file_id), for SQLite
+
+    SQLite compares timestamps as text, and the same time is stored without
+    microseconds by CURRENT_TIMESTAMP but with them when given explicitly,
+    so ties on uploaded_at have to match both forms.
+    """
+    seconds = uploaded_at.strftime("%Y-%m-%d %H:%M:%S")
+    forms = [f"{seconds}.{uploaded_at.microsecond:06d}"]
+    if not uploaded_at.microsecond:
+        forms.insert(0, seconds)
+    return or_(
+        type_coerce(CSVFile.uploaded_at, String) < forms[0],
+        and_(type_coerce(CSVFile.uploaded_at, String).in_(forms), CSVFile.id < file_id)
+    )
+
+
+def _decode_list_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        token = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        uploaded_at, file_id = token.rsplit("|", 1)
+        return datetime.fromisoformat(uploaded_at), int(file_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+async def get_csv_list_version(db: AsyncSession) -> int:
+    """The file list version, the number of the latest recorded change"""
+    return await db.scalar(select(func.max(CSVListChange.version))) or 0
+
+
+async def get_csv_list_changes(db: AsyncSession, since: int) -> Dict[str, Any]:
+    """Changes to the file list after version since, oldest first
+
+    Raises 410 if some of them have been pruned, or since is from the
+    future; the client should then reload the list.
+    """
+    version = await get_csv_list_version(db)
+    oldest = await db.scalar(select(func.min(CSVListChange.version)))
+    if since > version or (since < version and since < (oldest or 1) - 1):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Changes since this version are no longer available; reload the list"
+        )
+
+    changes = await db.scalars(
+        select(CSVListChange).where(CSVListChange.version > since).order_by(CSVListChange.version)
+    )
+    return {
+        "version": version,
+        "changes": [
+            {"version": change.version, "op": change.op, "file_id": change.csv_file_id, "file": change.file}
+            for change in changes
+        ]
+    }
+
+
+def list_change(op: str, csv_file: CSVFile) -> CSVListChange:
+    """Record of a change to the file list; added and updated files carry their list entry"""
+    entry = None if op == "deleted" else CSVFileListResponse.model_validate(csv_file).model_dump(mode="json")
+    return CSVListChange(op=op, csv_file_id=csv_file.id, file=entry)
+
+
+def list_change_event(change: CSVListChange) -> Dict[str, Any]:
+    """Websocket message announcing a list change, so clients needn't refetch the list"""
+    return {
+        "event": "csv_list_updated",
+        "op": change.op,
+        "version": change.version,
+        "file_id": change.csv_file_id,
+        "file": change.file,
+        "message": LIST_CHANGE_MESSAGES[change.op]
+    }
+
+
+async def lock_list_changes(db: AsyncSession) -> None:
+    """Hold the list change lock until db commits; take it before adding a change
+
+    Versions then commit in the order they are assigned, so a client that has
+    seen a version never misses an earlier one committed after it. Reads of
+    the changes are not blocked, and SQLite serializes writers already.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(LIST_CHANGE_LOCK)
+
+
+def lock_list_changes_sync(db: Session) -> None:
+    """The counterpart of lock_list_changes for sync sessions"""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(LIST_CHANGE_LOCK)
+
+
+def _list_change_pruning(version: int) -> Optional[Delete]:
+    """Statement pruning changes beyond the retention once version is recorded
+
+    Changes are pruned in batches rather than on every change; None when
+    version does not start a batch.
+    """
+    if version % LIST_CHANGE_PRUNE_INTERVAL:
+        return None
+    return delete(CSVListChange).where(CSVListChange.version <= version - settings.csv_list_change_retention)
+
+
+async def prune_list_changes(db: AsyncSession, version: int) -> None:
+    """Prune old list changes if recording version started a new batch"""
+    pruning = _list_change_pruning(version)
+    if pruning is not None:
+        await db.execute(pruning)
+        await db.commit()
+
+
+def prune_list_changes_sync(db: Session, version: int) -> None:
+    """The counterpart of prune_list_changes for sync sessions"""
+    pruning = _list_change_pruning(version)
+    if pruning is not None:
+        db.execute(pruning)
+        db.commit()
+
+
+async def get_csv_file_by_id(db: AsyncSession, file_id: int, *options: Any) -> CSVFile:
+    """Get a CSV file by ID
+
+    Async sessions can't lazy load, so pass loader options such as
+    selectinload() for the relationships the caller reads.
+    """
+    csv_file = await db.scalar(select(CSVFile).where(CSVFile.id == file_id).options(*options))
     if not csv_file:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -67,39 +453,469 @@ def get_csv_file_by_id(db: Session, file_id: int) -> CSVFile:
     return csv_file
 
 
-def get_csv_content(db: Session, file_id: int) -> dict:
-    """Get the content of a CSV file"""
-    csv_file = get_csv_file_by_id(db, file_id)
+async def get_csv_content(
+    csv_file: CSVFile,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    filters: Optional[List[str]] = None,
+    sort: Optional[str] = None,
+    layout: str = "objects"
+) -> dict:
+    """Get a page of rows from a CSV file, optionally filtered and sorted
+
+    layout picks the shape of ``rows``: ``objects`` (one dict per row),
+    ``rows`` (one list per row in header order) or ``columns`` (one list per
+    column). Missing cells are None in every layout. csv_file comes from
+    get_csv_file_by_id.
+    """
+    if limit is None:
+        limit = settings.csv_default_page_size
 
     try:
-        parsed_data = parse_csv_file(csv_file.path)
+        with span("read_page"):
+            page = await run_in_threadpool(_load_page, csv_file, offset, limit, filters, sort)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to read CSV file: {str(e)}"
+        )
+
+    headers = page["headers"]
+    last_row = offset + len(page["rows"]) - 1
+    has_more = page.get("has_more", last_row + 1 < page["total_rows"])
+    return {
+        "filename": csv_file.filename,
+        "headers": headers,
+        "layout": layout,
+        "rows": _apply_layout(headers, page["rows"], layout),
+        "total_rows": page["total_rows"],
+        "matched_rows": page.get("matched_rows"),
+        "offset": offset,
+        "limit": limit,
+        "next_after_row": last_row if has_more else None
+    }
+
+
+def _load_page(csv_file: CSVFile, offset: int, limit: int, filters: Optional[List[str]], sort: Optional[str]) -> Dict[str, Any]:
+    if filters or sort:
+        return _query_page(csv_file, offset, limit, filters or [], sort)
+    if csv_file.size <= settings.content_cache_max_file_size:
+        content = _get_cached_content(csv_file)
         return {
-            "filename": csv_file.filename,
-            "headers": parsed_data["headers"],
-            "rows": parsed_data["rows"],
-            "total_rows": parsed_data["total_rows"]
+            "headers": content["headers"],
+            "rows": content["rows"][offset:offset + limit],
+            "total_rows": len(content["rows"])
         }
+    return _read_page(csv_file, offset, limit)
+
+
+def _apply_layout(headers: List[str], rows: List[List[Optional[str]]], layout: str) -> List[Any]:
+    if layout == "objects":
+        return [row_to_dict(headers, row) for row in rows]
+
+    width = len(headers)
+    # Rows may be shared with the content cache, so pad copies only
+    rows = [row if len(row) == width else (row + [None] * (width - len(row)))[:width] for row in rows]
+    if layout == "columns":
+        return [list(column) for column in zip(*rows)] if rows else [[] for _ in headers]
+    return rows
+
+
+def _query_page(csv_file: CSVFile, offset: int, limit: int, filters: List[str], sort: Optional[str]) -> Dict[str, Any]:
+    """Run a filter/sort query over a file and return one page of matches"""
+    headers, rows = _open_rows(csv_file)
+    scanned: Optional[CountingIterator] = None
+    try:
+        sample, predicates, sort_key = _parse_query(headers, rows, filters, sort)
+        scanned = CountingIterator(itertools.chain(sample, rows))
+        result = run_query(
+            scanned,
+            predicates,
+            sort_key,
+            offset,
+            limit,
+            memory_rows=settings.query_sort_memory_rows,
+            spill_dir=settings.query_spill_dir,
+            # Files without a stored row count must be scanned to report one
+            stop_early=csv_file.total_rows is not None
+        )
+    finally:
+        # Release the sidecar memory maps if the scan stopped early
+        if hasattr(rows, "close"):
+            rows.close()
+        # Unset when the filter or sort failed to parse
+        if scanned is not None:
+            csv_rows_parsed.inc(scanned.count, source="query")
+
+    result["headers"] = headers
+    result["total_rows"] = csv_file.total_rows if csv_file.total_rows is not None else scanned.count
+    return result
+
+
+def _parse_query(
+    headers: List[str],
+    rows: Iterator[List[Optional[str]]],
+    filters: List[str],
+    sort: Optional[str]
+) -> Tuple[List[List[Optional[str]]], List[Predicate], Optional[Callable]]:
+    """Parse filters and sort against column kinds inferred from the first rows
+
+    Returns the rows sampled from rows, the predicates and the sort key.
+    Raises ValueError for an invalid filter or sort.
+    """
+    sample = list(itertools.islice(rows, TYPE_SAMPLE_ROWS))
+    kinds = infer_column_kinds(headers, sample)
+    predicates = [parse_filter(expression, headers, kinds) for expression in filters]
+    sort_key = parse_sort(sort, headers, kinds) if sort else None
+    return sample, predicates, sort_key
+
+
+async def open_csv_query(
+    db: AsyncSession,
+    file_id: int,
+    offset: int,
+    filters: Optional[List[str]],
+    sort: Optional[str]
+) -> Tuple[CSVFile, List[str], QueryCursor]:
+    """Start a filter/sort query for reading its matches batch by batch
+
+    Returns the file, its headers and a cursor over the matches after
+    offset; without filters or sort every row matches. Fetch from the cursor in a worker thread, since it reads the file,
+    and pass it to close_csv_query when done.
+    """
+    csv_file = await get_csv_file_by_id(db, file_id)
+    try:
+        headers, cursor = await run_in_threadpool(_open_query, csv_file, offset, filters or [], sort)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to read CSV file: {str(e)}"
+        )
+    return csv_file, headers, cursor
+
+
+def _open_query(csv_file: CSVFile, offset: int, filters: List[str], sort: Optional[str]) -> Tuple[List[str], QueryCursor]:
+    headers, rows = _open_rows(csv_file)
+    if not filters and not sort:
+        return headers, QueryCursor(rows, [], None, offset, memory_rows=settings.query_sort_memory_rows)
+    try:
+        sample, predicates, sort_key = _parse_query(headers, rows, filters, sort)
+    except Exception:
+        if hasattr(rows, "close"):
+            rows.close()
+        raise
+    cursor = QueryCursor(
+        rows,
+        predicates,
+        sort_key,
+        offset,
+        memory_rows=settings.query_sort_memory_rows,
+        spill_dir=settings.query_spill_dir,
+        sample=sample
+    )
+    return headers, cursor
+
+
+async def fetch_csv_query(
+    csv_file: CSVFile,
+    headers: List[str],
+    cursor: QueryCursor,
+    limit: int,
+    layout: str = "objects"
+) -> dict:
+    """Next page of matches of a query started with open_csv_query
+
+    The page has the shape of get_csv_content's. total_rows and matched_rows
+    are None until the query has scanned the whole file.
+    """
+    offset = cursor.position
+    try:
+        with span("read_page"):
+            rows = await run_in_threadpool(cursor.fetch, limit)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to read CSV file: {str(e)}"
         )
 
+    total_rows = csv_file.total_rows
+    if total_rows is None and cursor.scanned.exhausted:
+        total_rows = cursor.scanned.count
+    return {
+        "filename": csv_file.filename,
+        "headers": headers,
+        "layout": layout,
+        "rows": _apply_layout(headers, rows, layout),
+        "total_rows": total_rows,
+        "matched_rows": cursor.matched_rows,
+        "offset": offset,
+        "limit": limit,
+        "next_after_row": None if cursor.done else cursor.position - 1
+    }
+
+
+def close_csv_query(cursor: QueryCursor) -> None:
+    """Release a query cursor's file and spilled runs; waits for a fetch in progress"""
+    cursor.close()
+    csv_rows_parsed.inc(cursor.scanned.count, source="query")
+
 
-def delete_csv_file(db: Session, file_id: int) -> bool:
-    """Delete a CSV file and its database record"""
-    csv_file = get_csv_file_by_id(db, file_id)
+async def aggregate_csv_file(db: AsyncSession, file_id: int, request: AggregateRequest) -> dict:
+    """Compute grouped aggregates over a CSV file in one streaming pass
 
-    # Delete file from filesystem
+    Large files that are not in the content cache are aggregated as byte
+    ranges in the job worker's process pool, and the partial results merged.
+    """
+    csv_file = await get_csv_file_by_id(db, file_id)
+    with span("aggregate"):
+        return await run_in_threadpool(_aggregate, csv_file, request)
+
+
+def _aggregate(csv_file: CSVFile, request: AggregateRequest) -> dict:
     try:
-        if os.path.exists(csv_file.path):
-            os.remove(csv_file.path)
+        headers, rows = _open_rows(csv_file)
+        try:
+            group_positions = [column_position(headers, column) for column in request.group_by]
+            metrics = [
+                (metric.op, None if metric.column is None else column_position(headers, metric.column), metric.percentile)
+                for metric in request.metrics
+            ]
+            names = [metric.alias or metric_name(metric.op, metric.column, metric.percentile) for metric in request.metrics]
+
+            sample = list(itertools.islice(rows, TYPE_SAMPLE_ROWS))
+            kinds = infer_column_kinds(headers, sample)
+            args = (headers, kinds, request.filter, group_positions, metrics, settings.aggregate_max_groups)
+
+            parts = 1 if csv_file.size <= settings.content_cache_max_file_size else job_worker.scan_parts(csv_file.size)
+            if parts > 1:
+                partials = map_csv_ranges(
+                    csv_file.path, aggregate_rows, args, job_worker.pool, parts, csv_file.delimiter, _load_index(csv_file)
+                )
+            else:
+                partials = [aggregate_rows(itertools.chain(sample, rows), *args)]
+        finally:
+            if hasattr(rows, "close"):
+                rows.close()
+
+        aggregator, rows_scanned = partials[0]
+        for partial, scanned in partials[1:]:
+            aggregator.merge(partial)
+            rows_scanned += scanned
+        results = aggregator.results()
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
-        # Log error but continue with database deletion
-        pass
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to read CSV file: {str(e)}"
+        )
+
+    result_rows = []
+    for key, values in results:
+        result = dict(zip(request.group_by, key))
+        result.update(zip(names, values))
+        result_rows.append(result)
+
+    return {
+        "filename": csv_file.filename,
+        "group_by": request.group_by,
+        "metrics": names,
+        "rows": result_rows,
+        "rows_scanned": rows_scanned
+    }
+
+
+def _open_rows(csv_file: CSVFile) -> Tuple[List[str], Iterator[List[Optional[str]]]]:
+    """Headers and a row iterator from the content cache or the CSV file
+
+    Callers should close() the iterator when they stop before exhausting it.
+    """
+    if csv_file.size <= settings.content_cache_max_file_size:
+        content = _get_cached_content(csv_file)
+        return content["headers"], iter(content["rows"])
+
+    rows = iter_csv_rows(csv_file.path, csv_file.delimiter)
+    return next(rows, []), rows
+
+
+def _read_page(csv_file: CSVFile, offset: int, limit: int) -> Dict[str, Any]:
+    """Read one page from the columnar sidecar, or seek via the row index"""
+    table = _open_columnar(csv_file.columnar_path)
+    if table is not None:
+        with table:
+            rows = list(table.rows(offset, offset + limit))
+        csv_rows_parsed.inc(len(rows), source="columnar")
+        return {"headers": table.headers, "rows": rows, "total_rows": table.total_rows}
+
+    page = read_csv_page(csv_file.path, offset, limit, row_index=_load_index(csv_file), delimiter=csv_file.delimiter)
+    csv_rows_parsed.inc(len(page["rows"]), source="csv")
+    return page
+
+
+def _load_index(csv_file: CSVFile) -> Optional[Dict[str, Any]]:
+    """Load the row index if it has been built"""
+    if csv_file.index_path and os.path.exists(csv_file.index_path):
+        return load_row_index(csv_file.index_path)
+    return None
+
+
+def _get_cached_content(csv_file: CSVFile) -> Dict[str, Any]:
+    """Return the fully parsed rows of a file from the shared content cache
+
+    Files above settings.parallel_scan_min_size are parsed in byte ranges
+    across the job worker's process pool.
+    """
+    version = csv_file.content_hash or os.path.getmtime(csv_file.path)
+    file_path, delimiter = csv_file.path, csv_file.delimiter
+
+    def load():
+        with span("parse_file"):
+            parts = job_worker.scan_parts(csv_file.size)
+            row_index = _load_index(csv_file) if parts > 1 else None
+            content = parse_csv_file(file_path, delimiter, job_worker.pool, parts, row_index)
+        csv_rows_parsed.inc(len(content["rows"]), source="full_file")
+        csv_bytes_read.inc(os.path.getsize(file_path), source="full_file")
+        return content, _estimate_size(content)
+
+    return content_cache.get_or_load((csv_file.id, version), load)
+
+
+def _estimate_size(content: Dict[str, Any]) -> int:
+    """Approximate the memory held by parsed content, in bytes"""
+    size = sys.getsizeof(content["headers"]) + sys.getsizeof(content["rows"])
+    for row in content["rows"]:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(cell) for cell in row)
+    return size
+
+
+def negotiate_stream_format(accept: Optional[str]) -> str:
+    """Pick a stream format from an Accept header, ndjson by default"""
+    formats = [fmt for fmt in STREAM_MEDIA_TYPES if fmt != "arrow" or arrow_available()]
+    media_type = negotiate_media_type(accept, [STREAM_MEDIA_TYPES[fmt] for fmt in formats])
+    if media_type is None:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"Supported content types: {', '.join(STREAM_MEDIA_TYPES[fmt] for fmt in formats)}"
+        )
+    return next(fmt for fmt in formats if STREAM_MEDIA_TYPES[fmt] == media_type)
+
+
+async def stream_csv_content(csv_file: CSVFile, fmt: str) -> Tuple[Iterator, str]:
+    """Return a lazy iterator over a CSV file's content and its media type
+
+    ``csv`` streams the stored bytes unchanged, ``ndjson`` emits one JSON
+    object per row and ``json`` emits the same shape as CSVContentResponse.
+    ``msgpack`` emits a map with the filename and headers followed by one
+    array per row, and ``arrow`` an Arrow IPC stream of string columns.
+    """
+    if fmt == "arrow" and not arrow_available():
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail="Arrow streams are not available on this server"
+        )
+
+    if not os.path.exists(csv_file.path):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to read CSV file: file is missing from storage"
+        )
+
+    if fmt == "csv":
+        return iter_file_chunks(csv_file.path), STREAM_MEDIA_TYPES[fmt]
+
+    rows = iter_csv_rows(csv_file.path, csv_file.delimiter)
+    if fmt == "ndjson":
+        content = _stream_ndjson(rows)
+    elif fmt == "msgpack":
+        headers = next(rows, [])
+        content = iter_msgpack_stream({"filename": csv_file.filename, "headers": headers}, rows, STREAM_BATCH_ROWS)
+    elif fmt == "arrow":
+        headers = next(rows, [])
+        content = iter_arrow_stream(headers, rows, ARROW_BATCH_ROWS, {"filename": csv_file.filename})
+    else:
+        content = _stream_json(rows, csv_file.filename)
+    return content, STREAM_MEDIA_TYPES[fmt]
+
+
+async def open_csv_rows(csv_file: CSVFile) -> MappedCSVFile:
+    """Memory-map a CSV file for serving raw row windows
+
+    The caller owns the returned file and must close it.
+    """
+    try:
+        row_index = await run_in_threadpool(_load_index, csv_file)
+        return MappedCSVFile(csv_file.path, csv_file.delimiter, row_index)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to read CSV file: {str(e)}"
+        )
+
+
+def _stream_ndjson(rows: Iterator[List[Optional[str]]]) -> Iterator[str]:
+    headers = next(rows, [])
+    batch = []
+    for row in rows:
+        batch.append(json.dumps(row_to_dict(headers, row)))
+        if len(batch) >= STREAM_BATCH_ROWS:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+def _stream_json(rows: Iterator[List[Optional[str]]], filename: str) -> Iterator[str]:
+    headers = next(rows, [])
+    yield f'{{"filename": {json.dumps(filename)}, "headers": {json.dumps(headers)}, "rows": ['
+    total_rows = 0
+    batch = []
+    for row in rows:
+        batch.append(json.dumps(row_to_dict(headers, row)))
+        total_rows += 1
+        if len(batch) >= STREAM_BATCH_ROWS:
+            yield ("," if total_rows > len(batch) else "") + ",".join(batch)
+            batch = []
+    if batch:
+        yield ("," if total_rows > len(batch) else "") + ",".join(batch)
+    # total_rows goes last so it can be counted while streaming
+    yield f'], "total_rows": {total_rows}}}'
+
+
+async def delete_csv_file(db: AsyncSession, file_id: int) -> CSVListChange:
+    """Delete a CSV file record, and its blob once no other record shares it
+
+    Returns the file list change recording the deletion.
+    """
+    # The delete cascades to these, so load them up front
+    csv_file = await get_csv_file_by_id(
+        db, file_id, selectinload(CSVFile.column_profiles), selectinload(CSVFile.processing_jobs)
+    )
+    file_path = csv_file.path
+    sidecar_paths = [csv_file.index_path, csv_file.columnar_path or f"{file_path}.cols"]
+
+    # Delete database record first so the reference count below excludes it
+    change = list_change("deleted", csv_file)
+    await lock_list_changes(db)
+    db.add(change)
+    await db.delete(csv_file)
+    await db.commit()
+    content_cache.invalidate(file_id)
 
-    # Delete database record
-    db.delete(csv_file)
-    db.commit()
+    # Delete file and its sidecars from filesystem if this was the last reference
+    await remove_unreferenced_blob(db, file_path, sidecar_paths)
 
-    return True
+    await prune_list_changes(db, change.version)
+    return change
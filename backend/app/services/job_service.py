@@ -0,0 +1,298 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.concurrency import run_in_threadpool
+from app.database.connection import SessionLocal
+from app.database.models import CSVFile, CSVColumnProfile, ProcessingJob
+from typing import Any, Dict, List, Optional
+import logging
+import os
+from app.config import settings
+from app.core.job_worker import job_worker
+from app.core.websocket_manager import websocket_manager
+from app.services.csv_service import (
+    get_csv_file_by_id,
+    list_change,
+    list_change_event,
+    lock_list_changes_sync,
+    prune_list_changes_sync,
+    remove_unreferenced_blob_sync
+)
+from app.utils.csv_index import build_row_index_file, load_row_index
+from app.utils.columnar import build_columnar_cache
+from app.utils.profiler import profile_file
+
+logger = logging.getLogger(__name__)
+
+# Post-upload stages, run in this order
+JOB_STAGES = ("index", "columnar", "profile")
+
+PROFILE_FIELDS = (
+    "position", "name", "inferred_type", "null_count", "value_count", "min_value",
+    "max_value", "distinct_estimate", "top_values", "histogram",
+)
+
+
+class _FileDeleted(Exception):
+    """Raised when every record of a blob is deleted while a job is running"""
+
+
+async def create_processing_job(db: AsyncSession, csv_file: CSVFile) -> ProcessingJob:
+    """Record a queued processing job for an uploaded CSV file"""
+    job = ProcessingJob(csv_file_id=csv_file.id, status="queued", progress=0)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def get_processing_jobs(db: AsyncSession, file_id: int) -> List[ProcessingJob]:
+    """Get the processing jobs of a CSV file, oldest first"""
+    await get_csv_file_by_id(db, file_id)
+    return list(await db.scalars(
+        select(ProcessingJob).where(ProcessingJob.csv_file_id == file_id).order_by(ProcessingJob.id)
+    ))
+
+
+def requeue_unfinished_jobs() -> None:
+    """Queue jobs that were queued or running when the server last stopped"""
+    db = SessionLocal()
+    try:
+        jobs = db.query(ProcessingJob).filter(ProcessingJob.status.in_(["queued", "running"])).all()
+        for job in jobs:
+            job.status = "queued"
+        db.commit()
+        job_ids = [job.id for job in jobs]
+    finally:
+        db.close()
+
+    for job_id in job_ids:
+        job_worker.enqueue(job_id)
+
+
+async def run_processing_job(job_id: int) -> None:
+    """Index, convert and profile the CSV file of a job
+
+    Database work runs in worker threads and parsing runs in the job worker's
+    process pool, so the event loop only coordinates stages and broadcasts
+    progress.
+    """
+    job = await run_in_threadpool(_load_job, job_id)
+    if job is None:
+        return
+
+    file_id = job["csv_file_id"]
+    try:
+        for number, stage in enumerate(JOB_STAGES):
+            progress = number * 100 // len(JOB_STAGES)
+            await run_in_threadpool(_update_job, job_id, status="running", stage=stage, progress=progress)
+            await _broadcast_progress(job_id, file_id, stage, progress, "running")
+            await _STAGE_RUNNERS[stage](file_id)
+    except _FileDeleted:
+        return
+    except Exception as e:
+        logger.exception("Processing job %s failed at stage %s", job_id, stage)
+        await run_in_threadpool(_update_job, job_id, status="failed", error=str(e))
+        await _broadcast_progress(job_id, file_id, stage, progress, "failed")
+        return
+
+    await run_in_threadpool(_update_job, job_id, status="succeeded", stage=None, progress=100)
+    await _broadcast_progress(job_id, file_id, None, 100, "succeeded")
+    await websocket_manager.broadcast({
+        "event": "csv_ready",
+        "file_id": file_id,
+        "message": "CSV file processed"
+    })
+
+    # The row count in the file's list entry is now known
+    event = await run_in_threadpool(_record_processed, file_id)
+    if event is not None:
+        await websocket_manager.broadcast(event)
+
+
+async def _broadcast_progress(job_id: int, file_id: int, stage: Optional[str], progress: int, status: str) -> None:
+    # Slow clients only need the latest progress of each job
+    await websocket_manager.broadcast({
+        "event": "csv_processing_progress",
+        "job_id": job_id,
+        "file_id": file_id,
+        "stage": stage,
+        "progress": progress,
+        "status": status
+    }, coalesce_key=f"job-progress:{job_id}")
+
+
+def _load_job(job_id: int) -> Optional[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        job = db.query(ProcessingJob).filter(ProcessingJob.id == job_id).first()
+        if job is None or job.status in ("succeeded", "failed"):
+            return None
+        return {"csv_file_id": job.csv_file_id}
+    finally:
+        db.close()
+
+
+def _update_job(job_id: int, **values: Any) -> None:
+    db = SessionLocal()
+    try:
+        db.query(ProcessingJob).filter(ProcessingJob.id == job_id).update(values, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _record_processed(file_id: int) -> Optional[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        csv_file = db.query(CSVFile).filter(CSVFile.id == file_id).first()
+        if csv_file is None:
+            return None
+        change = list_change("updated", csv_file)
+        lock_list_changes_sync(db)
+        db.add(change)
+        db.commit()
+        prune_list_changes_sync(db, change.version)
+        return list_change_event(change)
+    finally:
+        db.close()
+
+
+def _load_file(file_id: int) -> Dict[str, Any]:
+    db = SessionLocal()
+    try:
+        csv_file = db.query(CSVFile).filter(CSVFile.id == file_id).first()
+        if csv_file is None:
+            raise _FileDeleted()
+        return {
+            "path": csv_file.path,
+            "size": csv_file.size,
+            "delimiter": csv_file.delimiter,
+            "content_hash": csv_file.content_hash,
+            "index_path": csv_file.index_path,
+            "columnar_path": csv_file.columnar_path,
+            "profiled": bool(csv_file.column_profiles),
+        }
+    finally:
+        db.close()
+
+
+def _update_blob_records(file_path: str, sidecar_path: str, values: Dict[Any, Any]) -> None:
+    """Apply values to every record sharing a blob
+
+    If all of them were deleted while the stage ran, the blob and the new
+    sidecar are removed instead.
+    """
+    db = SessionLocal()
+    try:
+        updated = db.query(CSVFile).filter(CSVFile.path == file_path).update(values, synchronize_session=False)
+        db.commit()
+        if updated == 0:
+            remove_unreferenced_blob_sync(db, file_path, [sidecar_path])
+            raise _FileDeleted()
+    finally:
+        db.close()
+
+
+async def _run_index_stage(file_id: int) -> None:
+    """Build the row index used to seek to a page without parsing earlier rows"""
+    csv_file = await run_in_threadpool(_load_file, file_id)
+    if csv_file["index_path"] and os.path.exists(csv_file["index_path"]):
+        return
+
+    file_path = csv_file["path"]
+    index_path = f"{file_path}.idx"
+    index = await job_worker.run_in_process(
+        build_row_index_file, file_path, index_path, csv_file["delimiter"], settings.csv_index_interval
+    )
+    await run_in_threadpool(
+        _update_blob_records,
+        file_path,
+        index_path,
+        {CSVFile.index_path: index_path, CSVFile.total_rows: index["total_rows"]}
+    )
+
+
+async def _run_columnar_stage(file_id: int) -> None:
+    """Convert the CSV file to its columnar sidecar"""
+    csv_file = await run_in_threadpool(_load_file, file_id)
+    if csv_file["columnar_path"] and os.path.isdir(csv_file["columnar_path"]):
+        return
+
+    file_path = csv_file["path"]
+    columnar_path = f"{file_path}.cols"
+    if not os.path.isdir(columnar_path):
+        await job_worker.run_in_process(build_columnar_cache, file_path, columnar_path, csv_file["delimiter"])
+    # Every record sharing the blob can use the sidecar
+    await run_in_threadpool(_update_blob_records, file_path, columnar_path, {CSVFile.columnar_path: columnar_path})
+
+
+async def _run_profile_stage(file_id: int) -> None:
+    """Compute per-column statistics, or copy those of an identical upload"""
+    csv_file = await run_in_threadpool(_load_file, file_id)
+    if csv_file["profiled"]:
+        return
+
+    profiles = await run_in_threadpool(_copy_existing_profiles, file_id, csv_file["content_hash"])
+    parts = job_worker.scan_parts(csv_file["size"])
+    if profiles is None and parts > 1:
+        # Large files: profile byte ranges across the whole pool, split at
+        # the row index checkpoints built by the index stage
+        row_index = None
+        if csv_file["index_path"] and os.path.exists(csv_file["index_path"]):
+            row_index = await run_in_threadpool(load_row_index, csv_file["index_path"])
+        profiles = await run_in_threadpool(
+            profile_file,
+            csv_file["path"],
+            csv_file["delimiter"],
+            settings.profile_top_k,
+            settings.profile_histogram_bins,
+            job_worker.pool,
+            parts,
+            row_index
+        )
+    elif profiles is None:
+        profiles = await job_worker.run_in_process(
+            profile_file,
+            csv_file["path"],
+            csv_file["delimiter"],
+            settings.profile_top_k,
+            settings.profile_histogram_bins
+        )
+    await run_in_threadpool(_save_profiles, file_id, profiles)
+
+
+def _copy_existing_profiles(file_id: int, content_hash: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+    if not content_hash:
+        return None
+    db = SessionLocal()
+    try:
+        source = (
+            db.query(CSVFile)
+            .filter(CSVFile.content_hash == content_hash, CSVFile.id != file_id)
+            .filter(CSVFile.column_profiles.any())
+            .first()
+        )
+        if source is None:
+            return None
+        return [{field: getattr(profile, field) for field in PROFILE_FIELDS} for profile in source.column_profiles]
+    finally:
+        db.close()
+
+
+def _save_profiles(file_id: int, profiles: List[Dict[str, Any]]) -> None:
+    db = SessionLocal()
+    try:
+        csv_file = db.query(CSVFile).filter(CSVFile.id == file_id).first()
+        if csv_file is None:
+            raise _FileDeleted()
+        csv_file.column_profiles = [CSVColumnProfile(**profile) for profile in profiles]
+        db.commit()
+    finally:
+        db.close()
+
+
+_STAGE_RUNNERS = {
+    "index": _run_index_stage,
+    "columnar": _run_columnar_stage,
+    "profile": _run_profile_stage,
+}
@@ -0,0 +1,134 @@
+from fastapi import HTTPException, WebSocket
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Optional, Set
+import asyncio
+import logging
+from app.config import settings
+from app.core.websocket_manager import websocket_manager
+from app.database.connection import AsyncSessionLocal
+from app.schemas.websocket import RowAckMessage, RowStreamMessage, RowSubscribeMessage, RowUnsubscribeMessage
+from app.services.csv_service import close_csv_query, fetch_csv_query, open_csv_query
+
+logger = logging.getLogger(__name__)
+
+# Strong references to streaming tasks, which the loop only holds weakly
+_streams: Set[asyncio.Task] = set()
+
+
+class RowSubscription:
+    """Streams one file's rows to a WebSocket in growing batches
+
+    Each batch spends one credit granted by the client; with none left the
+    stream waits for an ack. Batches start at ws_row_batch_initial rows and
+    double up to csv_max_page_size, so the first screen arrives at once and
+    the rest of a large file takes few reads. The file is opened once when
+    subscribing, with any filter or sort, and batches page through its
+    matches, so no batch reads the file again from the start.
+    """
+
+    def __init__(self, websocket: WebSocket, request: RowSubscribeMessage):
+        self.websocket = websocket
+        self.file_id = request.file_id
+        self.offset = request.offset
+        self.filters = request.filter
+        self.sort = request.sort
+        self.credits = 0
+        self._granted = asyncio.Event()
+        self.grant(request.credits)
+        self._task = asyncio.create_task(self._run())
+        _streams.add(self._task)
+        self._task.add_done_callback(_streams.discard)
+
+    def grant(self, credits: int) -> None:
+        self.credits = min(self.credits + credits, settings.ws_row_max_credits)
+        self._granted.set()
+
+    def cancel(self) -> None:
+        self._task.cancel()
+
+    async def _run(self) -> None:
+        batch_size = settings.ws_row_batch_initial
+        first = True
+        cursor = None
+        try:
+            # The cursor needs no session, so an idle subscription holds no connection
+            async with AsyncSessionLocal() as db:
+                csv_file, headers, cursor = await open_csv_query(db, self.file_id, self.offset, self.filters, self.sort)
+
+            while True:
+                while self.credits == 0:
+                    self._granted.clear()
+                    await self._granted.wait()
+
+                page = await fetch_csv_query(csv_file, headers, cursor, batch_size, layout="rows")
+                self.credits -= 1
+
+                done = page["next_after_row"] is None
+                message = {
+                    "event": "csv_rows",
+                    "file_id": self.file_id,
+                    "offset": self.offset,
+                    "rows": page["rows"],
+                    "total_rows": page["total_rows"],
+                    "matched_rows": page["matched_rows"],
+                    "done": done
+                }
+                if first:
+                    message["filename"] = page["filename"]
+                    message["headers"] = page["headers"]
+                # Credits already bound how many batches are queued
+                await websocket_manager.send(self.websocket, message, droppable=False)
+                if done:
+                    return
+
+                self.offset += len(page["rows"])
+                batch_size = min(batch_size * 2, settings.csv_max_page_size)
+                first = False
+        except HTTPException as e:
+            await send_error(self.websocket, e.detail, self.file_id)
+        except Exception:
+            logger.exception("Row subscription to file %s failed", self.file_id)
+            await send_error(self.websocket, "Failed to read CSV file", self.file_id)
+        finally:
+            if cursor is not None:
+                # Waits for a fetch still running in its thread after a cancel
+                await run_in_threadpool(close_csv_query, cursor)
+
+
+class RowSubscriptions:
+    """The row subscriptions of one WebSocket connection, keyed by file id"""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.subscriptions: Dict[int, RowSubscription] = {}
+
+    async def handle(self, message: RowStreamMessage) -> None:
+        if isinstance(message, RowSubscribeMessage):
+            self._cancel(message.file_id)
+            self.subscriptions[message.file_id] = RowSubscription(self.websocket, message)
+        elif isinstance(message, RowAckMessage):
+            subscription = self.subscriptions.get(message.file_id)
+            if subscription is None:
+                await send_error(self.websocket, "Not subscribed to this file", message.file_id)
+                return
+            subscription.grant(message.credits)
+        elif isinstance(message, RowUnsubscribeMessage):
+            self._cancel(message.file_id)
+
+    def close(self) -> None:
+        """Stop every subscription; call when the connection ends"""
+        for file_id in list(self.subscriptions):
+            self._cancel(file_id)
+
+    def _cancel(self, file_id: int) -> None:
+        subscription = self.subscriptions.pop(file_id, None)
+        if subscription is not None:
+            subscription.cancel()
+
+
+async def send_error(websocket: WebSocket, detail: str, file_id: Optional[int] = None) -> None:
+    """Report a failed client request on the WebSocket"""
+    message = {"event": "error", "detail": detail}
+    if file_id is not None:
+        message["file_id"] = file_id
+    await websocket_manager.send(websocket, message)
@@ -1,23 +1,65 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from fastapi import HTTPException, status
-from app.database.models import User
-from typing import List
+from app.database.models import CSVFile, User
+from app.core.content_cache import content_cache
+from app.core.user_cache import user_cache
+from app.services.csv_service import (
+    list_change,
+    list_change_event,
+    lock_list_changes,
+    prune_list_changes,
+    remove_unreferenced_blob
+)
+from typing import Any, Dict, List
 
 
-def get_all_users(db: Session) -> List[User]:
+async def get_all_users(db: AsyncSession) -> List[User]:
     """Get all users (admin only)"""
-    return db.query(User).all()
+    return list(await db.scalars(select(User)))
 
 
-def delete_user(db: Session, user_id: int) -> bool:
-    """Delete a user by ID (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+async def delete_user(db: AsyncSession, user_id: int) -> List[Dict[str, Any]]:
+    """Delete a user by ID (admin only)
+
+    Their uploads are deleted with them, like delete_csv_file deletes them;
+    returns the websocket events announcing those file list changes.
+    """
+    # The delete cascades through these, and async sessions can't lazy load
+    user = await db.scalar(
+        select(User)
+        .where(User.id == user_id)
+        .options(
+            selectinload(User.csv_files).selectinload(CSVFile.column_profiles),
+            selectinload(User.csv_files).selectinload(CSVFile.processing_jobs)
+        )
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
 
-    db.delete(user)
-    db.commit()
-    return True
+    changes = [list_change("deleted", csv_file) for csv_file in user.csv_files]
+    blobs = {
+        csv_file.path: [csv_file.index_path, csv_file.columnar_path or f"{csv_file.path}.cols"]
+        for csv_file in user.csv_files
+    }
+    file_ids = [csv_file.id for csv_file in user.csv_files]
+    if changes:
+        await lock_list_changes(db)
+    db.add_all(changes)
+    await db.delete(user)
+    await db.commit()
+    user_cache.invalidate(user.username)
+
+    for file_id in file_ids:
+        content_cache.invalidate(file_id)
+    # Blobs shared with other users' uploads are kept
+    for file_path, sidecar_paths in blobs.items():
+        await remove_unreferenced_blob(db, file_path, sidecar_paths)
+
+    for change in changes:
+        await prune_list_changes(db, change.version)
+    return [list_change_event(change) for change in changes]
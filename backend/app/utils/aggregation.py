@@ -0,0 +1,224 @@
+"""Single-pass grouped aggregation over CSV rows
+
+Every accumulator is mergeable, so partial aggregations over parts of a file
+can be combined into the same result as one pass over the whole file.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from app.utils.query_engine import CountingIterator, parse_filter
+from app.utils.sketches import HyperLogLog, TDigest
+
+Row = List[Optional[str]]
+Number = Union[int, float]
+
+OPERATIONS = ("count", "sum", "min", "max", "mean", "approx_distinct", "approx_percentile")
+
+
+def _parse_number(value: Optional[str]) -> Optional[Number]:
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class _Count:
+    def __init__(self):
+        self.value = 0
+
+    def add(self, cell: Optional[str]) -> None:
+        if cell is not None and cell != "":
+            self.value += 1
+
+    def merge(self, other: "_Count") -> None:
+        self.value += other.value
+
+    def result(self) -> int:
+        return self.value
+
+
+class _RowCount(_Count):
+    def add(self, cell: Optional[str]) -> None:
+        self.value += 1
+
+
+class _Sum:
+    def __init__(self):
+        self.total: Number = 0
+        self.count = 0
+
+    def add(self, cell: Optional[str]) -> None:
+        number = _parse_number(cell)
+        if number is not None:
+            self.total += number
+            self.count += 1
+
+    def merge(self, other: "_Sum") -> None:
+        self.total += other.total
+        self.count += other.count
+
+    def result(self) -> Number:
+        return self.total
+
+
+class _Mean(_Sum):
+    def result(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+
+class _Extreme:
+    """Min or max; numbers compare numerically and order before text"""
+
+    def __init__(self, largest: bool):
+        self.largest = largest
+        self.key: Optional[Tuple] = None
+        self.value: Any = None
+
+    def add(self, cell: Optional[str]) -> None:
+        if cell is None or cell == "":
+            return
+        number = _parse_number(cell)
+        value = number if number is not None else cell
+        self._offer((0, number) if number is not None else (1, cell), value)
+
+    def _offer(self, key: Tuple, value: Any) -> None:
+        if self.key is None or (key > self.key if self.largest else key < self.key):
+            self.key, self.value = key, value
+
+    def merge(self, other: "_Extreme") -> None:
+        if other.key is not None:
+            self._offer(other.key, other.value)
+
+    def result(self) -> Any:
+        return self.value
+
+
+class _Distinct:
+    def __init__(self):
+        self.sketch = HyperLogLog()
+
+    def add(self, cell: Optional[str]) -> None:
+        if cell is not None and cell != "":
+            self.sketch.add(cell)
+
+    def merge(self, other: "_Distinct") -> None:
+        self.sketch.merge(other.sketch)
+
+    def result(self) -> int:
+        return self.sketch.count()
+
+
+class _Percentile:
+    def __init__(self, quantile: float):
+        self.quantile = quantile
+        self.sketch = TDigest()
+
+    def add(self, cell: Optional[str]) -> None:
+        number = _parse_number(cell)
+        if number is not None:
+            self.sketch.add(float(number))
+
+    def merge(self, other: "_Percentile") -> None:
+        self.sketch.merge(other.sketch)
+
+    def result(self) -> Optional[float]:
+        return self.sketch.quantile(self.quantile)
+
+
+def metric_name(operation: str, column: Optional[str], percentile: Optional[float] = None) -> str:
+    """Default output name of a metric, e.g. sum(amount) or approx_percentile(latency, 99)"""
+    if operation == "approx_percentile":
+        return f"{operation}({column}, {percentile:g})"
+    return f"{operation}({column})" if column else operation
+
+
+class Aggregator:
+    """Accumulate metrics per group in one pass over rows
+
+    metrics is a list of (operation, column position or None, percentile or
+    None). Raises TooManyGroups once more than max_groups distinct group keys
+    are seen, which keeps memory bounded.
+    """
+
+    def __init__(self, group_positions: Sequence[int], metrics: Sequence[Tuple[str, Optional[int], Optional[float]]], max_groups: int):
+        self.group_positions = list(group_positions)
+        self.metrics = list(metrics)
+        self.max_groups = max_groups
+        self.groups: Dict[Tuple, List[Any]] = {}
+
+    def _new_accumulators(self) -> List[Any]:
+        accumulators = []
+        for operation, position, percentile in self.metrics:
+            if operation == "count":
+                accumulators.append(_RowCount() if position is None else _Count())
+            elif operation == "sum":
+                accumulators.append(_Sum())
+            elif operation == "mean":
+                accumulators.append(_Mean())
+            elif operation in ("min", "max"):
+                accumulators.append(_Extreme(largest=operation == "max"))
+            elif operation == "approx_distinct":
+                accumulators.append(_Distinct())
+            else:
+                accumulators.append(_Percentile(percentile / 100))
+        return accumulators
+
+    def _group(self, key: Tuple) -> List[Any]:
+        accumulators = self.groups.get(key)
+        if accumulators is None:
+            if len(self.groups) >= self.max_groups:
+                raise TooManyGroups(f"Aggregation produces more than {self.max_groups} groups")
+            accumulators = self.groups[key] = self._new_accumulators()
+        return accumulators
+
+    def add_rows(self, rows: Iterable[Row]) -> None:
+        positions = self.group_positions
+        targets = [position for _, position, _ in self.metrics]
+        for row in rows:
+            width = len(row)
+            key = tuple(row[position] if position < width else None for position in positions)
+            for accumulator, position in zip(self._group(key), targets):
+                accumulator.add(None if position is None else (row[position] if position < width else None))
+
+    def merge(self, other: "Aggregator") -> None:
+        for key, accumulators in other.groups.items():
+            for mine, theirs in zip(self._group(key), accumulators):
+                mine.merge(theirs)
+
+    def results(self) -> List[Tuple[Tuple, List[Any]]]:
+        """(group key, metric values) pairs, sorted by group key"""
+        if not self.groups and not self.group_positions:
+            # Aggregates over zero rows still produce one ungrouped result
+            self._group(())
+        ordered = sorted(self.groups.items(), key=lambda item: tuple((value is None, value or "") for value in item[0]))
+        return [(key, [accumulator.result() for accumulator in accumulators]) for key, accumulators in ordered]
+
+
+class TooManyGroups(ValueError):
+    """Raised when the number of distinct groups exceeds the configured bound"""
+
+
+def aggregate_rows(
+    rows: Iterable[Row],
+    headers: Sequence[str],
+    kinds: Sequence[str],
+    filters: Sequence[str],
+    group_positions: Sequence[int],
+    metrics: Sequence[Tuple[str, Optional[int], Optional[float]]],
+    max_groups: int
+) -> Tuple[Aggregator, int]:
+    """Filter and aggregate a stream of rows; a map_csv_ranges task
+
+    Filters are compiled here rather than passed in, so the arguments stay
+    picklable. Returns the aggregator and the number of rows scanned.
+    """
+    predicates = [parse_filter(expression, headers, kinds) for expression in filters]
+    scanned = CountingIterator(rows)
+    filtered = (row for row in scanned if all(predicate(row) for predicate in predicates))
+    aggregator = Aggregator(group_positions, metrics, max_groups)
+    aggregator.add_rows(filtered)
+    return aggregator, scanned.count
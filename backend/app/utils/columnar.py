@@ -0,0 +1,273 @@
+"""Typed, memory-mapped columnar sidecar for parsed CSV files
+
+A converted file is a directory holding ``meta.json`` plus, per column ``i``:
+
+- ``i.valid``: one byte per row: 0 = missing cell, 1 = value, 2 = empty string
+- ``i.data``: int64 or float64 values for numeric columns, UTF-8 bytes for
+  string columns
+- ``i.offsets``: int64 start offsets into ``i.data`` (string columns only,
+  one entry per row plus a final end offset)
+
+A column is typed as int or float only when every non-empty value converts
+back to the exact same text, so cells can always be served unchanged.
+
+The sidecar serves random-access pages. Whole-file scans parse the CSV
+instead, since rebuilding every cell's text from the columns is slower.
+"""
+import array
+import csv
+import json
+import mmap
+import os
+import shutil
+from typing import Any, Dict, Iterator, List, Optional
+
+META_FILE = "meta.json"
+BATCH_ROWS = 65536
+
+MISSING = 0
+VALUE = 1
+EMPTY = 2
+
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+
+def _is_int(value: str) -> bool:
+    try:
+        number = int(value)
+    except ValueError:
+        return False
+    return str(number) == value and INT64_MIN <= number <= INT64_MAX
+
+
+def _is_float(value: str) -> bool:
+    try:
+        return repr(float(value)) == value
+    except ValueError:
+        return False
+
+
+class _ColumnWriter:
+    """Accumulate one column as strings and detect its type along the way"""
+
+    def __init__(self, directory: str, position: int):
+        self.base = os.path.join(directory, str(position))
+        self.can_be_int = True
+        self.can_be_float = True
+        self.size = 0
+        self.offsets = array.array("q", [0])
+        self.valid = bytearray()
+        self.data = bytearray()
+
+    def append(self, value: Optional[str]) -> None:
+        if value is None:
+            self.valid.append(MISSING)
+        elif value == "":
+            self.valid.append(EMPTY)
+        else:
+            self.valid.append(VALUE)
+            if self.can_be_int and not _is_int(value):
+                self.can_be_int = False
+            if self.can_be_float and not _is_float(value):
+                self.can_be_float = False
+            encoded = value.encode("utf-8")
+            self.data += encoded
+            self.size += len(encoded)
+        self.offsets.append(self.size)
+
+    def flush(self) -> None:
+        with open(f"{self.base}.valid", "ab") as file:
+            file.write(self.valid)
+        with open(f"{self.base}.data", "ab") as file:
+            file.write(self.data)
+        with open(f"{self.base}.offsets", "ab") as file:
+            self.offsets.tofile(file)
+        self.valid = bytearray()
+        self.data = bytearray()
+        self.offsets = array.array("q")
+
+    def finish(self) -> str:
+        """Rewrite numeric columns as typed arrays and return the column type"""
+        self.flush()
+        if self.can_be_int:
+            column_type, typecode, convert = "int", "q", int
+        elif self.can_be_float:
+            column_type, typecode, convert = "float", "d", float
+        else:
+            return "string"
+
+        strings = _StringColumn(self.base)
+        try:
+            with open(f"{self.base}.typed", "wb") as file:
+                for start in range(0, len(strings), BATCH_ROWS):
+                    stop = min(start + BATCH_ROWS, len(strings))
+                    values = array.array(typecode, (
+                        convert(strings.get(row)) if strings.is_value(row) else 0
+                        for row in range(start, stop)
+                    ))
+                    values.tofile(file)
+        finally:
+            strings.close()
+        os.replace(f"{self.base}.typed", f"{self.base}.data")
+        os.remove(f"{self.base}.offsets")
+        return column_type
+
+
+def build_columnar_cache(file_path: str, output_dir: str, delimiter: str = ",") -> Dict[str, Any]:
+    """Convert a CSV file to a columnar directory at output_dir
+
+    The directory is assembled under a temporary name and renamed into place,
+    so readers never observe a partial conversion. Returns the metadata.
+    """
+    temp_dir = f"{output_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+
+    try:
+        with open(file_path, "r", encoding="utf-8", newline="") as file:
+            reader = (row for row in csv.reader(file, delimiter=delimiter) if row)
+            headers = next(reader, [])
+            columns = [_ColumnWriter(temp_dir, position) for position in range(len(headers))]
+            width = len(headers)
+            total_rows = 0
+
+            for row in reader:
+                if len(row) < width:
+                    row = row + [None] * (width - len(row))
+                for column, value in zip(columns, row):
+                    column.append(value)
+                total_rows += 1
+                if total_rows % BATCH_ROWS == 0:
+                    for column in columns:
+                        column.flush()
+
+        meta = {
+            "version": 1,
+            "headers": headers,
+            "total_rows": total_rows,
+            "types": [column.finish() for column in columns],
+        }
+        with open(os.path.join(temp_dir, META_FILE), "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+
+        try:
+            os.rename(temp_dir, output_dir)
+        except OSError:
+            # Another worker converted the same blob first
+            if not os.path.isdir(output_dir):
+                raise
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+    return meta
+
+
+def _map(path: str):
+    """Memory-map a file read-only; empty files map to an empty buffer"""
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class _Column:
+    def __init__(self, base: str):
+        self._maps = []
+        self._views = []
+        self.valid = self._view(f"{base}.valid", "B")
+
+    def _view(self, path: str, typecode: str) -> memoryview:
+        mapped = _map(path)
+        if mapped is None:
+            return memoryview(array.array(typecode))
+        self._maps.append(mapped)
+        view = memoryview(mapped).cast(typecode)
+        self._views.append(view)
+        return view
+
+    def __len__(self) -> int:
+        return len(self.valid)
+
+    def is_value(self, row: int) -> bool:
+        return self.valid[row] == VALUE
+
+    def cell(self, row: int) -> Optional[str]:
+        """Original text of a cell, or None for a missing cell"""
+        state = self.valid[row]
+        if state == VALUE:
+            return self.get(row)
+        return "" if state == EMPTY else None
+
+    def close(self) -> None:
+        for view in self._views:
+            view.release()
+        for mapped in self._maps:
+            mapped.close()
+        self._views = []
+        self._maps = []
+
+
+class _StringColumn(_Column):
+    def __init__(self, base: str):
+        super().__init__(base)
+        self.offsets = self._view(f"{base}.offsets", "q")
+        self.data = self._view(f"{base}.data", "B")
+
+    def get(self, row: int) -> str:
+        return str(self.data[self.offsets[row]:self.offsets[row + 1]], "utf-8")
+
+
+class _NumericColumn(_Column):
+    def __init__(self, base: str, typecode: str):
+        super().__init__(base)
+        self.data = self._view(f"{base}.data", typecode)
+
+    def get(self, row: int) -> str:
+        return repr(self.data[row])
+
+
+class ColumnarTable:
+    """Read-only view over a columnar directory written by build_columnar_cache
+
+    Use as a context manager so the memory maps are released.
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as file:
+            meta = json.load(file)
+        self.headers: List[str] = meta["headers"]
+        self.types: List[str] = meta["types"]
+        self.total_rows: int = meta["total_rows"]
+        self.columns: List[_Column] = []
+        try:
+            for position, column_type in enumerate(self.types):
+                base = os.path.join(directory, str(position))
+                if column_type == "int":
+                    self.columns.append(_NumericColumn(base, "q"))
+                elif column_type == "float":
+                    self.columns.append(_NumericColumn(base, "d"))
+                else:
+                    self.columns.append(_StringColumn(base))
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self) -> "ColumnarTable":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for column in self.columns:
+            column.close()
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> Iterator[List[Optional[str]]]:
+        """Yield rows in [start, stop) as lists of original cell text"""
+        stop = self.total_rows if stop is None else min(stop, self.total_rows)
+        columns = self.columns
+        for row in range(start, stop):
+            yield [column.cell(row) for column in columns]
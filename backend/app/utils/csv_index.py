@@ -0,0 +1,122 @@
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List
+
+_SPECIAL_BYTES = re.compile(rb'["\r\n]')
+
+
+class RowIndexBuilder:
+    """Build a sparse byte-offset index of CSV records from raw chunks
+
+    Chunks are fed in file order as they are written. Record boundaries are
+    tracked outside quoted fields, so newlines embedded in quoted values do not
+    start a new record. Blank lines are skipped, matching csv.reader. Row 0 is
+    the first record after the header; the byte offset of every
+    ``interval``-th row is recorded as a checkpoint.
+
+    To scan part of a file, pass the byte position of a record start and the
+    row number of that record (-1 for the header).
+    """
+
+    def __init__(self, interval: int = 1000, delimiter: bytes = b",", position: int = 0, row: int = -1):
+        self.interval = interval
+        self.delimiter = delimiter[0]
+        self.offsets: List[int] = []
+        self.records = row + 1
+        self._pos = position
+        self._record_start = position
+        self._has_content = False
+        self._in_quotes = False
+        self._closed_at = -2
+        self._prev_byte = None
+
+    def feed(self, chunk: bytes) -> None:
+        """Consume the next chunk of the file"""
+        base = self._pos
+        for match in _SPECIAL_BYTES.finditer(chunk):
+            index = match.start()
+            position = base + index
+            char = chunk[index]
+
+            if char == 0x22:  # '"'
+                if self._in_quotes:
+                    self._in_quotes = False
+                    self._closed_at = position
+                elif position == self._closed_at + 1:
+                    # Escaped quote ("") inside a quoted field
+                    self._in_quotes = True
+                else:
+                    previous = chunk[index - 1] if index else self._prev_byte
+                    # Quotes only open a quoted field at the start of a field
+                    if position == self._record_start or previous == self.delimiter:
+                        self._in_quotes = True
+                    self._has_content = True
+            elif not self._in_quotes:
+                self._end_record(position)
+
+        if chunk:
+            self._prev_byte = chunk[-1]
+        self._pos += len(chunk)
+
+    def finish(self) -> Dict[str, Any]:
+        """Flush the trailing record and return the index"""
+        self._end_record(self._pos)
+        return {
+            "interval": self.interval,
+            "total_rows": self.total_rows,
+            "offsets": self.offsets,
+        }
+
+    @property
+    def total_rows(self) -> int:
+        """Number of data rows seen so far, excluding the header"""
+        return max(self.records - 1, 0)
+
+    def _end_record(self, position: int) -> None:
+        if self._has_content or position > self._record_start:
+            row = self.records - 1
+            if row >= 0 and row % self.interval == 0:
+                self.offsets.append(self._record_start)
+            self.records += 1
+        self._record_start = position + 1
+        self._has_content = False
+
+
+def save_row_index(index: Dict[str, Any], index_path: str) -> None:
+    """Persist a row index next to its CSV file
+
+    The index is written to a temporary file and renamed into place, so
+    concurrent readers never see a partially written index.
+    """
+    temp_path = f"{index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(index, file)
+    os.replace(temp_path, index_path)
+
+
+def load_row_index(index_path: str) -> Dict[str, Any]:
+    """Load a row index written by save_row_index"""
+    with open(index_path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def build_row_index_file(
+    file_path: str,
+    index_path: str,
+    delimiter: str = ",",
+    interval: int = 1000,
+    chunk_size: int = 1024 * 1024
+) -> Dict[str, Any]:
+    """Scan a stored CSV file, save its row index to index_path and return it"""
+    builder = RowIndexBuilder(interval=interval, delimiter=delimiter.encode())
+    with open(file_path, "rb") as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            builder.feed(chunk)
+    index = builder.finish()
+    save_row_index(index, index_path)
+    return index
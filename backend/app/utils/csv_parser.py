@@ -1,20 +1,447 @@
+import bisect
+import codecs
 import csv
+import io
+import mmap
 import os
-from typing import List, Dict, Any
+import re
+from concurrent.futures import Executor
+from typing import List, Dict, Any, BinaryIO, Callable, Iterable, Optional, Iterator, Sequence, Tuple
+from app.utils.csv_index import RowIndexBuilder
 
+SNIFF_DELIMITERS = ",;\t|"
+SNIFF_SAMPLE_SIZE = 64 * 1024
+SCAN_BLOCK_SIZE = 1024 * 1024
+ROW_SCAN_CHUNK_SIZE = 64 * 1024
 
-def parse_csv_file(file_path: str) -> Dict[str, Any]:
-    """Parse a CSV file and return headers and rows as dictionaries"""
+_QUOTE_OR_NEWLINE = re.compile(rb'["\n]')
+_QUOTE = re.compile(rb'"')
+
+
+def parse_csv_file(
+    file_path: str,
+    delimiter: str = ',',
+    executor: Optional[Executor] = None,
+    parts: int = 1,
+    row_index: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Parse a CSV file and return its headers and rows
+
+    Rows are lists in header order; blank lines are skipped. With an executor
+    and more than one part, byte ranges of the file are parsed in parallel
+    (see map_csv_ranges).
+    """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"CSV file not found: {file_path}")
 
-    with open(file_path, 'r', encoding='utf-8') as file:
-        csv_reader = csv.DictReader(file)
-        headers = csv_reader.fieldnames or []
-        rows = [row for row in csv_reader]
+    headers = read_csv_header(file_path, delimiter)
+    rows = []
+    for part in map_csv_ranges(file_path, list, (), executor, parts, delimiter, row_index):
+        rows.extend(part)
 
     return {
         "headers": headers,
         "rows": rows,
         "total_rows": len(rows)
     }
+
+
+def read_csv_header(file_path: str, delimiter: str = ',') -> List[str]:
+    """Read the header row of a CSV file; empty files have no headers"""
+    rows = iter_csv_rows(file_path, delimiter)
+    try:
+        return next(rows, [])
+    finally:
+        rows.close()
+
+
+def split_csv_ranges(
+    file_path: str,
+    parts: int,
+    delimiter: str = ',',
+    row_index: Optional[Dict[str, Any]] = None
+) -> List[Tuple[int, int]]:
+    """Split a CSV file into at most ``parts`` byte ranges on record boundaries
+
+    The first range starts at byte 0 and includes the header. With a row index
+    the ranges start at its checkpoints, which are exact record starts.
+    Otherwise boundaries come from a quote-parity pre-pass: outside quoted
+    fields the number of quote characters seen so far is even, so a split is
+    placed at the first newline after the target offset where the parity is
+    even. That holds whenever quotes only open at the start of a field, which
+    map_csv_ranges verifies while parsing.
+    """
+    size = os.path.getsize(file_path)
+    if parts <= 1 or size == 0:
+        return [(0, size)]
+
+    targets = [size * i // parts for i in range(1, parts)]
+    if row_index is not None:
+        checkpoints = row_index["offsets"]
+        starts = set()
+        for target in targets:
+            position = bisect.bisect_left(checkpoints, target)
+            if position < len(checkpoints):
+                starts.add(checkpoints[position])
+    else:
+        starts = set(_parity_boundaries(file_path, targets))
+
+    bounds = [0] + sorted(start for start in starts if 0 < start < size) + [size]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _parity_boundaries(file_path: str, targets: Sequence[int]) -> Iterator[int]:
+    """Byte offsets just after the first newline outside quotes at or past each target"""
+    with open(file_path, 'rb') as file:
+        position = 0
+        quotes = 0
+        for target in targets:
+            if target < position:
+                continue
+            # Count quotes up to the target; only the parity matters
+            while position < target:
+                block = file.read(min(SCAN_BLOCK_SIZE, target - position))
+                if not block:
+                    return
+                quotes += block.count(b'"')
+                position += len(block)
+
+            # Walk forward to the first newline at even parity
+            boundary = None
+            while boundary is None:
+                block = file.read(SCAN_BLOCK_SIZE)
+                if not block:
+                    return
+                for match in _QUOTE_OR_NEWLINE.finditer(block):
+                    if match.group() == b'"':
+                        quotes += 1
+                    elif quotes % 2 == 0:
+                        boundary = position + match.end()
+                        break
+                if boundary is None:
+                    position += len(block)
+                else:
+                    quotes += block.count(b'"', boundary - position)
+                    position += len(block)
+            yield boundary
+
+
+def map_csv_ranges(
+    file_path: str,
+    task: Callable[..., Any],
+    args: Tuple = (),
+    executor: Optional[Executor] = None,
+    parts: int = 1,
+    delimiter: str = ',',
+    row_index: Optional[Dict[str, Any]] = None
+) -> List[Any]:
+    """Run ``task(rows, *args)`` over the data rows of a CSV file, in parallel
+
+    The file is split into byte ranges (split_csv_ranges), each range is
+    parsed and passed to the task in the executor, and the results are
+    returned in file order, so partial results can be concatenated or merged.
+    task must be a picklable top-level function when the executor is a
+    process pool. Without an executor, with one part, or when a range shows
+    that the quote-parity split cannot be trusted, the task runs once over
+    all rows and a single result is returned.
+    """
+    if executor is None or parts <= 1:
+        return [_run_serial(file_path, delimiter, task, args)]
+
+    ranges = split_csv_ranges(file_path, parts, delimiter, row_index)
+    validate = row_index is None
+    futures = [
+        executor.submit(_run_range, file_path, start, end, delimiter, validate, task, args)
+        for start, end in ranges
+    ]
+    results = [future.result() for future in futures]
+    if not all(valid for valid, _ in results):
+        return [_run_serial(file_path, delimiter, task, args)]
+    return [result for _, result in results]
+
+
+def _run_serial(file_path: str, delimiter: str, task: Callable[..., Any], args: Tuple) -> Any:
+    rows = iter_csv_rows(file_path, delimiter)
+    try:
+        next(rows, None)
+        return task(rows, *args)
+    finally:
+        rows.close()
+
+
+def _run_range(
+    file_path: str,
+    start: int,
+    end: int,
+    delimiter: str,
+    validate: bool,
+    task: Callable[..., Any],
+    args: Tuple
+) -> Tuple[bool, Any]:
+    """Parse one byte range and run the task over its rows
+
+    Returns (False, None) without running the task if validate is set and
+    the range has a quote that does not open a field at even parity, which
+    means the parity split may have cut a record. The range is read in
+    blocks, so memory use does not depend on the range size.
+    """
+    with open(file_path, 'rb') as file:
+        if validate:
+            blocks = _RangeFile(file, start, end)
+            if not _quotes_open_fields(iter(lambda: blocks.read(SCAN_BLOCK_SIZE), b''), delimiter.encode()):
+                return False, None
+
+        text = io.TextIOWrapper(
+            io.BufferedReader(_RangeFile(file, start, end), SCAN_BLOCK_SIZE), encoding='utf-8', newline=''
+        )
+        rows = (row for row in csv.reader(text, delimiter=delimiter) if row)
+        if start == 0:
+            next(rows, None)
+        return True, task(rows, *args)
+
+
+class _RangeFile(io.RawIOBase):
+    """Read-only view of bytes [start, end) of an open binary file"""
+
+    def __init__(self, file: BinaryIO, start: int, end: int):
+        file.seek(start)
+        self._file = file
+        self._remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._remaining <= 0:
+            return 0
+        with memoryview(buffer) as view:
+            count = self._file.readinto(view[:self._remaining]) or 0
+        self._remaining -= count
+        return count
+
+
+def _quotes_open_fields(blocks: Iterable[bytes], delimiter: bytes) -> bool:
+    """Check that every quote at even parity starts a field
+
+    Closing and escaped ("") quotes come at odd parity or right after another
+    quote. When this holds the quote parity matches csv.reader's quoting
+    state, so newlines at even parity are record boundaries.
+    """
+    field_starts = (delimiter[0], 0x0A, 0x0D, 0x22)
+    count = 0
+    # The byte before the current block; None at the start of the range
+    previous = None
+    for block in blocks:
+        for match in _QUOTE.finditer(block):
+            if count % 2 == 0:
+                index = match.start()
+                before = block[index - 1] if index > 0 else previous
+                if before is not None and before not in field_starts:
+                    return False
+            count += 1
+        if block:
+            previous = block[-1]
+    return True
+
+
+def sniff_csv_header(first_chunk: bytes) -> Tuple[str, List[str]]:
+    """Detect the delimiter and header row from the first chunk of a CSV file
+
+    Raises ValueError if the chunk is not UTF-8 text or has no header row.
+    """
+    # An incremental decoder tolerates a multi-byte character cut at the end
+    try:
+        text = codecs.getincrementaldecoder('utf-8')().decode(first_chunk[:SNIFF_SAMPLE_SIZE])
+    except UnicodeDecodeError:
+        raise ValueError("CSV file must be UTF-8 encoded")
+
+    # Only sniff complete lines so a truncated record does not skew detection
+    last_newline = text.rfind('\n')
+    sample = text[:last_newline + 1] if last_newline >= 0 else text
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=SNIFF_DELIMITERS).delimiter
+    except csv.Error:
+        delimiter = ','
+
+    headers = next((row for row in csv.reader(io.StringIO(text, newline=''), delimiter=delimiter) if row), [])
+    if not headers:
+        raise ValueError("CSV file has no header row")
+    return delimiter, headers
+
+
+def read_csv_page(
+    file_path: str,
+    offset: int,
+    limit: int,
+    row_index: Optional[Dict[str, Any]] = None,
+    delimiter: str = ','
+) -> Dict[str, Any]:
+    """Read a window of rows from a CSV file
+
+    Only rows in [offset, offset + limit) are kept in memory. With a row index
+    (see app.utils.csv_index) the reader seeks to the nearest checkpoint before
+    offset and stops once the window is filled; without one the rest of the
+    file is streamed through the reader to count the total number of rows.
+    Rows are returned as lists in header order. Blank lines are skipped, the
+    same way csv.DictReader does.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"CSV file not found: {file_path}")
+
+    end = offset + limit
+    rows: List[List[str]] = []
+
+    with open(file_path, 'rb') as raw_file:
+        file = io.TextIOWrapper(raw_file, encoding='utf-8', newline='')
+        csv_reader = csv.reader(file, delimiter=delimiter)
+        headers = next(csv_reader, [])
+
+        if row_index is None:
+            total_rows = 0
+            for row in csv_reader:
+                if not row:
+                    continue
+                if offset <= total_rows < end:
+                    rows.append(row)
+                total_rows += 1
+        else:
+            total_rows = row_index["total_rows"]
+            interval = row_index["interval"]
+            checkpoints = row_index["offsets"]
+            if offset >= total_rows:
+                return {"headers": headers, "rows": rows, "total_rows": total_rows}
+
+            # Jump to the closest checkpoint at or before offset
+            checkpoint = min(offset // interval, len(checkpoints) - 1)
+            file.detach()
+            raw_file.seek(checkpoints[checkpoint])
+            file = io.TextIOWrapper(raw_file, encoding='utf-8', newline='')
+            current = checkpoint * interval
+            for row in csv.reader(file, delimiter=delimiter):
+                if not row:
+                    continue
+                if current >= end:
+                    break
+                if current >= offset:
+                    rows.append(row)
+                current += 1
+
+    return {
+        "headers": headers,
+        "rows": rows,
+        "total_rows": total_rows
+    }
+
+
+class MappedCSVFile:
+    """Read-only memory map of a stored CSV file for serving raw row windows
+
+    Row windows are returned as memoryview slices of the map, so their bytes
+    are never decoded or copied. Record boundaries are found from the
+    nearest row index checkpoint, or by scanning from the header without an
+    index. Release every slice before closing the file.
+    """
+
+    def __init__(self, file_path: str, delimiter: str = ',', row_index: Optional[Dict[str, Any]] = None):
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"CSV file not found: {file_path}")
+
+        self.delimiter = delimiter
+        self.row_index = row_index
+        self.file = open(file_path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        # Empty files cannot be mapped
+        self._map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self.buffer = memoryview(self._map if self._map is not None else b"")
+
+    def __enter__(self) -> "MappedCSVFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.buffer.release()
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # A slice is still referenced; the map is released with it
+                pass
+        self.file.close()
+
+    def row_offset(self, row: int, known: Tuple[int, int] = (-1, 0)) -> int:
+        """Byte offset where data row ``row`` starts, or the file size past the last row
+
+        known is the row number and byte offset of a record start at or
+        before ``row`` (-1 for the header); scanning starts there unless an
+        index checkpoint is closer.
+        """
+        first, position = known
+        if self.row_index is not None:
+            checkpoints = self.row_index["offsets"]
+            if row >= self.row_index["total_rows"] or not checkpoints:
+                return self.size
+            checkpoint = min(row // self.row_index["interval"], len(checkpoints) - 1)
+            if checkpoint * self.row_index["interval"] > first:
+                first, position = checkpoint * self.row_index["interval"], checkpoints[checkpoint]
+
+        # Offsets are recorded for every row from the first one scanned
+        builder = RowIndexBuilder(interval=1, delimiter=self.delimiter.encode(), position=position, row=first)
+        wanted = row - max(first, 0)
+        while len(builder.offsets) <= wanted:
+            if position >= self.size:
+                builder.finish()
+                break
+            chunk = self.buffer[position:position + ROW_SCAN_CHUNK_SIZE]
+            builder.feed(chunk)
+            chunk.release()
+            position += ROW_SCAN_CHUNK_SIZE
+        return builder.offsets[wanted] if len(builder.offsets) > wanted else self.size
+
+    def row_range(self, start: int, stop: int) -> Tuple[int, int]:
+        """Byte range covering data rows [start, stop)"""
+        begin = self.row_offset(start)
+        # Continue from start rather than scanning the file again for stop
+        end = self.row_offset(stop, (start, begin)) if stop > start else begin
+        return begin, max(begin, end)
+
+    def header(self) -> memoryview:
+        """The header record, with its line terminator"""
+        return self.buffer[:self.row_offset(0)]
+
+    def rows(self, start: int, stop: int) -> memoryview:
+        """Raw bytes of data rows [start, stop), including their line terminators"""
+        begin, end = self.row_range(start, stop)
+        return self.buffer[begin:end]
+
+
+def iter_csv_rows(file_path: str, delimiter: str = ',') -> Iterator[List[str]]:
+    """Yield the header row followed by every non-blank data row
+
+    Rows are read lazily, so memory use does not depend on the file size.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"CSV file not found: {file_path}")
+
+    with open(file_path, 'r', encoding='utf-8', newline='') as file:
+        for row in csv.reader(file, delimiter=delimiter):
+            if row:
+                yield row
+
+
+def iter_file_chunks(file_path: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Yield the raw bytes of a file in fixed-size chunks"""
+    with open(file_path, 'rb') as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def row_to_dict(headers: List[str], row: List[str]) -> Dict[str, Optional[str]]:
+    """Map a row onto the headers, padding short rows with None"""
+    if len(row) < len(headers):
+        row = row + [None] * (len(headers) - len(row))
+    return dict(zip(headers, row))
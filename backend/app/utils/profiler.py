@@ -0,0 +1,203 @@
+"""Per-column statistics computed in one streaming pass
+
+Profilers are mergeable, like the accumulators in app.utils.aggregation, so
+parts of a file can be profiled separately and combined.
+"""
+import math
+from concurrent.futures import Executor
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from app.utils.csv_parser import iter_csv_rows, map_csv_ranges, read_csv_header
+from app.utils.sketches import FrequentValues, HyperLogLog, TDigest
+
+Row = List[Optional[str]]
+
+
+class ColumnProfiler:
+    """Accumulate type, null, range, cardinality and distribution statistics"""
+
+    def __init__(self, top_k: int = 10):
+        self.top_k = top_k
+        self.null_count = 0
+        self.value_count = 0
+        self.all_int = True
+        self.all_number = True
+        self.text_min: Optional[str] = None
+        self.text_max: Optional[str] = None
+        self.number_min: Any = None
+        self.number_max: Any = None
+        self.distinct = HyperLogLog()
+        self.frequent = FrequentValues(capacity=top_k * 10)
+        # Dropped as soon as a non-numeric value shows up
+        self.digest: Optional[TDigest] = TDigest()
+
+    def add(self, cell: Optional[str]) -> None:
+        if cell is None or cell == "":
+            self.null_count += 1
+            return
+
+        self.value_count += 1
+        if self.text_min is None or cell < self.text_min:
+            self.text_min = cell
+        if self.text_max is None or cell > self.text_max:
+            self.text_max = cell
+        self.distinct.add(cell)
+        self.frequent.add(cell)
+
+        if self.all_number:
+            try:
+                number = int(cell)
+            except ValueError:
+                self.all_int = False
+                try:
+                    number = float(cell)
+                except ValueError:
+                    self.all_number = False
+                    self.digest = None
+                    return
+            self._offer_number(number)
+            self.digest.add(float(number))
+
+    def _offer_number(self, number: Any) -> None:
+        if self.number_min is None or number < self.number_min:
+            self.number_min = number
+        if self.number_max is None or number > self.number_max:
+            self.number_max = number
+
+    def merge(self, other: "ColumnProfiler") -> None:
+        self.null_count += other.null_count
+        self.value_count += other.value_count
+        self.all_int = self.all_int and other.all_int
+        self.all_number = self.all_number and other.all_number
+        for candidate in (other.text_min, other.text_max):
+            if candidate is None:
+                continue
+            if self.text_min is None or candidate < self.text_min:
+                self.text_min = candidate
+            if self.text_max is None or candidate > self.text_max:
+                self.text_max = candidate
+        for candidate in (other.number_min, other.number_max):
+            if candidate is not None:
+                self._offer_number(candidate)
+        self.distinct.merge(other.distinct)
+        self.frequent.merge(other.frequent)
+        if self.all_number and self.digest is not None and other.digest is not None:
+            self.digest.merge(other.digest)
+        else:
+            self.digest = None
+
+    @property
+    def inferred_type(self) -> str:
+        if self.value_count == 0:
+            return "empty"
+        if self.all_int:
+            return "int"
+        return "float" if self.all_number else "string"
+
+    def result(self, histogram_bins: int = 20) -> Dict[str, Any]:
+        column_type = self.inferred_type
+        if column_type in ("int", "float"):
+            min_value, max_value = str(self.number_min), str(self.number_max)
+            histogram = self._histogram(histogram_bins)
+        else:
+            min_value, max_value = self.text_min, self.text_max
+            histogram = None
+
+        return {
+            "inferred_type": column_type,
+            "null_count": self.null_count,
+            "value_count": self.value_count,
+            "min_value": min_value,
+            "max_value": max_value,
+            "distinct_estimate": min(self.distinct.count(), self.value_count),
+            "top_values": [{"value": value, "count": count} for value, count in self.frequent.top(self.top_k)],
+            "histogram": histogram,
+        }
+
+    def _histogram(self, bins: int) -> Optional[List[Dict[str, Any]]]:
+        """Equal-width bins between min and max, with counts estimated from the t-digest"""
+        low, high = self.digest.min, self.digest.max
+        if not (math.isfinite(low) and math.isfinite(high)):
+            return None
+        if low == high:
+            return [{"lower": low, "upper": high, "count": self.value_count}]
+
+        width = (high - low) / bins
+        edges = [low + width * i for i in range(bins)] + [high]
+        histogram = []
+        previous = 0
+        for i in range(bins):
+            cumulative = self.value_count if i == bins - 1 else int(round(self.digest.cdf(edges[i + 1]) * self.value_count))
+            histogram.append({"lower": edges[i], "upper": edges[i + 1], "count": max(cumulative - previous, 0)})
+            previous = max(cumulative, previous)
+        return histogram
+
+
+class TableProfiler:
+    """Profile every column of a table from a stream of rows"""
+
+    def __init__(self, headers: Sequence[str], top_k: int = 10):
+        self.headers = list(headers)
+        self.columns = [ColumnProfiler(top_k) for _ in self.headers]
+        self.row_count = 0
+
+    def add_rows(self, rows: Iterable[Row]) -> None:
+        columns = self.columns
+        width = len(columns)
+        for row in rows:
+            self.row_count += 1
+            if len(row) < width:
+                row = row + [None] * (width - len(row))
+            for column, cell in zip(columns, row):
+                column.add(cell)
+
+    def merge(self, other: "TableProfiler") -> None:
+        self.row_count += other.row_count
+        for mine, theirs in zip(self.columns, other.columns):
+            mine.merge(theirs)
+
+    def results(self, histogram_bins: int = 20) -> List[Dict[str, Any]]:
+        profiles = []
+        for position, (name, column) in enumerate(zip(self.headers, self.columns)):
+            profile = column.result(histogram_bins)
+            profile.update({"position": position, "name": name})
+            profiles.append(profile)
+        return profiles
+
+
+def profile_rows(rows: Iterable[Row], headers: Sequence[str], top_k: int = 10) -> TableProfiler:
+    """Profile a stream of rows; a map_csv_ranges task"""
+    profiler = TableProfiler(headers, top_k=top_k)
+    profiler.add_rows(rows)
+    return profiler
+
+
+def profile_file(
+    file_path: str,
+    delimiter: str = ",",
+    top_k: int = 10,
+    histogram_bins: int = 20,
+    executor: Optional[Executor] = None,
+    parts: int = 1,
+    row_index: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """Profile every column of a stored CSV file
+
+    With an executor and more than one part, byte ranges of the CSV file are
+    profiled in parallel and the partial profiles merged; otherwise in one
+    pass over the CSV file.
+    """
+    if executor is not None and parts > 1:
+        headers = read_csv_header(file_path, delimiter)
+        partials = map_csv_ranges(file_path, profile_rows, (headers, top_k), executor, parts, delimiter, row_index)
+        profiler = partials[0]
+        for partial in partials[1:]:
+            profiler.merge(partial)
+        return profiler.results(histogram_bins)
+
+    rows = iter_csv_rows(file_path, delimiter)
+    try:
+        headers = next(rows, [])
+        profiler = profile_rows(rows, headers, top_k)
+    finally:
+        rows.close()
+    return profiler.results(histogram_bins)
@@ -0,0 +1,391 @@
+"""Streaming filter and sort engine over CSV rows
+
+Rows are lists of cell text in header order (missing cells are None). Column
+kinds are inferred as "number" or "string"; number columns compare
+numerically, and cells that don't parse fall back to text comparison so a
+stray value never fails a query. Empty and missing cells are nulls: they only
+match ``eq`` with an empty value or ``ne`` with a non-empty one, and sort
+last in ascending order.
+"""
+import heapq
+import itertools
+import math
+import os
+import pickle
+import re
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+Row = List[Optional[str]]
+Predicate = Callable[[Row], bool]
+
+OPERATORS = ("eq", "ne", "lt", "le", "gt", "ge", "contains", "regex", "in")
+IN_SEPARATOR = "|"
+MAX_REGEX_LENGTH = 256
+TYPE_SAMPLE_ROWS = 1000
+
+
+def _to_number(value: Optional[str]) -> Optional[float]:
+    """Parse a finite decimal number; text such as "nan", "inf" or "1_000" is not one"""
+    if value is None or value == "" or "_" in value:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    # NaN would make comparisons and sorting inconsistent
+    return number if math.isfinite(number) else None
+
+
+def infer_column_kinds(headers: Sequence[str], sample: Iterable[Row]) -> List[str]:
+    """Infer "number" or "string" per column from a sample of rows"""
+    numeric = [True] * len(headers)
+    seen = [False] * len(headers)
+    for row in sample:
+        for position, value in enumerate(row[:len(headers)]):
+            if value is None or value == "" or not numeric[position]:
+                continue
+            seen[position] = True
+            if _to_number(value) is None:
+                numeric[position] = False
+    return ["number" if numeric[i] and seen[i] else "string" for i in range(len(headers))]
+
+
+def column_position(headers: Sequence[str], column: str) -> int:
+    """Index of a column in the headers; raises ValueError for unknown names"""
+    try:
+        return list(headers).index(column)
+    except ValueError:
+        raise ValueError(f"Unknown column: {column}")
+
+
+def _sort_value(value: Optional[str], kind: str) -> Tuple:
+    """Comparable key: numbers, then non-numeric text, then nulls"""
+    if value is None or value == "":
+        return (2, "")
+    if kind == "number":
+        number = _to_number(value)
+        if number is not None:
+            return (0, number)
+    return (1, value)
+
+
+def parse_filter(expression: str, headers: Sequence[str], kinds: Sequence[str]) -> Predicate:
+    """Compile a ``column:operator:value`` filter expression into a predicate
+
+    ``in`` takes ``|``-separated values; ``regex`` uses Python syntax and
+    matches anywhere in the cell, without backreferences or nested
+    quantifiers, which can take exponential time.
+    """
+    parts = expression.split(":", 2)
+    if len(parts) != 3:
+        raise ValueError(f"Invalid filter '{expression}', expected column:operator:value")
+    column, operator, operand = parts
+    if operator not in OPERATORS:
+        raise ValueError(f"Invalid filter operator '{operator}', expected one of {', '.join(OPERATORS)}")
+
+    position = column_position(headers, column)
+    kind = kinds[position]
+
+    def cell(row: Row) -> Optional[str]:
+        value = row[position] if position < len(row) else None
+        return None if value == "" else value
+
+    if operator in ("eq", "ne"):
+        if operand == "":
+            is_null = lambda row: cell(row) is None
+            return is_null if operator == "eq" else (lambda row: not is_null(row))
+        target = _sort_value(operand, kind)
+        equals = lambda row: _sort_value(cell(row), kind) == target
+        return equals if operator == "eq" else (lambda row: cell(row) is not None and not equals(row))
+
+    if operator in ("lt", "le", "gt", "ge"):
+        target = _sort_value(operand, kind)
+        compare = {
+            "lt": lambda a: a < target,
+            "le": lambda a: a <= target,
+            "gt": lambda a: a > target,
+            "ge": lambda a: a >= target,
+        }[operator]
+        # Only compare values of the same class (number vs number, text vs text)
+        return lambda row: (
+            cell(row) is not None
+            and _sort_value(cell(row), kind)[0] == target[0]
+            and compare(_sort_value(cell(row), kind))
+        )
+
+    if operator == "contains":
+        return lambda row: cell(row) is not None and operand in cell(row)
+
+    if operator == "regex":
+        if len(operand) > MAX_REGEX_LENGTH:
+            raise ValueError(f"Regular expression is longer than {MAX_REGEX_LENGTH} characters")
+        try:
+            pattern = re.compile(operand)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression '{operand}': {e}")
+        _check_backtracking(sre_parse.parse(operand), operand)
+        return lambda row: cell(row) is not None and pattern.search(cell(row)) is not None
+
+    targets = {_sort_value(value, kind) for value in operand.split(IN_SEPARATOR)}
+    return lambda row: _sort_value(cell(row), kind) in targets
+
+
+def _check_backtracking(items: Iterable[Tuple[Any, Any]], pattern: str, repeated: bool = False) -> None:
+    """Reject regex constructs that can backtrack exponentially, like ``(a+)+``
+
+    These are backreferences, and quantifiers of variable count or
+    alternations inside a repeated group. repeated is set within a repeat.
+    """
+    for op, value in items:
+        if op in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS):
+            raise ValueError(f"Backreferences are not supported in regular expressions: '{pattern}'")
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) or op is getattr(sre_parse, "POSSESSIVE_REPEAT", None):
+            low, high, body = value
+            if repeated and high > low:
+                raise ValueError(f"Nested quantifiers are not supported in regular expressions: '{pattern}'")
+            _check_backtracking(body, pattern, repeated or high > 1)
+        elif op is sre_parse.BRANCH:
+            if repeated:
+                raise ValueError(f"Alternation inside a repeated group is not supported in regular expressions: '{pattern}'")
+            for branch in value[1]:
+                _check_backtracking(branch, pattern, repeated)
+        elif op is sre_parse.SUBPATTERN:
+            _check_backtracking(value[-1], pattern, repeated)
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            _check_backtracking(value[1], pattern, repeated)
+        elif op is getattr(sre_parse, "ATOMIC_GROUP", None):
+            _check_backtracking(value, pattern, repeated)
+
+
+def parse_sort(expression: str, headers: Sequence[str], kinds: Sequence[str]) -> Callable[[Row], Tuple]:
+    """Compile ``col,-col2`` (``-`` for descending) into a sort key function"""
+    columns = []
+    for part in expression.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        descending = part.startswith("-")
+        name = part[1:] if descending else part
+        position = column_position(headers, name)
+        columns.append((position, kinds[position], descending))
+    if not columns:
+        raise ValueError("Sort expression names no columns")
+
+    def key(row: Row) -> Tuple:
+        values = []
+        for position, kind, descending in columns:
+            value = _sort_value(row[position] if position < len(row) else None, kind)
+            values.append(_Descending(value) if descending else value)
+        return tuple(values)
+
+    return key
+
+
+class _Descending:
+    """Invert the ordering of a sort key component"""
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __lt__(self, other: "_Descending") -> bool:
+        return other.value < self.value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Descending) and self.value == other.value
+
+
+def run_query(
+    rows: Iterable[Row],
+    predicates: Sequence[Predicate],
+    sort_key: Optional[Callable[[Row], Tuple]],
+    offset: int,
+    limit: int,
+    memory_rows: int,
+    spill_dir: Optional[str] = None,
+    stop_early: bool = True
+) -> Dict[str, Any]:
+    """Filter, sort and paginate a stream of rows
+
+    Returns the page and ``matched_rows``, the number of rows that pass the
+    filters. Unsorted queries stop reading once the page is filled (plus one
+    row to detect a next page) when stop_early is set, leaving matched_rows
+    as None. Sorted queries keep the smallest offset + limit rows in a heap,
+    or fall back to an external merge sort through spill_dir when that
+    exceeds memory_rows.
+    """
+    if predicates:
+        rows = (row for row in rows if all(predicate(row) for predicate in predicates))
+
+    end = offset + limit
+    if sort_key is None:
+        page = []
+        matched = 0
+        for row in rows:
+            if offset <= matched < end:
+                page.append(row)
+            matched += 1
+            if stop_early and matched > end:
+                return {"rows": page, "matched_rows": None, "has_more": True}
+        return {"rows": page, "matched_rows": matched, "has_more": matched > end}
+
+    counter = CountingIterator(rows)
+    if end <= memory_rows:
+        page = heapq.nsmallest(end, counter, key=sort_key)[offset:end]
+    else:
+        # Runs are written from every row before the merge yields anything
+        merged = _external_sort(counter, sort_key, memory_rows, spill_dir)
+        try:
+            page = list(itertools.islice(merged, offset, end))
+        finally:
+            merged.close()
+    return {"rows": page, "matched_rows": counter.count, "has_more": counter.count > end}
+
+
+class CountingIterator:
+    """Iterator wrapper that counts the rows passing through it"""
+
+    def __init__(self, rows: Iterable[Row]):
+        self._rows = iter(rows)
+        self.count = 0
+        self.exhausted = False
+
+    def __iter__(self) -> "CountingIterator":
+        return self
+
+    def __next__(self) -> Row:
+        try:
+            row = next(self._rows)
+        except StopIteration:
+            self.exhausted = True
+            raise
+        self.count += 1
+        return row
+
+
+class QueryCursor:
+    """Every match of a filter/sort query after offset, read a batch at a time
+
+    The query runs once however many batches are fetched. Sorted queries read
+    every row on the first fetch and keep the matches in memory, or in runs
+    spilled to spill_dir beyond memory_rows. fetch and close may be called
+    from different threads; close releases the rows and any spilled runs.
+    sample holds rows already taken from rows, which are matched first.
+    """
+
+    def __init__(
+        self,
+        rows: Iterable[Row],
+        predicates: Sequence[Predicate],
+        sort_key: Optional[Callable[[Row], Tuple]],
+        offset: int,
+        memory_rows: int,
+        spill_dir: Optional[str] = None,
+        sample: Sequence[Row] = ()
+    ):
+        self._rows = rows
+        self.scanned = CountingIterator(itertools.chain(sample, rows))
+        matches: Iterable[Row] = self.scanned
+        if predicates:
+            matches = (row for row in matches if all(predicate(row) for predicate in predicates))
+        self.matched = CountingIterator(matches)
+        self._sorted = None if sort_key is None else _sort_rows(self.matched, sort_key, memory_rows, spill_dir)
+        self._matches = itertools.islice(self.matched if self._sorted is None else self._sorted, offset, None)
+        self._peeked: Optional[Row] = None
+        self._lock = threading.Lock()
+        # Index among the matches of the next row to fetch
+        self.position = offset
+        self.done = False
+
+    @property
+    def matched_rows(self) -> Optional[int]:
+        """Number of rows that pass the filters, once every row has been scanned"""
+        return self.matched.count if self.scanned.exhausted else None
+
+    def fetch(self, limit: int) -> List[Row]:
+        """Up to limit next matches; done is set once no more are left"""
+        with self._lock:
+            page = [] if self._peeked is None else [self._peeked]
+            # One row past the page tells whether another one follows
+            page.extend(itertools.islice(self._matches, limit + 1 - len(page)))
+            if len(page) > limit:
+                self._peeked = page.pop()
+            else:
+                self._peeked = None
+                self.done = True
+            self.position += len(page)
+            return page
+
+    def close(self) -> None:
+        with self._lock:
+            if self._sorted is not None:
+                self._sorted.close()
+            if hasattr(self._rows, "close"):
+                self._rows.close()
+
+
+def _external_sort(
+    rows: Iterable[Row],
+    sort_key: Callable[[Row], Tuple],
+    memory_rows: int,
+    spill_dir: Optional[str]
+) -> Iterator[Row]:
+    """Sort rows that may not fit in memory using sorted on-disk runs"""
+    runs: List[str] = []
+    try:
+        while True:
+            chunk = list(itertools.islice(rows, memory_rows))
+            if not chunk:
+                break
+            chunk.sort(key=sort_key)
+            handle, path = tempfile.mkstemp(prefix="csv-sort-", suffix=".run", dir=spill_dir)
+            runs.append(path)
+            with os.fdopen(handle, "wb") as file:
+                for row in chunk:
+                    pickle.dump(row, file, protocol=pickle.HIGHEST_PROTOCOL)
+            del chunk
+
+        yield from heapq.merge(*(_read_run(path) for path in runs), key=sort_key)
+    finally:
+        for path in runs:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _sort_rows(
+    rows: Iterable[Row],
+    sort_key: Callable[[Row], Tuple],
+    memory_rows: int,
+    spill_dir: Optional[str]
+) -> Iterator[Row]:
+    """Every row in sort order, sorted in memory unless there are more than memory_rows"""
+    rows = iter(rows)
+    head = list(itertools.islice(rows, memory_rows + 1))
+    if len(head) <= memory_rows:
+        head.sort(key=sort_key)
+        yield from head
+        return
+
+    merged = _external_sort(itertools.chain(head, rows), sort_key, memory_rows, spill_dir)
+    try:
+        yield from merged
+    finally:
+        merged.close()
+
+
+def _read_run(path: str) -> Iterator[Row]:
+    with open(path, "rb") as file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
@@ -0,0 +1,198 @@
+"""Mergeable streaming sketches for approximate aggregates
+
+The sketches use bounded memory regardless of input size and can be merged,
+so partial results computed over separate parts of a file combine exactly as
+if they had been computed in one pass.
+"""
+import hashlib
+import math
+from typing import Dict, List, Optional, Tuple
+
+
+def _hash64(value: str) -> int:
+    """Stable 64-bit hash (the built-in hash() is salted per process)"""
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """Approximate distinct counter with 2**precision one-byte registers
+
+    The relative standard error is about 1.04 / sqrt(2**precision).
+    """
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, value: str) -> None:
+        hashed = _hash64(value)
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self) -> int:
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class TDigest:
+    """Merging t-digest for approximate quantiles
+
+    Centroids are kept small near the tails (scale function k1), so extreme
+    percentiles stay accurate. Memory is O(compression).
+    """
+
+    def __init__(self, compression: float = 100.0):
+        self.compression = compression
+        self.centroids: List[Tuple[float, float]] = []
+        self._buffer: List[Tuple[float, float]] = []
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        self._buffer.append((value, weight))
+        self.total += weight
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if len(self._buffer) >= 10 * self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> None:
+        other._compress()
+        self._buffer.extend(other.centroids)
+        self.total += other.total
+        for bound in (other.min, other.max):
+            if bound is None:
+                continue
+            if self.min is None or bound < self.min:
+                self.min = bound
+            if self.max is None or bound > self.max:
+                self.max = bound
+        self._compress()
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _k_inverse(self, k: float) -> float:
+        return (math.sin(min(k * 2 * math.pi / self.compression, math.pi / 2)) + 1) / 2
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        points = sorted(self.centroids + self._buffer)
+        self._buffer = []
+        merged = []
+        mean, weight = points[0]
+        weight_before = 0.0
+        limit = self._k_inverse(self._k(0.0) + 1) * self.total
+        for point_mean, point_weight in points[1:]:
+            if weight_before + weight + point_weight <= limit:
+                weight += point_weight
+                mean += (point_mean - mean) * point_weight / weight
+            else:
+                merged.append((mean, weight))
+                weight_before += weight
+                limit = self._k_inverse(self._k(weight_before / self.total) + 1) * self.total
+                mean, weight = point_mean, point_weight
+        merged.append((mean, weight))
+        self.centroids = merged
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the value at quantile q (0..1)"""
+        self._compress()
+        if not self.centroids:
+            return None
+        if len(self.centroids) == 1:
+            return self.centroids[0][0]
+
+        target = q * self.total
+        cumulative = 0.0
+        previous_center, previous_mean = 0.0, self.min
+        for mean, weight in self.centroids:
+            center = cumulative + weight / 2
+            if target < center:
+                span = center - previous_center
+                fraction = (target - previous_center) / span if span else 0.0
+                return previous_mean + (mean - previous_mean) * fraction
+            previous_center, previous_mean = center, mean
+            cumulative += weight
+
+        span = self.total - previous_center
+        fraction = (target - previous_center) / span if span else 1.0
+        return previous_mean + (self.max - previous_mean) * min(fraction, 1.0)
+
+    def cdf(self, value: float) -> float:
+        """Estimate the fraction of values less than or equal to value"""
+        self._compress()
+        if not self.centroids or value < self.min:
+            return 0.0
+        if value >= self.max:
+            return 1.0
+
+        cumulative = 0.0
+        previous_center, previous_mean = 0.0, self.min
+        for mean, weight in self.centroids:
+            center = cumulative + weight / 2
+            if value < mean:
+                span = mean - previous_mean
+                fraction = (value - previous_mean) / span if span else 1.0
+                return (previous_center + (center - previous_center) * fraction) / self.total
+            previous_center, previous_mean = center, mean
+            cumulative += weight
+
+        span = self.max - previous_mean
+        fraction = (value - previous_mean) / span if span else 1.0
+        return (previous_center + (self.total - previous_center) * fraction) / self.total
+
+
+class FrequentValues:
+    """Approximate top-k frequent values (Misra-Gries with batched pruning)
+
+    Holds at most 2 * capacity counters. Counts are lower bounds that are
+    off by at most total / capacity, so any value more frequent than that is
+    guaranteed to be tracked.
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self.counters: Dict[str, int] = {}
+
+    def add(self, value: str, count: int = 1) -> None:
+        self.counters[value] = self.counters.get(value, 0) + count
+        if len(self.counters) > 2 * self.capacity:
+            self._prune()
+
+    def merge(self, other: "FrequentValues") -> None:
+        for value, count in other.counters.items():
+            self.counters[value] = self.counters.get(value, 0) + count
+        if len(self.counters) > 2 * self.capacity:
+            self._prune()
+
+    def _prune(self) -> None:
+        # Subtract the (capacity + 1)-th largest count from every counter
+        threshold = sorted(self.counters.values(), reverse=True)[self.capacity]
+        self.counters = {
+            value: count - threshold
+            for value, count in self.counters.items()
+            if count > threshold
+        }
+
+    def top(self, k: int) -> List[Tuple[str, int]]:
+        return sorted(self.counters.items(), key=lambda item: (-item[1], item[0]))[:k]
@@ -0,0 +1,117 @@
+"""Binary encodings of CSV content for machine clients
+
+MessagePack is always available. Arrow IPC streams need the optional pyarrow
+package; check ``arrow_available()`` before encoding.
+"""
+import io
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+import msgpack
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+Row = List[Optional[str]]
+
+
+def arrow_available() -> bool:
+    return pyarrow is not None
+
+
+def negotiate_media_type(accept: Optional[str], offered: Sequence[str]) -> Optional[str]:
+    """Pick the offered media type the Accept header prefers
+
+    Entries are ranked by their q value; a missing or empty header accepts the
+    first offered type. Returns None when nothing offered is acceptable.
+    """
+    if not accept:
+        return offered[0]
+
+    ranges = []
+    for position, entry in enumerate(accept.split(",")):
+        parts = [part.strip() for part in entry.split(";")]
+        quality = 1.0
+        for parameter in parts[1:]:
+            name, _, value = parameter.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if parts[0] and quality > 0:
+            ranges.append((-quality, position, parts[0].lower()))
+
+    for _, _, media_range in sorted(ranges):
+        for media_type in offered:
+            main_type = media_type.split("/")[0]
+            if media_range in (media_type, "*/*", f"{main_type}/*"):
+                return media_type
+    return None
+
+
+def encode_msgpack(content: Any) -> bytes:
+    return msgpack.packb(content, use_bin_type=True)
+
+
+def iter_msgpack_stream(preamble: Dict[str, Any], rows: Iterable[Row], batch_rows: int) -> Iterator[bytes]:
+    """A stream of MessagePack values: the preamble map, then one array per row"""
+    packer = msgpack.Packer(use_bin_type=True)
+    yield packer.pack(preamble)
+    batch = []
+    for row in rows:
+        batch.append(packer.pack(row))
+        if len(batch) >= batch_rows:
+            yield b"".join(batch)
+            batch = []
+    if batch:
+        yield b"".join(batch)
+
+
+def _arrow_schema(headers: Sequence[str], metadata: Dict[str, Any]):
+    # Cells are served as text in every format, so all columns are strings
+    fields = [pyarrow.field(name, pyarrow.string()) for name in headers]
+    return pyarrow.schema(fields, metadata={key: str(value) for key, value in metadata.items() if value is not None})
+
+
+def encode_arrow_page(headers: Sequence[str], columns: Sequence[List[Optional[str]]], metadata: Dict[str, Any]) -> bytes:
+    """One Arrow record batch in IPC stream format; metadata goes on the schema"""
+    schema = _arrow_schema(headers, metadata)
+    batch = pyarrow.record_batch([pyarrow.array(column, pyarrow.string()) for column in columns], schema=schema)
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def iter_arrow_stream(headers: Sequence[str], rows: Iterable[Row], batch_rows: int, metadata: Dict[str, Any]) -> Iterator[bytes]:
+    """Arrow IPC stream with one record batch per batch_rows rows"""
+    schema = _arrow_schema(headers, metadata)
+    width = len(headers)
+    buffer = io.BytesIO()
+    writer = pyarrow.ipc.new_stream(pyarrow.PythonFile(buffer, mode="w"), schema)
+
+    def drain() -> bytes:
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    columns: List[Row] = [[] for _ in range(width)]
+    count = 0
+    for row in rows:
+        for position in range(width):
+            columns[position].append(row[position] if position < len(row) else None)
+        count += 1
+        if count >= batch_rows:
+            writer.write_batch(pyarrow.record_batch([pyarrow.array(column, pyarrow.string()) for column in columns], schema=schema))
+            columns = [[] for _ in range(width)]
+            count = 0
+            yield drain()
+    if count:
+        writer.write_batch(pyarrow.record_batch([pyarrow.array(column, pyarrow.string()) for column in columns], schema=schema))
+    writer.close()
+    yield drain()
@@ -0,0 +1,8 @@
+"""
+Performance benchmarks for the CSV hot paths.
+
+Run from the backend/ directory:
+
+    python -m benchmarks --quick
+    python -m benchmarks --output results.json --baseline benchmarks/baseline.json
+"""
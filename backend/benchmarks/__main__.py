@@ -0,0 +1,132 @@
+"""
+Command line entry point: python -m benchmarks [options]
+
+Generates the datasets of the chosen matrix, runs every benchmark case in
+its own process, prints a summary and writes the results as JSON. With
+--baseline, results are compared with an earlier run and the exit status
+is 1 if any case regressed.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+from typing import Any, Dict, List
+from benchmarks.cases import BENCHMARKS
+from benchmarks.generators import ENCODINGS, Dataset, dataset_path
+from benchmarks.runner import Case, Limits, compare, environment, run_case
+
+# Dataset axes of the default and --full matrices
+DEFAULT_MATRIX = {"rows": [10000], "columns": [5, 20], "quoting": [0.0, 0.3], "encodings": ["ascii", "utf-8"]}
+FULL_MATRIX = {"rows": [10000, 100000, 1000000], "columns": [5, 20, 50], "quoting": [0.0, 0.1, 0.5], "encodings": list(ENCODINGS)}
+DEFAULT_CLIENTS = [100, 1000]
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def _list(cast):
+    return lambda value: [cast(item) for item in value.split(",") if item]
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the CSV hot paths")
+    parser.add_argument("--benchmarks", type=_list(str), help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--full", action="store_true", help="use the full dataset matrix (slow)")
+    parser.add_argument("--quick", action="store_true", help="measure each case for a shorter time")
+    parser.add_argument("--rows", type=_list(int), help="comma-separated row counts")
+    parser.add_argument("--columns", type=_list(int), help="comma-separated column counts")
+    parser.add_argument("--quoting", type=_list(float), help="comma-separated shares of quoted text cells")
+    parser.add_argument("--encodings", type=_list(str), help=f"comma-separated subset of: {', '.join(ENCODINGS)}")
+    parser.add_argument("--clients", type=_list(int), default=DEFAULT_CLIENTS, help="WebSocket client counts for broadcast")
+    parser.add_argument("--min-time", type=float, help="seconds to measure each case (default 1, 0.2 with --quick)")
+    parser.add_argument("--database-url", help="database to run against (default: a fresh SQLite file per case)")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "csv-browser-benchmarks"),
+                        help="where generated datasets are cached")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", nargs="?", const=DEFAULT_BASELINE, help="compare with this results file")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="also write results to this baseline file")
+    parser.add_argument("--threshold", type=float, default=0.1, help="regression threshold as a fraction (default 0.1)")
+    return parser.parse_args(argv)
+
+
+def build_cases(args: argparse.Namespace) -> List[Case]:
+    matrix = FULL_MATRIX if args.full else DEFAULT_MATRIX
+    names = args.benchmarks or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"Unknown benchmarks: {', '.join(unknown)}")
+
+    datasets = [
+        Dataset(rows, columns, quoting, encoding)
+        for rows, columns, quoting, encoding in itertools.product(
+            args.rows or matrix["rows"],
+            args.columns or matrix["columns"],
+            args.quoting or matrix["quoting"],
+            args.encodings or matrix["encodings"],
+        )
+    ]
+    cases = []
+    for name in names:
+        if BENCHMARKS[name].uses_dataset:
+            for dataset in datasets:
+                cases.append(Case(name, dataset.name, dataset=dataset, path=dataset_path(dataset, args.data_dir)))
+        else:
+            cases.extend(Case(name, f"{clients} clients", clients=clients) for clients in args.clients)
+    return cases
+
+
+def _print_result(result: Dict[str, Any]) -> None:
+    throughput = next(f"{value:,.0f} {key[:-6]}/s" for key, value in result.items() if key.endswith("_per_s") and key != "mb_per_s")
+    if "mb_per_s" in result:
+        throughput += f", {result['mb_per_s']:.1f} MB/s"
+    print(
+        f"  p50 {result['p50_ms']:9.2f} ms  p99 {result['p99_ms']:9.2f} ms  "
+        f"{throughput}  peak RSS {result['peak_rss_mb']:.0f} MB  ({result['iterations']} iterations)"
+    )
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    limits = Limits(min_time=args.min_time if args.min_time is not None else (0.2 if args.quick else 1.0))
+    if args.quick:
+        limits.min_iterations = 3
+
+    print("Generating datasets...")
+    cases = build_cases(args)
+
+    results, failures = [], []
+    for number, case in enumerate(cases, 1):
+        print(f"[{number}/{len(cases)}] {case.benchmark} {case.params}")
+        status, outcome = run_case(case, args.database_url, limits)
+        if status == "ok":
+            results.append(outcome)
+            _print_result(outcome)
+        else:
+            failures.append({"benchmark": case.benchmark, "params": case.params, "error": outcome})
+            print(f"  failed:\n{outcome}")
+
+    report = {"environment": environment(args.database_url), "results": results, "failures": failures}
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Wrote {path}")
+
+    exit_code = 1 if failures else 0
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("environment", {}).get("platform") != report["environment"]["platform"]:
+            print("Warning: the baseline was measured on a different platform")
+        rows = compare(results, baseline["results"], args.threshold)
+        print(f"\nCompared with {args.baseline} (threshold {args.threshold:.0%}):")
+        for row in rows:
+            marker = "REGRESSED" if row["regressed"] else "ok"
+            print(f"  {marker:9} {row['benchmark']} {row['params']}: p50 x{row['p50_ratio']:.2f}, peak RSS x{row['peak_rss_ratio']:.2f}")
+        if any(row["regressed"] for row in rows):
+            exit_code = 1
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,294 @@
+"""
+Benchmarks of the CSV hot paths, each measured per function, service or endpoint.
+
+Every benchmark is a setup coroutine that prepares its inputs and returns a
+Step: the operation timed on each iteration and the work it does. Setups run in a fresh process, after the runner has pointed the
+app at the benchmark database, so app modules are imported inside them.
+"""
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import os
+import random
+import uuid
+from benchmarks.generators import Dataset
+
+# Rows per page read by the content benchmarks
+PAGE_ROWS = 1000
+
+
+@dataclass
+class Context:
+    """Inputs of one benchmark case"""
+    workdir: str
+    dataset: Optional[Dataset] = None
+    path: Optional[str] = None
+    clients: Optional[int] = None
+
+
+@dataclass
+class Step:
+    """One timed iteration and the work it does: items of unit, and bytes"""
+    run: Callable[[], Awaitable[Any]]
+    items: int
+    unit: str = "rows"
+    bytes: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    name: str
+    kind: str  # function, service or endpoint
+    setup: Callable[[Context], Awaitable[Step]]
+    # Parameterized by dataset, otherwise by connected client count
+    uses_dataset: bool = True
+
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, kind: str, uses_dataset: bool = True):
+    def register(setup: Callable[[Context], Awaitable[Step]]):
+        BENCHMARKS[name] = Benchmark(name, kind, setup, uses_dataset)
+        return setup
+    return register
+
+
+async def _create_user() -> Tuple[int, str]:
+    """An admin user and an access token for it"""
+    from app.core.security import create_access_token, hash_password
+    from app.database.connection import AsyncSessionLocal
+    from app.database.models import User
+
+    async with AsyncSessionLocal() as db:
+        user = User(username=f"bench-{uuid.uuid4().hex[:8]}", password_hash=hash_password("bench"), role="admin")
+        db.add(user)
+        await db.commit()
+        token = create_access_token(data={"sub": user.username, "role": user.role, "uid": user.id})
+        return user.id, token
+
+
+async def _upload(path: str, user_id: int) -> int:
+    """Upload a dataset through the service and run its processing job"""
+    from fastapi import UploadFile
+    from app.database.connection import AsyncSessionLocal
+    from app.services.csv_service import upload_csv_file
+    from app.services.job_service import create_processing_job, run_processing_job
+
+    async with AsyncSessionLocal() as db:
+        with open(path, "rb") as file:
+            csv_file, _ = await upload_csv_file(db, UploadFile(file=file, filename=os.path.basename(path)), user_id)
+        job = await create_processing_job(db, csv_file)
+    # Without a started job worker, stages run in threads of this process
+    await run_processing_job(job.id)
+    return csv_file.id
+
+
+async def asgi_request(
+    app: Any,
+    method: str,
+    path: str,
+    headers: Optional[Dict[str, str]] = None,
+    body: bytes = b""
+) -> Tuple[int, bytes]:
+    """Send one request straight to an ASGI app, without a server or socket"""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("latin-1"),
+        "query_string": query.encode("latin-1"),
+        "root_path": "",
+        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in (headers or {}).items()],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    request = [{"type": "http.request", "body": body, "more_body": False}]
+    finished = asyncio.Event()
+    status: List[int] = []
+    chunks: List[bytes] = []
+
+    async def receive() -> Dict[str, Any]:
+        if request:
+            return request.pop()
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+        elif message["type"] == "http.response.body":
+            chunks.append(bytes(message.get("body", b"")))
+            if not message.get("more_body", False):
+                finished.set()
+
+    await app(scope, receive, send)
+    return status[0], b"".join(chunks)
+
+
+def _check(status: int, body: bytes, expected: int) -> None:
+    if status != expected:
+        raise RuntimeError(f"Expected HTTP {expected}, got {status}: {body[:200]!r}")
+
+
+@benchmark("parse_csv_file", "function")
+async def parse_csv_file_benchmark(context: Context) -> Step:
+    from app.utils.csv_parser import parse_csv_file, sniff_csv_header
+
+    with open(context.path, "rb") as file:
+        delimiter, _ = sniff_csv_header(file.read(64 * 1024))
+
+    async def run() -> None:
+        parse_csv_file(context.path, delimiter)
+
+    return Step(run, items=context.dataset.rows, bytes=os.path.getsize(context.path))
+
+
+@benchmark("upload_csv_file", "service")
+async def upload_csv_file_benchmark(context: Context) -> Step:
+    from fastapi import UploadFile
+    from app.database.connection import AsyncSessionLocal
+    from app.services.csv_service import upload_csv_file
+
+    user_id, _ = await _create_user()
+
+    async def run() -> None:
+        async with AsyncSessionLocal() as db:
+            with open(context.path, "rb") as file:
+                await upload_csv_file(db, UploadFile(file=file, filename=os.path.basename(context.path)), user_id)
+
+    return Step(run, items=context.dataset.rows, bytes=os.path.getsize(context.path))
+
+
+@benchmark("get_csv_content", "service")
+async def get_csv_content_benchmark(context: Context) -> Step:
+    from app.database.connection import AsyncSessionLocal
+    from app.services.csv_service import get_csv_content, get_csv_file_by_id
+
+    user_id, _ = await _create_user()
+    file_id = await _upload(context.path, user_id)
+    offsets = random.Random(0)
+    rows = min(PAGE_ROWS, context.dataset.rows)
+
+    async def run() -> None:
+        offset = offsets.randrange(max(context.dataset.rows - rows, 0) + 1)
+        async with AsyncSessionLocal() as db:
+            await get_csv_content(await get_csv_file_by_id(db, file_id), offset=offset, limit=rows)
+
+    return Step(run, items=rows)
+
+
+@benchmark("POST /api/v1/csv/upload", "endpoint")
+async def upload_endpoint_benchmark(context: Context) -> Step:
+    from app.main import app
+
+    _, token = await _create_user()
+    boundary = uuid.uuid4().hex
+    with open(context.path, "rb") as file:
+        body = b"".join((
+            f"--{boundary}\r\n".encode("latin-1"),
+            f'Content-Disposition: form-data; name="file"; filename="{os.path.basename(context.path)}"\r\n'.encode("latin-1"),
+            b"Content-Type: text/csv\r\n\r\n",
+            file.read(),
+            f"\r\n--{boundary}--\r\n".encode("latin-1"),
+        ))
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+        "Content-Length": str(len(body)),
+    }
+
+    async def run() -> None:
+        _check(*await asgi_request(app, "POST", "/api/v1/csv/upload", headers, body), 201)
+
+    return Step(run, items=context.dataset.rows, bytes=len(body))
+
+
+@benchmark("GET /api/v1/csv/{file_id}", "endpoint")
+async def content_endpoint_benchmark(context: Context) -> Step:
+    from app.main import app
+
+    user_id, token = await _create_user()
+    file_id = await _upload(context.path, user_id)
+    offsets = random.Random(0)
+    rows = min(PAGE_ROWS, context.dataset.rows)
+    headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+
+    async def run() -> None:
+        offset = offsets.randrange(max(context.dataset.rows - rows, 0) + 1)
+        _check(*await asgi_request(app, "GET", f"/api/v1/csv/{file_id}?offset={offset}&limit={rows}", headers), 200)
+
+    return Step(run, items=rows)
+
+
+class _CountingWebSocket:
+    """Accepts every message and counts deliveries across all instances"""
+
+    def __init__(self, delivered: "_Delivered"):
+        self.delivered = delivered
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, text: str) -> None:
+        self.delivered.add()
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+class _Delivered:
+    def __init__(self):
+        self.count = 0
+        self.target = 0
+        self.reached = asyncio.Event()
+
+    def expect(self, count: int) -> None:
+        self.count, self.target = 0, count
+        self.reached.clear()
+
+    def add(self) -> None:
+        self.count += 1
+        if self.count >= self.target:
+            self.reached.set()
+
+
+@benchmark("ConnectionManager.broadcast", "function", uses_dataset=False)
+async def broadcast_benchmark(context: Context) -> Step:
+    from app.config import settings
+    from app.core.broadcast import MemoryBackend
+    from app.core.websocket_manager import ConnectionManager
+
+    manager = ConnectionManager(
+        backend=MemoryBackend(),
+        max_pending=settings.ws_send_queue_size,
+        send_timeout=settings.ws_send_timeout,
+        heartbeat_interval=settings.ws_heartbeat_interval,
+        idle_timeout=settings.ws_idle_timeout
+    )
+    await manager.start()
+    delivered = _Delivered()
+    for _ in range(context.clients):
+        await manager.connect(_CountingWebSocket(delivered))
+
+    # A typical file list change
+    message = {
+        "event": "csv_list_updated",
+        "op": "added",
+        "version": 1,
+        "file_id": 1,
+        "file": {"id": 1, "filename": "sales.csv", "size": 1024, "total_rows": None, "uploaded_at": "2024-01-01T12:00:00"},
+        "message": "CSV file uploaded",
+    }
+
+    async def run() -> None:
+        # Timed until every client's sender has written the message
+        delivered.expect(context.clients)
+        await manager.broadcast(message)
+        await delivered.reached.wait()
+
+    return Step(run, items=context.clients, unit="messages")
@@ -0,0 +1,78 @@
+"""
+Synthetic CSV files covering rows x columns x quoting density x encoding.
+"""
+from dataclasses import dataclass
+import csv
+import os
+import random
+
+# ascii: plain ASCII text; utf-8: text with multi-byte characters;
+# utf-8-sig: multi-byte text behind a byte order mark
+ENCODINGS = ("ascii", "utf-8", "utf-8-sig")
+
+ASCII_WORDS = ("alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet")
+UTF8_WORDS = ("café", "naïve", "straße", "smörgåsbord", "東京", "데이터", "данные", "δεδομένα", "zürich", "🙂ok")
+
+# Quoted cells need quoting for one of these reasons
+QUOTED_FRAGMENTS = (", and more", ' said "hi"', "\nsecond line")
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """Shape of a generated CSV file
+
+    quoting is the share of text cells that contain a delimiter, a quote or
+    a newline and therefore have to be quoted.
+    """
+    rows: int
+    columns: int
+    quoting: float
+    encoding: str
+
+    @property
+    def name(self) -> str:
+        return f"{self.rows}x{self.columns}-q{self.quoting:g}-{self.encoding}"
+
+
+def generate_csv(dataset: Dataset, path: str, seed: int = 0) -> None:
+    """Write dataset to path; the same seed always gives the same bytes
+
+    Columns cycle through integer, decimal, text and date values so parsing
+    and type inference see a realistic mix.
+    """
+    if dataset.encoding not in ENCODINGS:
+        raise ValueError(f"Unknown encoding {dataset.encoding!r}; use one of {', '.join(ENCODINGS)}")
+
+    rnd = random.Random(seed)
+    words = ASCII_WORDS if dataset.encoding == "ascii" else UTF8_WORDS
+    kinds = [("int", "decimal", "text", "date")[column % 4] for column in range(dataset.columns)]
+
+    def cell(kind: str) -> str:
+        if kind == "int":
+            return str(rnd.randint(-100000, 100000))
+        if kind == "decimal":
+            return f"{rnd.uniform(-1000, 1000):.4f}"
+        if kind == "date":
+            return f"20{rnd.randint(10, 29)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}"
+        text = " ".join(rnd.choice(words) for _ in range(rnd.randint(1, 4)))
+        if rnd.random() < dataset.quoting:
+            text += rnd.choice(QUOTED_FRAGMENTS)
+        return text
+
+    encoding = "utf-8-sig" if dataset.encoding == "utf-8-sig" else "utf-8"
+    temp_path = f"{path}.part"
+    with open(temp_path, "w", encoding=encoding, newline="") as file:
+        writer = csv.writer(file, lineterminator="\n")
+        writer.writerow([f"{kind}_{column}" for column, kind in enumerate(kinds)])
+        for _ in range(dataset.rows):
+            writer.writerow([cell(kind) for kind in kinds])
+    os.replace(temp_path, path)
+
+
+def dataset_path(dataset: Dataset, data_dir: str, seed: int = 0) -> str:
+    """Path of a generated dataset in data_dir, generating it on first use"""
+    path = os.path.join(data_dir, f"{dataset.name}-s{seed}.csv")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        generate_csv(dataset, path, seed)
+    return path
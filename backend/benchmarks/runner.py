@@ -0,0 +1,186 @@
+"""
+Runs benchmark cases in fresh processes and compares results with a baseline.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime, timezone
+from benchmarks.generators import Dataset
+
+
+@dataclass
+class Case:
+    benchmark: str
+    params: str
+    dataset: Optional[Dataset] = None
+    path: Optional[str] = None
+    clients: Optional[int] = None
+
+
+@dataclass
+class Limits:
+    """How long each case is measured
+
+    Iterations run until min_time seconds have passed and at least
+    min_iterations have completed, but never more than max_iterations.
+    """
+    min_time: float = 1.0
+    min_iterations: int = 5
+    max_iterations: int = 1000
+    warmup: int = 1
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of values"""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the peak resident set size; only Linux supports this"""
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def _measure(case: Case, workdir: str, limits: Limits) -> Dict[str, Any]:
+    from benchmarks.cases import BENCHMARKS, Context
+
+    benchmark = BENCHMARKS[case.benchmark]
+    step = await benchmark.setup(Context(workdir, case.dataset, case.path, case.clients))
+    for _ in range(limits.warmup):
+        await step.run()
+
+    # Peak memory of the timed iterations only, when the platform allows it
+    rss_reset = _reset_peak_rss()
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < limits.max_iterations and (
+        len(timings) < limits.min_iterations or time.perf_counter() - started < limits.min_time
+    ):
+        iteration_start = time.perf_counter()
+        await step.run()
+        timings.append(time.perf_counter() - iteration_start)
+
+    total = sum(timings)
+    result = {
+        "benchmark": case.benchmark,
+        "kind": benchmark.kind,
+        "params": case.params,
+        "iterations": len(timings),
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p99_ms": percentile(timings, 99) * 1000,
+        f"{step.unit}_per_s": step.items * len(timings) / total,
+        "peak_rss_mb": _peak_rss_mb(),
+        "peak_rss_includes_setup": not rss_reset,
+    }
+    if step.bytes is not None:
+        result["mb_per_s"] = step.bytes * len(timings) / total / (1024 * 1024)
+    return result
+
+
+def _run_in_child(case: Case, database_url: Optional[str], limits: Limits, connection) -> None:
+    workdir = tempfile.mkdtemp(prefix="csv-browser-bench-")
+    try:
+        # Settings are read when app modules are first imported
+        os.environ["DATABASE_URL"] = database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        os.environ.pop("DATABASE_ASYNC_URL", None)
+        os.environ["UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+        logging.basicConfig(level=logging.ERROR)
+
+        from app.database.migrations import upgrade_database
+
+        upgrade_database()
+        connection.send(("ok", asyncio.run(_measure(case, workdir, limits))))
+    except BaseException:
+        connection.send(("error", traceback.format_exc()))
+    finally:
+        connection.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_case(case: Case, database_url: Optional[str], limits: Limits) -> Tuple[str, Any]:
+    """Run one case in a spawned process, so its memory and caches start cold
+
+    Returns ("ok", result) or ("error", traceback).
+    """
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_in_child, args=(case, database_url, limits, sender))
+    process.start()
+    sender.close()
+    try:
+        outcome = receiver.recv()
+    except EOFError:
+        outcome = ("error", f"Benchmark process exited with code {process.exitcode}")
+    process.join()
+    return outcome
+
+
+def environment(database_url: Optional[str]) -> Dict[str, Any]:
+    """Where results were measured; only comparable on the same environment"""
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "database": "sqlite" if database_url is None else database_url.split(":", 1)[0],
+    }
+
+
+def result_key(result: Dict[str, Any]) -> Tuple[str, str]:
+    return result["benchmark"], result["params"]
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> List[Dict[str, Any]]:
+    """Compare results with a baseline run
+
+    Returns one row per case present in both. A case regresses when its
+    p50 latency or peak RSS grew by more than threshold (0.1 is 10%).
+    """
+    previous = {result_key(result): result for result in baseline}
+    rows = []
+    for result in results:
+        base = previous.get(result_key(result))
+        if base is None:
+            continue
+        p50_ratio = result["p50_ms"] / base["p50_ms"] if base["p50_ms"] else math.inf
+        rss_ratio = result["peak_rss_mb"] / base["peak_rss_mb"] if base["peak_rss_mb"] else math.inf
+        rows.append({
+            "benchmark": result["benchmark"],
+            "params": result["params"],
+            "p50_ratio": p50_ratio,
+            "peak_rss_ratio": rss_ratio,
+            "regressed": p50_ratio > 1 + threshold or rss_ratio > 1 + threshold,
+        })
+    return rows
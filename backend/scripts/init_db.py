@@ -1,15 +1,14 @@
 """
 Database initialization script.
-Creates all tables if they don't exist.
+Creates all tables if they don't exist, or upgrades them to the current schema.
 """
-from app.database.connection import engine, Base
-from app.database.models import User, CSVFile
+from app.database.migrations import upgrade_database
 
 def init_db():
-    """Initialize database tables"""
-    print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    print("Database tables created successfully!")
+    """Initialize or upgrade database tables"""
+    print("Upgrading database tables...")
+    upgrade_database()
+    print("Database tables are up to date!")
 
 if __name__ == "__main__":
     init_db()
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import time
+
+# Settings are read when app.config is imported, so point them at a scratch
+# database and upload directory first
+_data_dir = tempfile.mkdtemp(prefix="csv-browser-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_data_dir}/test.db"
+os.environ["UPLOAD_DIR"] = os.path.join(_data_dir, "uploads")
+
+import pytest
+from fastapi.testclient import TestClient
+from app.core.security import hash_password
+from app.database.connection import SessionLocal
+from app.database.models import User
+from app.main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        db = SessionLocal()
+        try:
+            db.add(User(username="admin", password_hash=hash_password("admin-password"), role="admin"))
+            db.commit()
+        finally:
+            db.close()
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    response = client.post("/api/v1/auth/login", data={"username": "admin", "password": "admin-password"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def upload(client, auth_headers):
+    """Upload CSV bytes and wait for post-upload processing; returns the file's list entry"""
+
+    def upload_file(filename: str, data: bytes, timeout: float = 60) -> dict:
+        response = client.post("/api/v1/csv/upload", files={"file": (filename, data, "text/csv")}, headers=auth_headers)
+        assert response.status_code == 201, response.text
+        csv_file = response.json()
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            jobs = client.get(f"/api/v1/csv/{csv_file['id']}/jobs", headers=auth_headers).json()
+            if jobs and all(job["status"] in ("succeeded", "failed") for job in jobs):
+                return csv_file
+            time.sleep(0.05)
+        raise AssertionError(f"Processing of {filename} did not finish")
+
+    return upload_file
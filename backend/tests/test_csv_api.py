@@ -0,0 +1,107 @@
+import os
+
+from app.database.connection import SessionLocal
+from app.database.models import CSVFile
+
+
+def stored_path(file_id):
+    db = SessionLocal()
+    try:
+        return db.query(CSVFile).filter(CSVFile.id == file_id).one().path
+    finally:
+        db.close()
+
+
+def numbered_csv(count, tag=""):
+    return ("id,text\n" + "".join(f'{i},"{tag}row\n{i}"\n' for i in range(count))).encode("utf-8")
+
+
+def test_content_etag_answers_304(client, auth_headers, upload):
+    csv_file = upload("etag.csv", numbered_csv(20, "etag"))
+    url = f"/api/v1/csv/{csv_file['id']}?limit=5"
+
+    response = client.get(url, headers=auth_headers)
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+
+    revalidated = client.get(url, headers={**auth_headers, "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == etag
+    assert revalidated.content == b""
+
+    # Weak comparison, as for GET
+    assert client.get(url, headers={**auth_headers, "If-None-Match": f"W/{etag}"}).status_code == 304
+    # Another query is another representation
+    other = client.get(f"{url}&offset=5", headers={**auth_headers, "If-None-Match": etag})
+    assert other.status_code == 200 and other.headers["ETag"] != etag
+
+
+def test_content_etag_changes_when_processing_finishes(client, auth_headers, upload):
+    csv_file = upload("processed.csv", numbered_csv(5, "processed"))
+    url = f"/api/v1/csv/{csv_file['id']}"
+    processed_etag = client.get(url, headers=auth_headers).headers["ETag"]
+
+    db = SessionLocal()
+    try:
+        db.query(CSVFile).filter(CSVFile.id == csv_file["id"]).update({CSVFile.total_rows: None})
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.get(url, headers={**auth_headers, "If-None-Match": processed_etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != processed_etag
+
+
+def test_content_cursor_pagination_visits_every_row_once(client, auth_headers, upload):
+    csv_file = upload("pages.csv", numbered_csv(250, "pages"))
+    url = f"/api/v1/csv/{csv_file['id']}"
+
+    seen = []
+    page = client.get(f"{url}?limit=40", headers=auth_headers).json()
+    # Bounded, so a cursor that stops advancing fails rather than hangs
+    for _ in range(10):
+        seen.extend(int(row["id"]) for row in page["rows"])
+        if page["next_after_row"] is None:
+            break
+        page = client.get(f"{url}?limit=40&after_row={page['next_after_row']}", headers=auth_headers).json()
+
+    assert seen == list(range(250))
+    assert page["total_rows"] == 250
+    assert client.get(f"{url}?after_row=1&offset=2", headers=auth_headers).status_code == 400
+
+
+def test_file_list_cursor_pagination(client, auth_headers, upload):
+    ids = {upload(f"list-{i}.csv", numbered_csv(1, f"list-{i}"))["id"] for i in range(5)}
+
+    listed = []
+    response = client.get("/api/v1/csv?limit=2&q=list-", headers=auth_headers)
+    for _ in range(5):
+        assert response.status_code == 200
+        listed.extend(csv_file["id"] for csv_file in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        response = client.get("/api/v1/csv", params={"limit": 2, "q": "list-", "cursor": cursor}, headers=auth_headers)
+
+    assert sorted(listed) == sorted(ids)
+    assert listed == sorted(listed, reverse=True)
+
+
+def test_identical_uploads_share_a_blob_until_the_last_is_deleted(client, auth_headers, upload):
+    data = numbered_csv(30, "shared")
+    first = upload("first.csv", data)
+    second = upload("second.csv", data)
+    path = stored_path(first["id"])
+    assert stored_path(second["id"]) == path
+    assert os.path.exists(path)
+
+    assert client.delete(f"/api/v1/csv/{first['id']}", headers=auth_headers).status_code == 204
+    assert os.path.exists(path)
+    assert client.get(f"/api/v1/csv/{second['id']}", headers=auth_headers).json()["total_rows"] == 30
+
+    assert client.delete(f"/api/v1/csv/{second['id']}", headers=auth_headers).status_code == 204
+    assert not os.path.exists(path)
+    assert not os.path.exists(f"{path}.idx")
+    assert not os.path.exists(f"{path}.cols")
+    assert client.get(f"/api/v1/csv/{second['id']}", headers=auth_headers).status_code == 404
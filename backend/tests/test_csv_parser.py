@@ -0,0 +1,91 @@
+import csv
+import io
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from app.utils.csv_index import build_row_index_file
+from app.utils.csv_parser import iter_csv_rows, parse_csv_file, split_csv_ranges
+
+TRICKY_CELLS = ['plain', '', 'a,b', 'he said "hi"', '"quoted"', 'line\nbreak', 'two\n\nbreaks', 'é\r\n', '""']
+
+
+def write_csv(path, rows, lineterminator="\n"):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator=lineterminator)
+    writer.writerow(["id", "text", "value"])
+    writer.writerows(rows)
+    path.write_bytes(buffer.getvalue().encode("utf-8"))
+    return str(path)
+
+
+def tricky_rows(count, seed=0):
+    generator = random.Random(seed)
+    return [[str(i), generator.choice(TRICKY_CELLS), str(generator.random())] for i in range(count)]
+
+
+def expected_rows(path):
+    return list(iter_csv_rows(path))
+
+
+@pytest.fixture(scope="module")
+def executor():
+    with ThreadPoolExecutor(4) as pool:
+        yield pool
+
+
+@pytest.mark.parametrize("lineterminator", ["\n", "\r\n"])
+@pytest.mark.parametrize("parts", [2, 3, 7, 16])
+def test_parallel_parse_matches_serial_parse(tmp_path, executor, monkeypatch, lineterminator, parts):
+    # Small blocks make the parity pre-pass cross block boundaries
+    monkeypatch.setattr("app.utils.csv_parser.SCAN_BLOCK_SIZE", 256)
+    path = write_csv(tmp_path / "tricky.csv", tricky_rows(3000), lineterminator)
+    expected = expected_rows(path)
+
+    parsed = parse_csv_file(path, ",", executor, parts)
+
+    assert parsed["headers"] == expected[0]
+    assert parsed["rows"] == expected[1:]
+    assert parsed["total_rows"] == 3000
+
+
+def test_ranges_start_on_record_boundaries(tmp_path):
+    path = write_csv(tmp_path / "tricky.csv", tricky_rows(2000))
+    data = open(path, "rb").read()
+
+    ranges = split_csv_ranges(path, 7)
+
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    for start, _ in ranges[1:]:
+        # Even quote parity before the split means it is not inside a quoted field
+        assert data[start - 1:start] == b"\n"
+        assert data[:start].count(b'"') % 2 == 0
+
+
+def test_ranges_use_row_index_checkpoints(tmp_path, executor):
+    path = write_csv(tmp_path / "tricky.csv", tricky_rows(2000))
+    row_index = build_row_index_file(path, path + ".idx", ",", 100)
+
+    ranges = split_csv_ranges(path, 5, row_index=row_index)
+
+    assert all(start in row_index["offsets"] for start, _ in ranges[1:])
+    assert parse_csv_file(path, ",", executor, 5, row_index)["rows"] == expected_rows(path)[1:]
+
+
+def test_quote_inside_field_falls_back_to_serial_parse(tmp_path, executor):
+    # A quote in the middle of an unquoted field throws the parity count off
+    lines = ["id,text"] + [f'{i},ab"c' if i % 50 == 0 else f'{i},"x\ny"' for i in range(2000)]
+    path = tmp_path / "stray.csv"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    parsed = parse_csv_file(str(path), ",", executor, 6)
+
+    assert parsed["rows"] == expected_rows(str(path))[1:]
+
+
+def test_empty_file(tmp_path, executor):
+    path = tmp_path / "empty.csv"
+    path.write_bytes(b"")
+
+    assert parse_csv_file(str(path), ",", executor, 4) == {"headers": [], "rows": [], "total_rows": 0}
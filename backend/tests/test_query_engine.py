@@ -0,0 +1,78 @@
+import os
+import random
+
+import pytest
+from app.utils.query_engine import QueryCursor, infer_column_kinds, parse_filter, parse_sort, run_query
+
+HEADERS = ["id", "name", "score"]
+
+
+def make_rows(count, seed=0):
+    generator = random.Random(seed)
+    return [[str(i), generator.choice(["ann", "bob", "cy", ""]), str(generator.randint(-500, 500))] for i in range(count)]
+
+
+def query(rows, filters=(), sort=None):
+    kinds = infer_column_kinds(HEADERS, rows)
+    predicates = [parse_filter(expression, HEADERS, kinds) for expression in filters]
+    sort_key = parse_sort(sort, HEADERS, kinds) if sort else None
+    return predicates, sort_key
+
+
+def test_sort_spills_runs_and_removes_them(tmp_path):
+    rows = make_rows(2000)
+    predicates, sort_key = query(rows, sort="-score,id")
+    cursor = QueryCursor(iter(rows), predicates, sort_key, 0, memory_rows=100, spill_dir=str(tmp_path))
+
+    fetched = cursor.fetch(50)
+    assert os.listdir(tmp_path), "sorting beyond memory_rows should spill runs"
+    while not cursor.done:
+        fetched.extend(cursor.fetch(300))
+    cursor.close()
+
+    assert fetched == sorted(rows, key=lambda row: (-int(row[2]), int(row[0])))
+    assert cursor.matched_rows == 2000
+    assert os.listdir(tmp_path) == []
+
+
+def test_spilled_sort_matches_in_memory_sort(tmp_path):
+    rows = make_rows(1500, seed=1)
+    predicates, sort_key = query(rows, filters=["score:ge:0"], sort="name,-score")
+
+    in_memory = run_query(iter(rows), predicates, sort_key, 20, 100, memory_rows=10000)
+    spilled = run_query(iter(rows), predicates, sort_key, 20, 100, memory_rows=64, spill_dir=str(tmp_path))
+
+    assert spilled == in_memory
+    assert len(spilled["rows"]) == 100
+    # Empty names are nulls and sort last
+    assert [row[1] for row in spilled["rows"]] == sorted(row[1] for row in spilled["rows"])
+
+
+def test_numbers_compare_numerically_and_nulls_sort_last():
+    rows = [["1", "a", "10"], ["2", "b", "9"], ["3", "c", ""], ["4", "d", "-1"]]
+    predicates, sort_key = query(rows, filters=["score:gt:0"], sort="score")
+
+    assert [row[0] for row in sorted(rows, key=sort_key)] == ["4", "2", "1", "3"]
+    assert [row[0] for row in rows if all(predicate(row) for predicate in predicates)] == ["1", "2"]
+
+
+@pytest.mark.parametrize("value", ["nan", "inf", "-Infinity", "1_000"])
+def test_non_finite_and_underscored_values_are_text(value):
+    assert infer_column_kinds(["x"], [["1"], [value]]) == ["string"]
+
+
+@pytest.mark.parametrize("pattern", ["(a+)+$", "(a|aa)*b", "(\\w*)*", "(a)\\1", "(?:x+y?)+"])
+def test_regex_filters_that_can_backtrack_are_rejected(pattern):
+    with pytest.raises(ValueError):
+        parse_filter(f"name:regex:{pattern}", HEADERS, ["number", "string", "number"])
+
+
+@pytest.mark.parametrize("pattern", ["^an", "b.b", "[a-c]+y?", "(ab){2}", "x|y"])
+def test_safe_regex_filters_are_accepted(pattern):
+    predicate = parse_filter(f"name:regex:{pattern}", HEADERS, ["number", "string", "number"])
+    predicate(["1", "ann", "2"])
+
+
+def test_overlong_regex_is_rejected():
+    with pytest.raises(ValueError):
+        parse_filter("name:regex:" + "a" * 1000, HEADERS, ["number", "string", "number"])
@@ -1,23 +1,30 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { csvApi } from '../../services/api';
 import { useCSVUpdates } from '../../hooks/useWebSocket';
 import { useAuth } from '../../context/AuthContext';
-import type { CSVFile } from '../../types';
+import type { CSVFile, CSVListChange, WebSocketMessage } from '../../types';
 import { CSVViewer } from './CSVViewer';
 import { CSVUpload } from './CSVUpload';
 
 export const CSVList = () => {
   const [files, setFiles] = useState<CSVFile[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [search, setSearch] = useState('');
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [selectedFileId, setSelectedFileId] = useState<number | null>(null);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState('');
   const { isAdmin } = useAuth();
+  // Version of the list the shown files reflect; changes are applied in order
+  const listVersion = useRef(0);
 
   const loadFiles = async () => {
     try {
       setIsLoading(true);
-      const data = await csvApi.list();
-      setFiles(data);
+      const page = await csvApi.list({ q: search || undefined });
+      setFiles(page.files);
+      setNextCursor(page.nextCursor);
+      listVersion.current = page.version;
       setError('');
     } catch (err: any) {
       setError(err.response?.data?.detail || 'Failed to load CSV files');
@@ -26,15 +33,74 @@ export const CSVList = () => {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) {
+      return;
+    }
+
+    try {
+      setIsLoadingMore(true);
+      const page = await csvApi.list({ q: search || undefined, cursor: nextCursor });
+      setFiles((current) => [...current, ...page.files]);
+      setNextCursor(page.nextCursor);
+    } catch (err: any) {
+      setError(err.response?.data?.detail || 'Failed to load CSV files');
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
+  // Reload the first page when the search changes, after a short pause in typing
   useEffect(() => {
-    loadFiles();
-  }, []);
+    const timer = window.setTimeout(loadFiles, 250);
+    return () => window.clearTimeout(timer);
+  }, [search]);
+
+  const matchesSearch = (file: CSVFile) =>
+    !search || file.filename.toLowerCase().includes(search.toLowerCase());
+
+  const applyChange = (change: Pick<CSVListChange, 'op' | 'file_id' | 'file'>) => {
+    setFiles((current) => {
+      const others = current.filter((file) => file.id !== change.file_id);
+      if (change.op === 'deleted' || !change.file) {
+        return others;
+      }
+      if (change.op === 'added') {
+        return matchesSearch(change.file) ? [change.file, ...others] : others;
+      }
+      return current.map((file) => (file.id === change.file_id ? change.file! : file));
+    });
+  };
+
+  // Apply list changes from the server instead of reloading the list
+  useCSVUpdates(async (message: WebSocketMessage) => {
+    if (message.version === undefined || message.op === undefined) {
+      loadFiles();
+      return;
+    }
+    if (message.version <= listVersion.current) {
+      return;
+    }
+    if (message.version === listVersion.current + 1) {
+      listVersion.current = message.version;
+      applyChange({ op: message.op, file_id: message.file_id!, file: message.file });
+      return;
+    }
 
-  // Listen for real-time updates
-  useCSVUpdates(() => {
-    loadFiles();
+    // Some changes were missed: catch up from the last version applied
+    try {
+      const { version, changes } = await csvApi.changes(listVersion.current);
+      changes.forEach(applyChange);
+      listVersion.current = Math.max(listVersion.current, version);
+    } catch {
+      loadFiles();
+    }
   });
 
+  const handleUpload = (file: CSVFile) => {
+    applyChange({ op: 'added', file_id: file.id, file });
+  };
+
   const handleDelete = async (fileId: number) => {
     if (!window.confirm('Are you sure you want to delete this file?')) {
       return;
@@ -42,7 +108,7 @@ export const CSVList = () => {
 
     try {
       await csvApi.delete(fileId);
-      await loadFiles();
+      applyChange({ op: 'deleted', file_id: fileId });
       if (selectedFileId === fileId) {
         setSelectedFileId(null);
       }
@@ -75,7 +141,17 @@ export const CSVList = () => {
     <div className="px-4 py-6">
       <div className="flex justify-between items-center mb-6">
         <h1 className="text-2xl font-bold text-gray-900">CSV Files</h1>
-        {isAdmin && <CSVUpload onUpload={loadFiles} />}
+        {isAdmin && <CSVUpload onUpload={handleUpload} />}
+      </div>
+
+      <div className="mb-4">
+        <input
+          type="search"
+          value={search}
+          onChange={(e) => setSearch(e.target.value)}
+          placeholder="Search by filename"
+          className="w-full px-3 py-2 border border-gray-300 rounded-md text-sm focus:outline-none focus:ring-indigo-500 focus:border-indigo-500"
+        />
       </div>
 
       {error && (
@@ -140,6 +216,17 @@ export const CSVList = () => {
               </li>
             ))}
           </ul>
+          {nextCursor && (
+            <div className="px-4 py-4 text-center">
+              <button
+                onClick={loadMore}
+                disabled={isLoadingMore}
+                className="text-indigo-600 hover:text-indigo-800 text-sm font-medium disabled:opacity-50"
+              >
+                {isLoadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -1,8 +1,9 @@
 import { useState, useRef } from 'react';
 import { csvApi } from '../../services/api';
+import type { CSVFile } from '../../types';
 
 interface CSVUploadProps {
-  onUpload: () => void;
+  onUpload: (file: CSVFile) => void;
 }
 
 export const CSVUpload = ({ onUpload }: CSVUploadProps) => {
@@ -23,8 +24,8 @@ export const CSVUpload = ({ onUpload }: CSVUploadProps) => {
     setError('');
 
     try {
-      await csvApi.upload(file);
-      onUpload();
+      const uploaded = await csvApi.upload(file);
+      onUpload(uploaded);
       if (fileInputRef.current) {
         fileInputRef.current.value = '';
       }
@@ -1,6 +1,12 @@
-import { useState, useEffect } from 'react';
-import { csvApi } from '../../services/api';
-import type { CSVContent } from '../../types';
+import { useState, useEffect, useRef } from 'react';
+import { wsService } from '../../services/websocket';
+import type { WebSocketMessage } from '../../types';
+
+// Row batches requested ahead of the rows on screen
+const CREDITS = 2;
+
+// Request more rows once the end of the table is this many screens away
+const PREFETCH_SCREENS = 2;
 
 interface CSVViewerProps {
   fileId: number;
@@ -8,26 +14,88 @@ interface CSVViewerProps {
   onDelete?: (fileId: number) => void;
 }
 
+interface StreamedContent {
+  filename: string;
+  headers: string[];
+  rows: (string | null)[][];
+  total_rows: number;
+}
+
 export const CSVViewer = ({ fileId, onBack, onDelete }: CSVViewerProps) => {
-  const [content, setContent] = useState<CSVContent | null>(null);
+  const [content, setContent] = useState<StreamedContent | null>(null);
   const [isLoading, setIsLoading] = useState(true);
+  const [isComplete, setIsComplete] = useState(false);
   const [error, setError] = useState('');
+  const loadedRows = useRef(0);
 
+  // Rows arrive over the WebSocket in growing batches; each batch spends a
+  // credit, and credits are returned as the user scrolls towards the end
   useEffect(() => {
-    const loadContent = async () => {
-      try {
-        setIsLoading(true);
-        const data = await csvApi.get(fileId);
-        setContent(data);
-        setError('');
-      } catch (err: any) {
-        setError(err.response?.data?.detail || 'Failed to load CSV content');
-      } finally {
+    let unacked = 0;
+    let done = false;
+    loadedRows.current = 0;
+    setContent(null);
+    setIsLoading(true);
+    setIsComplete(false);
+    setError('');
+
+    const subscribe = () => {
+      unacked = 0;
+      wsService.send({ event: 'subscribe', file_id: fileId, offset: loadedRows.current, credits: CREDITS });
+    };
+
+    const requestMore = () => {
+      const remaining = document.documentElement.scrollHeight - window.scrollY - window.innerHeight;
+      if (!done && unacked > 0 && remaining < window.innerHeight * PREFETCH_SCREENS) {
+        wsService.send({ event: 'ack', file_id: fileId, credits: unacked });
+        unacked = 0;
+      }
+    };
+
+    const handleRows = (message: WebSocketMessage) => {
+      // Ignore batches of an earlier subscription
+      if (message.file_id !== fileId || message.offset !== loadedRows.current) {
+        return;
+      }
+      const rows = message.rows || [];
+      loadedRows.current += rows.length;
+      unacked++;
+      done = !!message.done;
+      setContent((previous) => ({
+        filename: message.filename ?? previous?.filename ?? '',
+        headers: message.headers ?? previous?.headers ?? [],
+        rows: previous ? [...previous.rows, ...rows] : rows,
+        total_rows: message.total_rows ?? 0,
+      }));
+      setIsLoading(false);
+      setIsComplete(done);
+      // Wait for the new rows to render before measuring
+      requestAnimationFrame(requestMore);
+    };
+
+    const handleError = (message: WebSocketMessage) => {
+      if (message.file_id === fileId) {
+        setError(message.detail || 'Failed to load CSV content');
         setIsLoading(false);
       }
     };
 
-    loadContent();
+    wsService.connect();
+    wsService.on('open', subscribe);
+    wsService.on('csv_rows', handleRows);
+    wsService.on('error', handleError);
+    window.addEventListener('scroll', requestMore);
+    if (wsService.isOpen()) {
+      subscribe();
+    }
+
+    return () => {
+      wsService.send({ event: 'unsubscribe', file_id: fileId });
+      wsService.off('open', subscribe);
+      wsService.off('csv_rows', handleRows);
+      wsService.off('error', handleError);
+      window.removeEventListener('scroll', requestMore);
+    };
   }, [fileId]);
 
   if (isLoading) {
@@ -69,6 +137,7 @@ export const CSVViewer = ({ fileId, onBack, onDelete }: CSVViewerProps) => {
           <h1 className="text-2xl font-bold text-gray-900">{content.filename}</h1>
           <p className="text-sm text-gray-600 mt-1">
             {content.total_rows} rows • {content.headers.length} columns
+            {!isComplete && ` • ${content.rows.length} loaded`}
           </p>
         </div>
         {onDelete && (
@@ -103,12 +172,12 @@ export const CSVViewer = ({ fileId, onBack, onDelete }: CSVViewerProps) => {
             <tbody className="bg-white divide-y divide-gray-200">
               {content.rows.map((row, rowIndex) => (
                 <tr key={rowIndex} className="hover:bg-gray-50">
-                  {content.headers.map((header, colIndex) => (
+                  {content.headers.map((_, colIndex) => (
                     <td
                       key={colIndex}
                       className="px-6 py-4 whitespace-nowrap text-sm text-gray-900"
                     >
-                      {row[header] || ''}
+                      {row[colIndex] || ''}
                     </td>
                   ))}
                 </tr>
@@ -13,12 +13,13 @@ export const useWebSocket = (event: string, callback: (data: WebSocketMessage) =
   }, [event, callback]);
 };
 
-export const useCSVUpdates = (onUpdate: () => void) => {
+export const useCSVUpdates = (onUpdate: (data: WebSocketMessage) => void) => {
   const handleUpdate = useCallback((data: WebSocketMessage) => {
     if (data.event === 'csv_list_updated') {
-      onUpdate();
+      onUpdate(data);
     }
   }, [onUpdate]);
 
+  // Uploads, deletes and finished processing each arrive as a list change
   useWebSocket('csv_list_updated', handleUpdate);
 };
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import type { LoginCredentials, SignupData, AuthResponse, CSVFile, CSVContent, User } from '../types';
+import type { LoginCredentials, SignupData, AuthResponse, CSVFile, CSVFilePage, CSVListParams, CSVListChanges, CSVContent, User } from '../types';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
@@ -60,8 +60,17 @@ export const authApi = {
 
 // CSV endpoints
 export const csvApi = {
-  list: async () => {
-    const response = await api.get<CSVFile[]>('/api/v1/csv');
+  list: async (params: CSVListParams = {}): Promise<CSVFilePage> => {
+    const response = await api.get<CSVFile[]>('/api/v1/csv', { params });
+    return {
+      files: response.data,
+      nextCursor: (response.headers['x-next-cursor'] as string | undefined) ?? null,
+      version: Number(response.headers['x-list-version'] ?? 0),
+    };
+  },
+
+  changes: async (since: number) => {
+    const response = await api.get<CSVListChanges>('/api/v1/csv/changes', { params: { since } });
     return response.data;
   },
 
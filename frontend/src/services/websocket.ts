@@ -15,16 +15,27 @@ export class WebSocketService {
     }
 
     try {
-      this.ws = new WebSocket(`${WS_BASE_URL}/api/v1/ws`);
+      // Browsers can't set headers on WebSocket requests; the token lets
+      // the connection subscribe to file rows
+      const token = localStorage.getItem('token');
+      const query = token ? `?token=${encodeURIComponent(token)}` : '';
+      this.ws = new WebSocket(`${WS_BASE_URL}/api/v1/ws${query}`);
 
       this.ws.onopen = () => {
         console.log('WebSocket connected');
         this.reconnectAttempts = 0;
+        // Subscriptions don't survive a reconnect; listeners renew them
+        this.notifyListeners('open', { event: 'open' });
       };
 
       this.ws.onmessage = (event) => {
         try {
           const message: WebSocketMessage = JSON.parse(event.data);
+          if (message.event === 'ping') {
+            // The server closes connections that stop answering
+            this.ws?.send(JSON.stringify({ event: 'pong' }));
+            return;
+          }
           this.notifyListeners(message.event, message);
         } catch (error) {
           console.error('Error parsing WebSocket message:', error);
@@ -55,6 +66,16 @@ export class WebSocketService {
     }
   }
 
+  isOpen() {
+    return this.ws?.readyState === WebSocket.OPEN;
+  }
+
+  send(message: Record<string, unknown>) {
+    if (this.isOpen()) {
+      this.ws!.send(JSON.stringify(message));
+    }
+  }
+
   disconnect() {
     if (this.ws) {
       this.ws.close();
@@ -9,9 +9,35 @@ export interface CSVFile {
   id: number;
   filename: string;
   size: number;
+  total_rows?: number | null;
   uploaded_at: string;
 }
 
+export interface CSVFilePage {
+  files: CSVFile[];
+  nextCursor: string | null;
+  version: number;
+}
+
+export interface CSVListChange {
+  version: number;
+  op: 'added' | 'updated' | 'deleted';
+  file_id: number;
+  file?: CSVFile | null;
+}
+
+export interface CSVListChanges {
+  version: number;
+  changes: CSVListChange[];
+}
+
+export interface CSVListParams {
+  cursor?: string;
+  q?: string;
+  match?: 'prefix' | 'contains';
+  limit?: number;
+}
+
 export interface CSVContent {
   filename: string;
   headers: string[];
@@ -36,5 +62,22 @@ export interface AuthResponse {
 
 export interface WebSocketMessage {
   event: string;
-  message: string;
+  message?: string;
+  file_id?: number;
+  job_id?: number;
+  stage?: string | null;
+  progress?: number;
+  status?: string;
+  op?: CSVListChange['op'];
+  version?: number;
+  file?: CSVFile | null;
+  // csv_rows batches of a row subscription
+  offset?: number;
+  rows?: (string | null)[][];
+  headers?: string[];
+  filename?: string;
+  total_rows?: number | null;
+  done?: boolean;
+  // error
+  detail?: string;
 }